@@ -25,9 +25,11 @@ import matplotlib.pyplot as plt
 import warnings
 import sys
 import os
+import tempfile
 from pathlib import Path
 from datetime import datetime
 import json
+import time
 
 # Handle Streamlit version compatibility
 def safe_rerun():
@@ -53,6 +55,29 @@ try:
     from pathway_analysis import PathwayAnalyzer
     from pubmed_search import PubMedSearcher
     from visualization_export import VisualizationExporter
+    from batch_cox import BatchCoxFitter
+    from signature_scoring import SignatureScorer
+    from bootstrap_ci import BootstrapEngine
+    from gene_set_library import GeneSetStore
+    from ora_engine import OverRepresentationAnalyzer
+    from gsea_engine import PrerankedGSEA
+    from pathway_scoring import PathwayActivityScorer
+    from camera_test import CompetitiveGeneSetTest
+    from term_network import TermSimilarityNetwork
+    from enrichment_orchestrator import EnrichmentOrchestrator, enrichment_tasks, ANALYSIS_METHODS
+    from eutils_client import AsyncEUtilsClient, publication_counts
+    from literature_store import LiteratureStore
+    from abstract_analytics import AbstractAnalyzer
+    from volcano_plot import VolcanoRenderer
+    from figure_payload import compact_figure
+    from heatmap_clustering import HeatmapClusterer
+    from heatmap_tiles import HeatmapPyramid
+    from pca_engine import RandomizedPCA
+    from expression_store import ExpressionStore, StreamingAnalyzer, log_layer
+    from sample_index import SampleSimilarityIndex
+    from figure_export import FigureExportService
+    from figure_registry import FigureRegistry
+    from density_plots import DensityPlotRenderer, MEAN_COLUMNS
 except ImportError as e:
     st.error(f"Failed to import utility modules: {e}")
     st.error("Please ensure all utility modules are properly installed.")
@@ -60,6 +85,12 @@ except ImportError as e:
 
 warnings.filterwarnings('ignore')
 
+
+@st.cache_resource
+def shared_gene_set_store():
+    """Gene set store shared by all sessions, so imports extend one vocabulary"""
+    return GeneSetStore(Path(__file__).parent / "gene_set_libraries")
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="🧬 Prairie Genomics Suite - Enhanced",
@@ -140,9 +171,18 @@ class PrairieGenomicsEnhanced:
             'clinical_data': None,
             'gene_symbols': {},
             'de_results': None,
+            'de_design': None,
             'pathway_results': None,
             'survival_results': None,
+            'cox_screen_results': None,
             'literature_results': None,
+            'publication_counts': {},
+            'heatmap_pyramid': None,
+            'expression_store': None,
+            'max_memory_gb': 4,
+            'figure_export_jobs': {},
+            'export_rasterization': {'enabled': True, 'dpi': 300, 'point_threshold': 5000,
+                                     'cell_threshold': 20000},
             'current_project': None,
             'analysis_history': [],
             'export_ready': False
@@ -161,6 +201,131 @@ class PrairieGenomicsEnhanced:
         self.pathway_analyzer = PathwayAnalyzer()
         self.pubmed_searcher = PubMedSearcher()
         self.viz_exporter = VisualizationExporter()
+        self.cox_fitter = BatchCoxFitter()
+        self.bootstrap_engine = BootstrapEngine()
+        
+        # Signature scorer keeps its score cache across reruns
+        if 'signature_scorer' not in st.session_state:
+            st.session_state.signature_scorer = SignatureScorer()
+        self.signature_scorer = st.session_state.signature_scorer
+        
+        # Local gene set libraries are memory-mapped once per server process
+        self.gene_set_store = shared_gene_set_store()
+        
+        # ORA keeps the stacked membership matrix of the last library selection
+        if 'ora_analyzer' not in st.session_state:
+            st.session_state.ora_analyzer = OverRepresentationAnalyzer(self.gene_set_store)
+        self.ora_analyzer = st.session_state.ora_analyzer
+        self.gsea_engine = PrerankedGSEA(self.gene_set_store)
+        self.camera_test = CompetitiveGeneSetTest(self.gene_set_store)
+        self.term_network = TermSimilarityNetwork()
+        
+        # Enrichment worker pool and its result cache survive reruns
+        if 'enrichment_orchestrator' not in st.session_state:
+            st.session_state.enrichment_orchestrator = EnrichmentOrchestrator()
+        self.enrichment_orchestrator = st.session_state.enrichment_orchestrator
+        
+        # Per-sample pathway scores are cached per dataset, library and method
+        if 'pathway_scorer' not in st.session_state:
+            st.session_state.pathway_scorer = PathwayActivityScorer(
+                self.gene_set_store, self.signature_scorer
+            )
+        self.pathway_scorer = st.session_state.pathway_scorer
+        
+        # PubMed articles and query results persist on disk across sessions
+        if 'literature_store' not in st.session_state:
+            st.session_state.literature_store = LiteratureStore(Path(__file__).parent / "literature_cache.db")
+        self.literature_store = st.session_state.literature_store
+        self.abstract_analyzer = AbstractAnalyzer(self.literature_store)
+        self.volcano_renderer = VolcanoRenderer()
+        self.density_renderer = DensityPlotRenderer()
+        
+        # Heatmap trees are cached per gene set and settings across reruns
+        if 'heatmap_clusterer' not in st.session_state:
+            st.session_state.heatmap_clusterer = HeatmapClusterer()
+        self.heatmap_clusterer = st.session_state.heatmap_clusterer
+        
+        # Fitted PCA models are reused (and extended by projection) across reruns
+        if 'pca_engine' not in st.session_state:
+            st.session_state.pca_engine = RandomizedPCA()
+        self.pca_engine = st.session_state.pca_engine
+        
+        # Sample kNN graph (and its embedding) is rebuilt only when the PCA space changes
+        if 'sample_index' not in st.session_state:
+            st.session_state.sample_index = SampleSimilarityIndex()
+        self.sample_index = st.session_state.sample_index
+        
+        # Publication exports render in background processes, cached by parameter hash
+        if 'figure_export_service' not in st.session_state:
+            st.session_state.figure_export_service = FigureExportService()
+        self.figure_exports = st.session_state.figure_export_service
+        
+        # Figures drawn this session, addressable by ID for multi-panel layouts
+        if 'figure_registry' not in st.session_state:
+            st.session_state.figure_registry = FigureRegistry()
+        self.figure_registry = st.session_state.figure_registry
+    
+    def submit_figure_export(self, plot_type, data, params, journal_style):
+        """Queue a publication export; identical requests reuse the cached files"""
+        key = self.figure_exports.submit(plot_type, data, params, journal_style,
+                                         raster_options=st.session_state.export_rasterization)
+        st.session_state.figure_export_jobs[plot_type] = key
+        return key
+    
+    def show_figure_export(self, plot_type, label):
+        """
+        Status of the latest publication export of a plot type
+        
+        Returns:
+            Exporter result dict once rendered, else None
+        """
+        key = st.session_state.figure_export_jobs.get(plot_type)
+        if key is None:
+            return None
+        
+        status = self.figure_exports.status(key)
+        if status['state'] == 'running':
+            st.info(f"⏳ Rendering publication-ready {label} in the background...")
+            st.button("🔄 Check export status", key=f"refresh_export_{plot_type}")
+            return None
+        if status['state'] == 'failed':
+            st.error(f"❌ Failed to export {label}: {str(status['error'])}")
+            return None
+        if status['state'] != 'done':
+            return None
+        
+        plot_results = status['result']
+        if 'figure_paths' in plot_results:
+            source = "reused from cache" if status['cached'] else f"rendered in {status['seconds']:.1f}s"
+            st.success(f"✅ Publication-ready {label} generated ({source})!")
+            for format_type, file_path in plot_results['figure_paths'].items():
+                st.info(f"📁 {format_type.upper()} saved: {file_path}")
+        return plot_results
+    
+    def streaming_analyzer(self):
+        """Streaming analyzer for the on-disk expression store (None if no store is open)"""
+        store = st.session_state.expression_store
+        if store is None:
+            return None
+        
+        # Gene statistics are kept per store; the budget follows the settings slider
+        analyzer = st.session_state.get('streaming_analyzer')
+        if analyzer is None or analyzer.store is not store:
+            analyzer = StreamingAnalyzer(store)
+            st.session_state.streaming_analyzer = analyzer
+        analyzer.memory_budget = st.session_state.max_memory_gb * 1024 ** 3
+        return analyzer
+    
+    def log_transform_option(self, key):
+        """
+        Checkbox for running in-memory PCA on log2(x + 1) values (the layer the
+        on-disk store is analyzed on); on by default only for raw store subsets
+        """
+        from_store = st.session_state.expression_data.attrs.get('source') == 'expression_store'
+        return st.checkbox(
+            "log2(x + 1) transform", from_store, key=key,
+            help="Leave off for data that is already log-scaled or normalized (microarray, VST, z-scores)"
+        )
     
     def show_header(self):
         """Display main header and navigation"""
@@ -217,6 +382,10 @@ class PrairieGenomicsEnhanced:
             else:
                 st.info(f"{data_source} integration coming in next update!")
             
+            # Out-of-core store summary
+            if st.session_state.expression_store is not None:
+                self.show_expression_store()
+            
             # Data quality control
             if st.session_state.expression_data is not None:
                 self.show_data_quality_control()
@@ -233,7 +402,36 @@ class PrairieGenomicsEnhanced:
                 help="Genes as rows, samples as columns"
             )
             
-            if expression_file:
+            out_of_core = st.checkbox(
+                "Out-of-core import (matrices larger than memory)", False,
+                key="upload_out_of_core",
+                help="Stream the matrix into an on-disk store; statistics and PCA then run in blocks "
+                     "within the memory budget set under Settings"
+            )
+            
+            if out_of_core and file_format not in ["CSV", "TSV"]:
+                st.warning("⚠️ Out-of-core import supports CSV and TSV files")
+            elif out_of_core and expression_file:
+                if st.button("📥 Import to on-disk store", key="upload_out_of_core_import"):
+                    progress_text = st.empty()
+                    try:
+                        # A fresh directory per import, so no session overwrites a store another is reading
+                        store_root = Path(__file__).parent / "expression_store"
+                        store_root.mkdir(exist_ok=True)
+                        store_dir = tempfile.mkdtemp(dir=store_root, prefix=f"{Path(expression_file.name).stem}-")
+                        store = ExpressionStore.import_table(
+                            expression_file, store_dir, sep='\t' if file_format == "TSV" else ',',
+                            memory_budget_gb=st.session_state.max_memory_gb,
+                            progress_callback=lambda message, pct: progress_text.text(message)
+                        )
+                        progress_text.empty()
+                        st.session_state.expression_store = store
+                        st.success(f"✅ Stored {store.shape[0]:,} genes × {store.shape[1]:,} samples "
+                                   f"({store.nbytes / 1024 ** 3:.2f} GB on disk)")
+                    except Exception as e:
+                        st.error(f"Error importing expression data: {str(e)}")
+            
+            elif expression_file:
                 try:
                     if file_format == "CSV":
                         df = pd.read_csv(expression_file, index_col=0)
@@ -316,6 +514,60 @@ class PrairieGenomicsEnhanced:
                 except Exception as e:
                     st.error(f"Error loading example data: {str(e)}")
     
+    def show_expression_store(self):
+        """Summarize the on-disk expression store with streamed gene statistics"""
+        st.subheader("💽 On-disk Expression Store")
+        
+        store = st.session_state.expression_store
+        analyzer = self.streaming_analyzer()
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Genes", f"{store.shape[0]:,}")
+        with col2:
+            st.metric("Total Samples", f"{store.shape[1]:,}")
+        with col3:
+            st.metric("On Disk", f"{store.nbytes / 1024 ** 3:.2f} GB")
+        
+        st.caption(f"Analyses stream blocks within a {st.session_state.max_memory_gb} GB memory budget "
+                   "(adjust under Settings → Advanced Settings)")
+        
+        if st.button("📊 Compute Gene Statistics", key="store_gene_statistics"):
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            def update_progress(message, pct):
+                status_text.text(message)
+                progress_bar.progress(min(max(pct, 0), 100) / 100)
+            
+            analyzer.gene_statistics(progress_callback=update_progress)
+            progress_bar.empty()
+            status_text.empty()
+        
+        statistics = analyzer.statistics
+        if statistics is None:
+            return
+        
+        missing_pct = statistics['n_missing'].sum() / (store.shape[0] * store.shape[1]) * 100
+        st.write(f"**Missing values:** {missing_pct:.2f}% · statistics on log2(x + 1) values")
+        st.dataframe(statistics.sort_values('variance', ascending=False).head(100).round(4))
+        
+        # Bring a manageable subset into memory for the rest of the suite
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            n_load = st.number_input("Top-variable genes to load into memory:", 100,
+                                     int(store.shape[0]), min(5000, int(store.shape[0])),
+                                     key="store_load_n_genes")
+        with col2:
+            st.write("")
+            if st.button("📥 Load Subset", key="store_load_subset"):
+                genes = analyzer.top_variable_genes(int(n_load))
+                subset = store.to_dataframe(genes)
+                # Raw store values: PCA offers the store's log2(x + 1) layer by default
+                subset.attrs['source'] = 'expression_store'
+                st.session_state.expression_data = subset
+                st.success(f"✅ Loaded {len(genes):,} genes × {store.shape[1]:,} samples (raw values)")
+    
     def show_data_quality_control(self):
         """Display data quality control metrics"""
         st.subheader("📊 Data Quality Control")
@@ -568,6 +820,15 @@ class PrairieGenomicsEnhanced:
                     elif method == "edgeR":
                         norm_method = st.selectbox("Normalization:", ["TMM", "RLE", "upperquartile"])
                         dispersion = st.selectbox("Dispersion:", ["tagwise", "common", "trended"])
+                    
+                    bootstrap_fc = st.checkbox("Bootstrap log2(x+1) mean-difference intervals", False,
+                                              key="de_bootstrap_fc",
+                                              help="Resample samples within groups to estimate the uncertainty of "
+                                                   "the difference in mean log2(x+1) expression (a separate "
+                                                   "estimate, not an interval for the method's log2FoldChange)")
+                    if bootstrap_fc:
+                        n_bootstrap_fc = st.number_input("Bootstrap replicates:", 100, 10000, 1000,
+                                                         key="de_n_bootstrap")
             
             # Run analysis
             if st.button("🚀 Run Differential Expression Analysis", type="primary"):
@@ -612,6 +873,31 @@ class PrairieGenomicsEnhanced:
                                 expr_subset, design_subset
                             )
                         
+                        group_labels = design_subset[group_column] \
+                            if st.session_state.clinical_data is not None and 'group_column' in locals() \
+                            else design_subset['condition']
+                        groups = group_labels.unique()
+                        
+                        # Bootstrap intervals of the log2(x+1) mean difference (target - reference).
+                        # This is its own estimate with its own point value, reported next to (not as an
+                        # interval of) the model-based log2FoldChange of DESeq2/edgeR.
+                        if bootstrap_fc:
+                            if len(groups) == 2:
+                                self.bootstrap_engine.n_bootstrap = int(n_bootstrap_fc)
+                                fc_intervals = self.bootstrap_engine.fold_change_ci(
+                                    expr_subset, group_labels, reference=groups[0], target=groups[1]
+                                )
+                                results = results.join(fc_intervals.rename(columns={
+                                    'log2FoldChange': 'log2_mean_diff',
+                                    'log2FC_se': 'log2_mean_diff_se',
+                                    'log2FC_ci_lower': 'log2_mean_diff_ci_lower',
+                                    'log2FC_ci_upper': 'log2_mean_diff_ci_upper'
+                                }))
+                                st.info(f"Bootstrap columns log2_mean_diff*: mean log2(x+1) of "
+                                        f"'{groups[1]}' minus '{groups[0]}', with percentile intervals")
+                            else:
+                                st.info("Bootstrap log2FC intervals require exactly 2 groups")
+                        
                         # Add gene symbols
                         if st.session_state.gene_symbols:
                             results['gene_symbol'] = results.index.map(
@@ -622,6 +908,13 @@ class PrairieGenomicsEnhanced:
                         
                         st.session_state.de_results = results
                         
+                        # Design kept for gene set tests that refit the linear model
+                        st.session_state.de_design = {
+                            'groups': group_labels,
+                            'reference': groups[0],
+                            'target': groups[1] if len(groups) > 1 else None
+                        }
+                        
                         # Show results summary
                         significant = results[
                             (results['padj'] < p_threshold) & 
@@ -805,7 +1098,7 @@ class PrairieGenomicsEnhanced:
                 
                 strat_type = st.selectbox(
                     "Stratification by:",
-                    ["Clinical variable", "Gene expression", "DE gene signature"]
+                    ["Clinical variable", "Gene expression", "DE gene signature", "Pathway activity"]
                 )
                 
                 if strat_type == "Clinical variable":
@@ -821,16 +1114,49 @@ class PrairieGenomicsEnhanced:
                         "Expression cutoff:",
                         ["median", "tertile", "quartile"]
                     )
+                elif strat_type == "Pathway activity":
+                    if self.gene_set_store.libraries:
+                        activity_library = st.selectbox("Gene set library:", self.gene_set_store.libraries)
+                        activity_method = st.selectbox(
+                            "Scoring method:",
+                            ["ssGSEA", "Singscore (rank-based)", "Combined z-score"],
+                            key="survival_activity_method"
+                        )
+                        activity_terms = self.gene_set_store.get_library(activity_library).terms.tolist()
+                        activity_term = st.selectbox("Gene set:", activity_terms)
+                        expression_cutoff = st.selectbox(
+                            "Score cutoff:",
+                            ["median", "tertile", "quartile"],
+                            key="survival_activity_cutoff"
+                        )
+                    else:
+                        st.info("Import a local gene set library in the Pathway Analysis tab first")
                 else:
                     if st.session_state.de_results is not None:
                         n_genes = st.slider("Number of top DE genes:", 5, 100, 20)
                         signature_direction = st.selectbox("Signature type:", ["Up-regulated", "Down-regulated", "Both"])
+                        scoring_method = st.selectbox(
+                            "Scoring method:",
+                            ["Mean z-score", "Up minus down", "Singscore (rank-based)"]
+                        )
+                        expression_cutoff = st.selectbox(
+                            "Score cutoff:",
+                            ["median", "tertile", "quartile"]
+                        )
+                    else:
+                        st.info("Run differential expression analysis first to build a signature")
             
             # Analysis parameters
             with st.expander("🔧 Analysis Parameters"):
                 confidence_level = st.slider("Confidence level:", 0.90, 0.99, 0.95)
                 show_risk_table = st.checkbox("Show at-risk numbers", True,
                                              key="survival_show_risk_table")
+                bootstrap_ci = st.checkbox("Bootstrap confidence intervals", False,
+                                          key="survival_bootstrap_ci",
+                                          help="Bootstrap CIs for median survival and hazard ratios")
+                if bootstrap_ci:
+                    n_bootstrap = st.number_input("Bootstrap replicates:", 100, 10000, 1000,
+                                                  key="survival_n_bootstrap")
                 
                 # Cox regression covariates
                 if len(clinical_cols) > 2:
@@ -839,6 +1165,13 @@ class PrairieGenomicsEnhanced:
                         [col for col in clinical_cols if col not in [time_col, event_col]],
                         help="Additional variables for Cox model"
                     )
+                
+                # Gene-level Cox screen
+                run_cox_screen = st.checkbox("Gene-level Cox screen (each gene + covariates)", False,
+                                            key="survival_run_cox_screen",
+                                            help="Fit one Cox model per gene in vectorized batches")
+                if run_cox_screen:
+                    cox_ties = st.selectbox("Tie handling:", ["efron", "breslow"], key="survival_cox_ties")
             
             # Run survival analysis
             if st.button("🚀 Run Survival Analysis", type="primary"):
@@ -867,14 +1200,80 @@ class PrairieGenomicsEnhanced:
                                 target_gene,
                                 expression_cutoff
                             )
+                        elif strat_type == "Pathway activity":
+                            if not self.gene_set_store.libraries:
+                                raise ValueError("A local gene set library is required for pathway stratification")
+                            
+                            activity_methods = {
+                                "ssGSEA": "ssgsea",
+                                "Singscore (rank-based)": "singscore",
+                                "Combined z-score": "zscore"
+                            }
+                            activity_scores = self.pathway_scorer.score_set(
+                                st.session_state.expression_data,
+                                activity_library,
+                                activity_term,
+                                method=activity_methods[activity_method],
+                                gene_symbols=st.session_state.gene_symbols
+                            )
+                            
+                            survival_df = self.survival_analyzer.prepare_survival_data(
+                                st.session_state.clinical_data,
+                                time_col,
+                                event_col,
+                                activity_scores,
+                                f"{activity_term} activity",
+                                expression_cutoff
+                            )
+                        else:
+                            if st.session_state.de_results is None:
+                                raise ValueError("DE results required for signature stratification")
+                            
+                            method_keys = {
+                                "Mean z-score": "mean_z",
+                                "Up minus down": "up_minus_down",
+                                "Singscore (rank-based)": "singscore"
+                            }
+                            signature_scores = self.signature_scorer.score_samples(
+                                st.session_state.expression_data,
+                                st.session_state.de_results,
+                                n_genes=n_genes,
+                                direction=signature_direction,
+                                method=method_keys[scoring_method]
+                            )
+                            
+                            survival_df = self.survival_analyzer.prepare_survival_data(
+                                st.session_state.clinical_data,
+                                time_col,
+                                event_col,
+                                signature_scores,
+                                f"{signature_direction} signature ({n_genes} genes)",
+                                expression_cutoff
+                            )
                         
                         # Kaplan-Meier analysis
-                        if strat_type != "DE gene signature":
+                        if survival_df is not None:
+                            group_col = 'strat_group' if strat_type == "Clinical variable" else 'expression_group'
                             km_results = self.survival_analyzer.kaplan_meier_analysis(
                                 survival_df,
-                                'strat_group' if strat_type == "Clinical variable" else 'expression_group'
+                                group_col
                             )
                             
+                            # Fill in median CIs the analyzer did not provide
+                            if bootstrap_ci:
+                                self.bootstrap_engine.n_bootstrap = int(n_bootstrap)
+                                self.bootstrap_engine.confidence_level = confidence_level
+                                boot_medians = self.bootstrap_engine.km_median_ci(
+                                    survival_df['duration'],
+                                    survival_df['event'],
+                                    survival_df[group_col]
+                                )
+                                
+                                for group, data in km_results['median_survival'].items():
+                                    ci = data.get('confidence_interval')
+                                    if (ci is None or all(v is None for v in ci)) and group in boot_medians:
+                                        data['confidence_interval'] = boot_medians[group]['confidence_interval']
+                            
                             st.session_state.survival_results = km_results
                             
                             # Display results
@@ -885,7 +1284,7 @@ class PrairieGenomicsEnhanced:
                                 km_results,
                                 title=f"Survival Analysis - {strat_type}"
                             )
-                            st.plotly_chart(survival_fig, use_container_width=True)
+                            st.plotly_chart(compact_figure(survival_fig), use_container_width=True)
                             
                             # Statistics summary
                             if 'statistics' in km_results:
@@ -937,12 +1336,22 @@ class PrairieGenomicsEnhanced:
                                 })
                                 st.dataframe(cox_summary, use_container_width=True)
                                 
+                                # Bootstrap hazard ratio intervals
+                                if bootstrap_ci:
+                                    boot_hr = self.bootstrap_engine.hazard_ratio_ci(
+                                        cox_df['duration'],
+                                        cox_df['event'],
+                                        self.cox_fitter.prepare_covariates(cox_df, cox_covariates)
+                                    )
+                                    st.write(f"**Bootstrap intervals** ({self.bootstrap_engine.n_bootstrap} replicates)")
+                                    st.dataframe(boot_hr, use_container_width=True)
+                                
                                 # Forest plot
                                 forest_fig = self.survival_analyzer.create_forest_plot(
                                     cox_results,
                                     title="Cox Regression - Hazard Ratios"
                                 )
-                                st.plotly_chart(forest_fig, use_container_width=True)
+                                st.plotly_chart(compact_figure(forest_fig), use_container_width=True)
                                 
                                 # Model statistics
                                 col1, col2, col3 = st.columns(3)
@@ -952,6 +1361,16 @@ class PrairieGenomicsEnhanced:
                                     st.metric("AIC", f"{cox_results['AIC']:.1f}")
                                 with col3:
                                     st.metric("Log Likelihood", f"{cox_results['log_likelihood']:.1f}")
+                        
+                        # Gene-level Cox screen
+                        if run_cox_screen:
+                            self.run_gene_cox_screen(
+                                time_col,
+                                event_col,
+                                cox_covariates if 'cox_covariates' in locals() else [],
+                                cox_ties,
+                                confidence_level
+                            )
                     
                     except Exception as e:
                         st.error(f"❌ Survival analysis failed: {str(e)}")
@@ -965,6 +1384,62 @@ class PrairieGenomicsEnhanced:
                     st.write("Ready for export and publication!")
                     st.markdown('</div>', unsafe_allow_html=True)
     
+    def run_gene_cox_screen(self, time_col, event_col, covariates, ties, confidence_level):
+        """Fit gene + covariate Cox models for every gene and display the top hits"""
+        clinical = st.session_state.clinical_data
+        if 'sample_id' in clinical.columns:
+            clinical = clinical.set_index('sample_id')
+        
+        # Log transform as for the heatmap and simple DE paths
+        expression = np.log2(st.session_state.expression_data.clip(lower=0) + 1)
+        
+        self.cox_fitter.ties = ties
+        covariate_data = self.cox_fitter.prepare_covariates(clinical, covariates)
+        
+        progress_bar = st.progress(0)
+        
+        def progress_callback(message, progress):
+            progress_bar.progress(progress / 100)
+        
+        screen_results = self.cox_fitter.fit_genes(
+            expression,
+            clinical[time_col],
+            clinical[event_col],
+            covariate_data if covariates else None,
+            confidence_level=confidence_level,
+            progress_callback=progress_callback
+        )
+        
+        # Add gene symbols
+        if st.session_state.gene_symbols:
+            screen_results.insert(0, 'gene_symbol', screen_results.index.map(
+                lambda x: st.session_state.gene_symbols.get(x.split('.')[0], x.split('.')[0])
+            ))
+        
+        screen_results = screen_results.sort_values('wald_p')
+        st.session_state.cox_screen_results = screen_results
+        
+        st.subheader("🧬 Gene-level Cox Screen")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Genes Fitted", len(screen_results))
+        with col2:
+            st.metric("FDR < 0.05", int((screen_results['padj'] < 0.05).sum()))
+        with col3:
+            st.metric("Samples / Events",
+                      f"{screen_results.attrs['n_samples']} / {screen_results.attrs['n_events']}")
+        
+        n_unconverged = int((~screen_results['converged']).sum())
+        if n_unconverged > 0:
+            st.warning(f"⚠️ {n_unconverged:,} of {len(screen_results):,} gene models did not converge "
+                       "(e.g. separation by a few extreme samples); their estimates are unreliable")
+        
+        display_cols = ['hazard_ratio', 'ci_lower', 'ci_upper', 'wald_p', 'lrt_p', 'padj']
+        if 'gene_symbol' in screen_results.columns:
+            display_cols = ['gene_symbol'] + display_cols
+        st.dataframe(screen_results[display_cols].head(50), use_container_width=True)
+    
     def find_gene_expression(self, target_gene):
         """Find gene expression data for target gene"""
         # Try to find by symbol first
@@ -1000,14 +1475,17 @@ class PrairieGenomicsEnhanced:
                 st.subheader("📊 Analysis Type")
                 analysis_type = st.selectbox(
                     "Enrichment method:",
-                    ["Over-representation (Enrichr)", "GSEA Pre-ranked", "Both"]
+                    ["Over-representation (Enrichr)", "GSEA Pre-ranked", "Both",
+                     "CAMERA (competitive, local libraries)"]
                 )
                 
                 # Gene set selection
+                enrichr_libraries = ["GO_Biological_Process_2023", "KEGG_2021_Human", "Reactome_2022", 
+                                     "WikiPathways_2019_Human", "MSigDB_Hallmark_2020"]
+                local_libraries = [lib for lib in self.gene_set_store.libraries if lib not in enrichr_libraries]
                 gene_set_sources = st.multiselect(
                     "Gene set databases:",
-                    ["GO_Biological_Process_2023", "KEGG_2021_Human", "Reactome_2022", 
-                     "WikiPathways_2019_Human", "MSigDB_Hallmark_2020"],
+                    enrichr_libraries + local_libraries,
                     default=["GO_Biological_Process_2023", "KEGG_2021_Human", "Reactome_2022"]
                 )
             
@@ -1029,14 +1507,47 @@ class PrairieGenomicsEnhanced:
                         ["Log2 fold change", "-log10(p-value) * sign(FC)", "t-statistic"]
                     )
             
+            # Local gene set libraries
+            with st.expander("📁 Local Gene Set Libraries"):
+                st.write("Import GMT files once to run enrichment offline against local libraries.")
+                
+                gmt_files = st.file_uploader(
+                    "Import GMT files",
+                    type=['gmt', 'txt'],
+                    accept_multiple_files=True,
+                    help="Library name is taken from the file name (e.g. KEGG_2021_Human.gmt)"
+                )
+                
+                if gmt_files and st.button("📥 Import Libraries"):
+                    for gmt_file in gmt_files:
+                        try:
+                            library = self.gene_set_store.import_gmt(gmt_file, overwrite=True)
+                            st.success(f"✅ Imported {library.name}: {len(library)} gene sets")
+                        except Exception as e:
+                            st.error(f"Failed to import {gmt_file.name}: {str(e)}")
+                
+                if self.gene_set_store.libraries:
+                    st.dataframe(pd.DataFrame(self.gene_set_store.list_libraries()), 
+                               use_container_width=True, hide_index=True)
+                else:
+                    st.info("No local libraries imported yet")
+            
             # Advanced parameters
+            min_gene_set_size, max_gene_set_size, n_permutations = 15, 500, 1000
+            ora_cutoff, fdr_threshold = 0.05, 0.25
             with st.expander("🔧 Advanced Parameters"):
-                if analysis_type in ["GSEA Pre-ranked", "Both"]:
+                if analysis_type in ["GSEA Pre-ranked", "Both", "CAMERA (competitive, local libraries)"]:
                     min_gene_set_size = st.number_input("Min gene set size:", 5, 500, 15)
                     max_gene_set_size = st.number_input("Max gene set size:", 100, 2000, 500)
+                if analysis_type in ["GSEA Pre-ranked", "Both"]:
                     n_permutations = st.number_input("Permutations:", 100, 10000, 1000)
                 
-                fdr_threshold = st.number_input("FDR threshold:", 0.01, 0.3, 0.25)
+                # ORA and GSEA follow different conventions (0.05 vs. 0.25)
+                if "ora" in ANALYSIS_METHODS[analysis_type]:
+                    ora_cutoff = st.number_input("ORA adjusted p-value cutoff:", 0.001, 0.3, 0.05,
+                                                 key="pathway_ora_cutoff")
+                if analysis_type != "Over-representation (Enrichr)":
+                    fdr_threshold = st.number_input("GSEA/CAMERA FDR threshold:", 0.01, 0.3, 0.25)
                 max_pathways_display = st.number_input("Max pathways to display:", 10, 100, 20)
             
             # Run pathway analysis
@@ -1044,6 +1555,7 @@ class PrairieGenomicsEnhanced:
                 with st.spinner("Running pathway enrichment analysis..."):
                     try:
                         results = {}
+                        gene_list = background = ranking = None
                         
                         if analysis_type in ["Over-representation (Enrichr)", "Both"]:
                             # Prepare gene list
@@ -1073,14 +1585,13 @@ class PrairieGenomicsEnhanced:
                             
                             st.info(f"Analyzing {len(gene_list)} genes...")
                             
-                            # Run Enrichr
-                            enrichr_results = self.pathway_analyzer.enrichr_analysis(
-                                gene_list,
-                                databases=gene_set_sources,
-                                cutoff=fdr_threshold
-                            )
-                            
-                            results['enrichr'] = enrichr_results
+                            # Local ORA uses the DE-tested genes as background
+                            background = de_results.index.tolist()
+                            if st.session_state.gene_symbols:
+                                background = [
+                                    st.session_state.gene_symbols.get(g.split('.')[0], g.split('.')[0])
+                                    for g in background
+                                ]
                         
                         if analysis_type in ["GSEA Pre-ranked", "Both"]:
                             # Prepare ranked gene list
@@ -1099,19 +1610,94 @@ class PrairieGenomicsEnhanced:
                                     st.session_state.gene_symbols.get(gid.split('.')[0], gid.split('.')[0])
                                     for gid in ranking.index
                                 ]
+                        
+                        # Local libraries are scored together in one task per method (stacked ORA
+                        # product, shared GSEA permutation null); remote Enrichr calls are one task each
+                        run_ora = "ora" in ANALYSIS_METHODS[analysis_type]
+                        run_gsea = "gsea" in ANALYSIS_METHODS[analysis_type]
+                        tasks = enrichment_tasks(
+                            analysis_type, gene_set_sources, self.gene_set_store,
+                            local_runners={
+                                'ora': lambda genes, libs, **kw: self.ora_analyzer.enrichr_analysis(genes, libs, **kw),
+                                'gsea': lambda ranked, libs, **kw: self.gsea_engine.gsea_preranked(ranked, libs, **kw)
+                            },
+                            remote_runners={
+                                'ora': lambda genes, lib, background=None, **kw:
+                                    self.pathway_analyzer.enrichr_analysis(genes, databases=[lib], **kw).get(lib),
+                                'gsea': lambda ranked, lib, **kw:
+                                    self.pathway_analyzer.gsea_preranked(ranked, gene_sets=lib, **kw)
+                            },
+                            gene_list=gene_list,
+                            ranking=ranking,
+                            ora_params={'background': background, 'cutoff': ora_cutoff},
+                            gsea_params={
+                                'min_size': min_gene_set_size,
+                                'max_size': max_gene_set_size,
+                                'permutation_num': n_permutations
+                            }
+                        )
+                        
+                        # Each library's table is shown as soon as its result arrives
+                        if tasks:
+                            results['enrichr'] = {} if run_ora else None
+                            n_libraries = sum(len(task.libraries) for task in tasks)
+                            task_status = st.empty()
+                            task_progress = st.progress(0)
+                            ora_section = st.container() if run_ora else None
+                            gsea_section = st.container() if run_gsea else None
+                            if ora_section is not None:
+                                ora_section.subheader("📊 Over-representation Analysis Results")
+                            if gsea_section is not None:
+                                gsea_section.subheader("🧬 GSEA Results")
+                            completed_lines = []
                             
-                            # Run GSEA
-                            for gene_set in gene_set_sources:
-                                gsea_result = self.pathway_analyzer.gsea_preranked(
-                                    ranking,
-                                    gene_sets=gene_set,
-                                    min_size=min_gene_set_size,
-                                    max_size=max_gene_set_size,
-                                    permutation_num=n_permutations
-                                )
+                            for n_done, (task, library, task_result, from_cache, error) in enumerate(
+                                self.enrichment_orchestrator.run(tasks), start=1
+                            ):
+                                label = f"{task.method.upper()} · {library}"
+                                if error is not None:
+                                    completed_lines.append(f"❌ {label}: {error}")
+                                elif task_result:
+                                    if task.method == "ora":
+                                        results['enrichr'][library] = task_result
+                                        with ora_section:
+                                            self.show_ora_result(library, task_result)
+                                    else:
+                                        results[f'gsea_{library}'] = task_result
+                                        with gsea_section:
+                                            self.show_gsea_result(library, task_result, fdr_threshold)
+                                    completed_lines.append(f"✅ {label}{' (cached)' if from_cache else ''}")
+                                else:
+                                    completed_lines.append(f"⚪ {label}: no results")
                                 
-                                if gsea_result:
-                                    results[f'gsea_{gene_set}'] = gsea_result
+                                task_status.markdown("  \n".join(completed_lines))
+                                task_progress.progress(n_done / n_libraries)
+                            
+                            if results.get('enrichr') is None:
+                                results.pop('enrichr', None)
+                        
+                        if analysis_type == "CAMERA (competitive, local libraries)":
+                            de_design = st.session_state.de_design
+                            if de_design is None or de_design['target'] is None:
+                                raise ValueError("CAMERA needs a two-group DE design; re-run differential expression")
+                            
+                            local_sources = [db for db in gene_set_sources if db in self.gene_set_store]
+                            if not local_sources:
+                                raise ValueError("CAMERA runs on local libraries; import GMT files first")
+                            
+                            camera_results = self.camera_test.camera(
+                                st.session_state.expression_data,
+                                de_design['groups'],
+                                reference=de_design['reference'],
+                                target=de_design['target'],
+                                databases=local_sources,
+                                gene_symbols=st.session_state.gene_symbols,
+                                min_size=min_gene_set_size,
+                                max_size=max_gene_set_size,
+                                cutoff=fdr_threshold
+                            )
+                            for db_name, camera_result in camera_results.items():
+                                results[f'camera_{db_name}'] = camera_result
                         
                         st.session_state.pathway_results = results
                         
@@ -1119,70 +1705,23 @@ class PrairieGenomicsEnhanced:
                         if results:
                             st.success(f"✅ Pathway analysis complete!")
                             
-                            # Results tabs
-                            if 'enrichr' in results:
-                                st.subheader("📊 Over-representation Analysis Results")
-                                
-                                for db_name, db_results in results['enrichr'].items():
-                                    if db_results['significant_terms'] > 0:
-                                        st.write(f"**{db_name}**: {db_results['significant_terms']} significant pathways")
-                                        
-                                        # Top pathways table
-                                        top_pathways = db_results['results'].head(10)
-                                        display_cols = ['Term', 'Adjusted P-value', 'Overlap', 'Combined Score']
-                                        st.dataframe(top_pathways[display_cols], use_container_width=True)
-                                        
-                                        # Create enrichment plot
-                                        if len(top_pathways) > 0:
-                                            plot_data = self.pathway_analyzer.create_enrichment_plot(
-                                                top_pathways,
-                                                title=f"{db_name} Enrichment",
-                                                top_n=min(15, len(top_pathways))
-                                            )
-                                            
-                                            if plot_data:
-                                                # Create plotly bar plot
-                                                fig = go.Figure(data=go.Bar(
-                                                    x=plot_data['x'],
-                                                    y=plot_data['y'],
-                                                    orientation='h',
-                                                    text=plot_data['text'],
-                                                    hovertext=plot_data['hover_info'],
-                                                    marker_color='lightblue'
-                                                ))
-                                                
-                                                fig.update_layout(
-                                                    title=plot_data['title'],
-                                                    xaxis_title=plot_data['x_title'],
-                                                    yaxis_title=plot_data['y_title'],
-                                                    height=max(400, len(plot_data['y']) * 25)
-                                                )
-                                                
-                                                st.plotly_chart(fig, use_container_width=True)
-                                    else:
-                                        st.info(f"No significant pathways found in {db_name}")
-                            
-                            # GSEA results
-                            gsea_results = {k: v for k, v in results.items() if k.startswith('gsea_')}
-                            if gsea_results:
-                                st.subheader("🧬 GSEA Results")
+                            # CAMERA results
+                            camera_results = {k: v for k, v in results.items() if k.startswith('camera_')}
+                            if camera_results:
+                                st.subheader("🧮 CAMERA Competitive Test Results")
                                 
-                                for gsea_name, gsea_data in gsea_results.items():
-                                    db_name = gsea_name.replace('gsea_', '')
+                                for camera_name, camera_data in camera_results.items():
+                                    db_name = camera_name.replace('camera_', '')
+                                    camera_df = camera_data['results']
+                                    significant_camera = camera_df[camera_df['FDR'] < fdr_threshold]
                                     
-                                    if 'results' in gsea_data:
-                                        gsea_df = gsea_data['results']
-                                        significant_gsea = gsea_df[gsea_df['FDR q-val'] < fdr_threshold]
-                                        
-                                        if len(significant_gsea) > 0:
-                                            st.write(f"**{db_name}**: {len(significant_gsea)} significant gene sets")
-                                            
-                                            # Display top results
-                                            display_cols = ['Term', 'NES', 'FDR q-val', 'FWER p-val']
-                                            st.dataframe(significant_gsea.head(10)[display_cols], 
-                                                       use_container_width=True)
-                                        else:
-                                            st.info(f"No significant gene sets in {db_name}")
+                                    if len(significant_camera) > 0:
+                                        st.write(f"**{db_name}**: {len(significant_camera)} significant gene sets")
+                                        display_cols = ['Term', 'NGenes', 'Direction', 'Correlation', 'FDR']
+                                        st.dataframe(significant_camera.head(max_pathways_display)[display_cols],
+                                                   use_container_width=True)
+                                    else:
+                                        st.info(f"No significant gene sets in {db_name}")
                         else:
                             st.warning("No significant results found. Try adjusting parameters.")
                     
@@ -1204,6 +1743,65 @@ class PrairieGenomicsEnhanced:
                     st.write("Ready for visualization and export!")
                     st.markdown('</div>', unsafe_allow_html=True)
     
+    def show_ora_result(self, db_name, db_results):
+        """Top over-represented terms of one library (table and bar plot)"""
+        if db_results['significant_terms'] == 0:
+            st.info(f"No significant pathways found in {db_name}")
+            return
+        
+        st.write(f"**{db_name}**: {db_results['significant_terms']} significant pathways")
+        
+        # Top pathways table
+        top_pathways = db_results['results'].head(10)
+        display_cols = ['Term', 'Adjusted P-value', 'Overlap', 'Combined Score']
+        st.dataframe(top_pathways[display_cols], use_container_width=True)
+        
+        # Create enrichment plot
+        if len(top_pathways) > 0:
+            plot_data = self.pathway_analyzer.create_enrichment_plot(
+                top_pathways,
+                title=f"{db_name} Enrichment",
+                top_n=min(15, len(top_pathways))
+            )
+            
+            if plot_data:
+                # Create plotly bar plot
+                fig = go.Figure(data=go.Bar(
+                    x=plot_data['x'],
+                    y=plot_data['y'],
+                    orientation='h',
+                    text=plot_data['text'],
+                    hovertext=plot_data['hover_info'],
+                    marker_color='lightblue'
+                ))
+                
+                fig.update_layout(
+                    title=plot_data['title'],
+                    xaxis_title=plot_data['x_title'],
+                    yaxis_title=plot_data['y_title'],
+                    height=max(400, len(plot_data['y']) * 25)
+                )
+                
+                st.plotly_chart(compact_figure(fig), use_container_width=True)
+    
+    def show_gsea_result(self, db_name, gsea_data, fdr_threshold):
+        """Significant GSEA gene sets of one library"""
+        if 'results' not in gsea_data:
+            return
+        
+        gsea_df = gsea_data['results']
+        significant_gsea = gsea_df[gsea_df['FDR q-val'] < fdr_threshold]
+        
+        if len(significant_gsea) > 0:
+            st.write(f"**{db_name}**: {len(significant_gsea)} significant gene sets")
+            
+            # Display top results
+            display_cols = ['Term', 'NES', 'FDR q-val', 'FWER p-val']
+            st.dataframe(significant_gsea.head(10)[display_cols], 
+                       use_container_width=True)
+        else:
+            st.info(f"No significant gene sets in {db_name}")
+    
     def literature_search_section(self, tab):
         """Literature search and analysis interface"""
         with tab:
@@ -1234,7 +1832,7 @@ class PrairieGenomicsEnhanced:
                         use_de_genes = st.checkbox("Use significant DE genes", True,
                                                   key="literature_use_de_genes")
                         if use_de_genes:
-                            max_genes = st.slider("Maximum genes to search:", 5, 50, 20)
+                            max_genes = st.slider("Maximum genes to search:", 5, 500, 20)
                         else:
                             gene_input = st.text_area(
                                 "Enter gene symbols (one per line):",
@@ -1272,6 +1870,12 @@ class PrairieGenomicsEnhanced:
                 
                 years_back = st.slider("Years to search back:", 1, 20, 5)
                 max_results_per_search = st.slider("Max results per search:", 10, 200, 50)
+                ncbi_api_key = st.text_input(
+                    "NCBI API key (optional):",
+                    value=os.environ.get("NCBI_API_KEY", ""),
+                    type="password",
+                    help="Raises the PubMed request limit from 3 to 10 per second"
+                )
                 
                 # Literature analysis options
                 with st.expander("📊 Analysis Options"):
@@ -1282,7 +1886,8 @@ class PrairieGenomicsEnhanced:
                     analyze_abstracts = st.checkbox("Analyze abstracts", True,
                                                    key="literature_analyze_abstracts")
                     if analyze_abstracts:
-                        st.info("Abstract analysis will identify common themes and keywords")
+                        st.info("Abstract analysis ranks key terms, gene co-mentions and "
+                                "understudied DE genes across the retrieved abstracts")
             
             # Run literature search
             if st.button("🔍 Start Literature Search", type="primary"):
@@ -1293,14 +1898,16 @@ class PrairieGenomicsEnhanced:
                         if search_type == "Individual genes":
                             disease_ctx = disease_context if disease_context != "None" else None
                             
-                            gene_results = self.pubmed_searcher.search_gene(
-                                target_gene,
-                                disease_context=disease_ctx,
-                                years_back=years_back,
-                                max_results=max_results_per_search
+                            # Same rate-limited, cached client as the list searches
+                            eutils = AsyncEUtilsClient(api_key=ncbi_api_key, store=self.literature_store)
+                            gene_results = eutils.search(
+                                {target_gene: eutils.gene_query(target_gene, disease_ctx)},
+                                max_results=max_results_per_search,
+                                years_back=years_back
                             )
                             
-                            results[target_gene] = gene_results
+                            results[target_gene] = gene_results[target_gene]
+                            st.session_state.publication_counts.update(publication_counts(gene_results))
                         
                         elif search_type == "Gene list":
                             if 'use_de_genes' in locals() and use_de_genes and st.session_state.de_results is not None:
@@ -1323,18 +1930,28 @@ class PrairieGenomicsEnhanced:
                             else:
                                 gene_list = [gene.strip() for gene in gene_input.split('\n') if gene.strip()]
                             
+                            search_status = st.empty()
+                            search_progress = st.progress(0)
+                            
                             def progress_callback(message, progress):
-                                st.info(message)
+                                search_status.info(message)
+                                search_progress.progress(progress / 100)
                             
+                            # Concurrent, rate-limited searches for the whole list
                             disease_ctx = disease_context if disease_context != "None" else None
-                            multi_gene_results = self.pubmed_searcher.search_gene_list(
+                            eutils = AsyncEUtilsClient(api_key=ncbi_api_key, store=self.literature_store)
+                            multi_gene_results = eutils.search_gene_list(
                                 gene_list,
                                 disease_context=disease_ctx,
-                                max_genes=min(len(gene_list), 20),
+                                max_results=max_results_per_search,
+                                years_back=years_back,
                                 progress_callback=progress_callback
                             )
                             
                             results = multi_gene_results
+                            st.session_state.publication_counts.update(
+                                publication_counts(multi_gene_results['gene_results'])
+                            )
                         
                         elif search_type == "Pathway terms":
                             if st.session_state.pathway_results is not None and 'enrichr' in st.session_state.pathway_results:
@@ -1351,13 +1968,18 @@ class PrairieGenomicsEnhanced:
                             
                             disease_ctx = disease_context if disease_context != "None" else None
                             
-                            for pathway in pathway_list:
-                                pathway_results = self.pubmed_searcher.search_pathway(
-                                    pathway,
-                                    disease_context=disease_ctx,
-                                    max_results=max_results_per_search
-                                )
+                            # All pathway searches run concurrently; results arrive as they finish
+                            eutils = AsyncEUtilsClient(api_key=ncbi_api_key, store=self.literature_store)
+                            search_status = st.empty()
+                            queries = {pathway: eutils.pathway_query(pathway, disease_ctx) for pathway in pathway_list}
+                            for pathway, pathway_results in eutils.search_stream(
+                                queries, max_results=max_results_per_search
+                            ):
                                 results[pathway] = pathway_results
+                                search_status.info(
+                                    f"Searched {len(results)}/{len(queries)} pathways "
+                                    f"({pathway}: {pathway_results['total_results']} articles)"
+                                )
                         
                         else:  # Custom query
                             # Direct PubMed search with custom query
@@ -1472,6 +2094,20 @@ class PrairieGenomicsEnhanced:
                                         bibliography,
                                         height=400
                                     )
+                            
+                            # Corpus analysis of every retrieved abstract
+                            if analyze_abstracts:
+                                search_results = results.get('gene_results', results)
+                                pmids = [
+                                    article.get('pmid') for result in search_results.values()
+                                    if isinstance(result, dict)
+                                    for article in result.get('articles', []) if article.get('pmid')
+                                ]
+                                self.literature_store.put_articles(
+                                    article for result in search_results.values() if isinstance(result, dict)
+                                    for article in result.get('articles', [])
+                                )
+                                self.show_abstract_analysis(pmids)
                         
                         else:
                             st.warning("No results found. Try different search terms or parameters.")
@@ -1479,6 +2115,41 @@ class PrairieGenomicsEnhanced:
                     except Exception as e:
                         st.error(f"❌ Literature search failed: {str(e)}")
             
+            # Offline full-text search over every article fetched so far
+            with st.expander("🗄️ Offline Literature Library"):
+                store_stats = self.literature_store.stats()
+                st.write(f"**{store_stats['articles']:,}** stored articles, "
+                         f"**{store_stats['cached_queries']:,}** cached searches "
+                         f"({store_stats['size_mb']:.1f} MB)")
+                
+                offline_query = st.text_input(
+                    "Search stored titles and abstracts:",
+                    placeholder='e.g. TP53 AND "drug resistance", immun*',
+                    key="literature_offline_query"
+                )
+                offline_col1, offline_col2 = st.columns(2)
+                with offline_col1:
+                    offline_limit = st.slider("Max articles:", 10, 500, 50, key="literature_offline_limit")
+                with offline_col2:
+                    offline_since = st.number_input("Published since (0 = any):", 0, 2100, 0,
+                                                    key="literature_offline_since")
+                
+                if offline_query:
+                    offline_hits = self.literature_store.search(
+                        offline_query, limit=offline_limit, since_year=offline_since or None
+                    )
+                    if offline_hits.empty:
+                        st.info("No stored articles match this query.")
+                    else:
+                        st.dataframe(
+                            offline_hits.drop(columns=['score']),
+                            use_container_width=True,
+                            height=400
+                        )
+                
+                if st.button("📊 Analyze All Stored Abstracts", key="literature_analyze_library"):
+                    self.show_abstract_analysis(None)
+            
             # Current results status
             if st.session_state.literature_results is not None:
                 with st.container():
@@ -1488,6 +2159,67 @@ class PrairieGenomicsEnhanced:
                     st.write("Ready for export and citation management!")
                     st.markdown('</div>', unsafe_allow_html=True)
     
+    def show_abstract_analysis(self, pmids):
+        """TF-IDF themes, gene co-mentions and novelty for stored abstracts"""
+        # Gene index: DE gene symbols when available, otherwise all converted symbols
+        de_results = st.session_state.de_results
+        if de_results is not None and 'gene_symbol' in de_results.columns:
+            gene_index = de_results['gene_symbol'].dropna().astype(str).unique()
+        elif st.session_state.gene_symbols:
+            gene_index = list(st.session_state.gene_symbols.values())
+        else:
+            gene_index = []
+        
+        status = st.empty()
+        progress = st.progress(0)
+        
+        def progress_callback(message, pct):
+            status.info(message)
+            progress.progress(min(pct, 100) / 100)
+        
+        try:
+            analysis = self.abstract_analyzer.analyze(
+                gene_index, de_results=de_results, pmids=pmids,
+                publication_counts=st.session_state.publication_counts,
+                progress_callback=progress_callback
+            )
+        except Exception as e:
+            st.error(f"❌ Abstract analysis failed: {str(e)}")
+            return
+        finally:
+            status.empty()
+            progress.empty()
+        
+        if analysis['n_documents'] == 0:
+            st.info("No stored abstracts to analyze")
+            return
+        
+        st.subheader(f"🧠 Abstract Analysis ({analysis['n_documents']:,} articles)")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Key terms (TF-IDF)**")
+            st.dataframe(analysis['top_terms'], use_container_width=True, height=350)
+        with col2:
+            st.write("**Most-mentioned genes**")
+            st.dataframe(analysis['gene_mentions'].head(50), use_container_width=True, height=350)
+        
+        if not analysis['co_mentions'].empty:
+            st.write("**Gene co-mentions**")
+            st.dataframe(analysis['co_mentions'].head(100), use_container_width=True)
+        
+        if 'gene_novelty' in analysis:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**Understudied DE genes** (significance vs. PubMed publications)")
+                if analysis['gene_novelty'].empty:
+                    st.info("Search PubMed for individual genes or a gene list to rank genes by novelty")
+                else:
+                    st.dataframe(analysis['gene_novelty'].head(50), use_container_width=True, height=350)
+                    st.caption("Publication counts are the total PubMed hits of each gene's search query")
+            with col2:
+                st.write("**Terms linked to significant genes**")
+                st.dataframe(analysis['term_novelty'], use_container_width=True, height=350)
+    
     def advanced_visualizations_section(self, tab):
         """Advanced visualization and plotting interface"""
         with tab:
@@ -1517,8 +2249,10 @@ class PrairieGenomicsEnhanced:
                 "Choose visualization:",
                 [
                     "🌋 Enhanced Volcano Plot",
+                    "📉 MA & Mean-Variance Plots",
                     "🔥 Interactive Heatmap", 
                     "📊 PCA Analysis",
+                    "🧭 Sample Similarity",
                     "📈 Survival Curves",
                     "🔬 Pathway Networks",
                     "📊 Multi-panel Figure",
@@ -1536,12 +2270,18 @@ class PrairieGenomicsEnhanced:
             if viz_type == "🌋 Enhanced Volcano Plot":
                 self.create_enhanced_volcano_plot(journal_style)
             
+            elif viz_type == "📉 MA & Mean-Variance Plots":
+                self.create_density_diagnostics()
+            
             elif viz_type == "🔥 Interactive Heatmap":
                 self.create_interactive_heatmap(journal_style)
             
             elif viz_type == "📊 PCA Analysis":
                 self.create_pca_visualization(journal_style)
             
+            elif viz_type == "🧭 Sample Similarity":
+                self.create_sample_similarity_view()
+            
             elif viz_type == "📈 Survival Curves":
                 self.create_survival_visualization(journal_style)
             
@@ -1585,41 +2325,146 @@ class PrairieGenomicsEnhanced:
         plot_title = st.text_input("Plot title:", "Differential Gene Expression",
                                   key="volcano_plot_title")
         
+        # Interactive WebGL preview with density-thinned background genes
+        if st.checkbox("Interactive preview", True, key="volcano_interactive_preview"):
+            max_background = st.slider("Max non-significant genes drawn:", 1000, 20000, 5000,
+                                       step=1000, key="volcano_max_background")
+            self.volcano_renderer.max_background_points = max_background
+            fig, volcano_stats = self.volcano_renderer.create_volcano_plot(
+                st.session_state.de_results,
+                title=plot_title,
+                p_cutoff=p_cutoff,
+                fc_cutoff=fc_cutoff,
+                highlight_genes=highlight_genes,
+                point_size=point_size
+            )
+            # Drawn at its fixed size (labels are laid out in pixels); unchanged DE results
+            # and settings reuse the encoded arrays without re-hashing
+            st.plotly_chart(compact_figure(fig, source=st.session_state.de_results,
+                                           version=("volcano", p_cutoff, fc_cutoff, max_background,
+                                                    tuple(highlight_genes), point_size)),
+                            use_container_width=False)
+            self.figure_registry.register(fig, "volcano")
+            st.caption(f"{volcano_stats['points_drawn']:,} of {volcano_stats['total_genes']:,} genes drawn; "
+                       "all significant and highlighted genes are shown")
+            unplaced = volcano_stats['highlighted'] - volcano_stats.get('labels_placed', 0)
+            if unplaced > 0:
+                st.caption(f"{unplaced} highlighted gene label(s) omitted to avoid overlaps "
+                           "(hover the yellow points to identify them)")
+        
         if st.button("Generate Volcano Plot", type="primary", key="generate_volcano_plot"):
             try:
-                # Use visualization exporter
-                plot_results = self.viz_exporter.create_volcano_plot(
-                    st.session_state.de_results,
-                    title=plot_title,
-                    p_cutoff=p_cutoff,
-                    fc_cutoff=fc_cutoff,
-                    highlight_genes=highlight_genes,
-                    journal_style=journal_style
+                # Publication export renders in the background (cached per parameters)
+                self.submit_figure_export('volcano_plot', st.session_state.de_results, {
+                    'title': plot_title,
+                    'p_cutoff': p_cutoff,
+                    'fc_cutoff': fc_cutoff,
+                    'highlight_genes': highlight_genes
+                }, journal_style)
+            except Exception as e:
+                st.error(f"❌ Failed to create volcano plot: {str(e)}")
+        
+        plot_results = self.show_figure_export('volcano_plot', "volcano plot")
+        if plot_results is not None and 'statistics' in plot_results:
+            # Display plot statistics
+            stats = plot_results['statistics']
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Total Genes", stats['total_genes'])
+            with col2:
+                st.metric("Up-regulated", stats['up_regulated'])
+            with col3:
+                st.metric("Down-regulated", stats['down_regulated'])
+            with col4:
+                st.metric("Total Significant", stats['total_significant'])
+    
+    def create_density_diagnostics(self):
+        """MA and mean-variance plots over all genes (hexbin density with fitted trends)"""
+        expression_data = st.session_state.expression_data
+        if st.session_state.de_results is None and expression_data is None \
+                and st.session_state.expression_store is None:
+            st.warning("⚠️ No differential expression results or expression data available!")
+            return
+        
+        st.subheader("📉 MA & Mean-Variance Plots")
+        st.caption("Genes are aggregated into hexagonal bins on the server, so the plots stay "
+                   "light at any genome size; hover a hexagon for its gene count.")
+        
+        # MA plot from the DE results
+        de_results = st.session_state.de_results
+        if de_results is not None:
+            st.markdown("#### MA Plot")
+            col1, col2 = st.columns(2)
+            with col1:
+                p_cutoff = st.slider("P-value cutoff:", 0.001, 0.1, 0.05, step=0.001, key="ma_p_cutoff")
+            with col2:
+                fc_cutoff = st.slider("Fold change cutoff:", 0.1, 5.0, 1.0, step=0.1, key="ma_fc_cutoff")
+            
+            highlight_genes = []
+            if st.session_state.gene_symbols:
+                highlight_genes = st.multiselect(
+                    "Highlight specific genes:",
+                    list(st.session_state.gene_symbols.values())[:50],
+                    key="ma_highlight_genes"
                 )
+            
+            # Results without a baseMean column use the mean of the expression matrix
+            has_mean = any(column in de_results.columns for column in MEAN_COLUMNS)
+            mean_values = None
+            if not has_mean and expression_data is not None:
+                mean_values = expression_data.select_dtypes(include=[np.number]).mean(axis=1)
+            
+            if not has_mean and mean_values is None:
+                st.info("DE results carry no mean expression column; load expression data for the MA plot.")
+            else:
+                try:
+                    fig, ma_stats = self.density_renderer.ma_plot(
+                        de_results, p_cutoff=p_cutoff, fc_cutoff=fc_cutoff,
+                        highlight_genes=highlight_genes, mean_values=mean_values
+                    )
+                    st.plotly_chart(compact_figure(fig), use_container_width=False)
+                    self.figure_registry.register(fig, "ma")
+                    st.caption(f"{ma_stats['total_genes']:,} genes in {ma_stats['hexagons']:,} hexagons; "
+                               f"{ma_stats['up_regulated']:,} up / {ma_stats['down_regulated']:,} down "
+                               f"(the {self.density_renderer.max_marked} most significant of each drawn)")
+                except Exception as e:
+                    st.error(f"❌ Failed to create MA plot: {str(e)}")
+        
+        # Mean-variance trend from per-gene statistics
+        if expression_data is not None or st.session_state.expression_store is not None:
+            st.markdown("#### Mean-Variance Trend")
+            counts = False
+            if expression_data is not None:
+                values = expression_data.select_dtypes(include=[np.number]).values
+                is_counts = values.size > 0 and np.nanmin(values) >= 0 and np.allclose(values, np.round(values))
+                scale = st.radio(
+                    "Scale:",
+                    ["log2(x + 1): standard deviation vs mean", "Raw counts: variance vs mean (NB dispersion fit)"],
+                    index=0, horizontal=True, key="mean_variance_scale",
+                    disabled=not is_counts,
+                    help="The negative binomial fit needs raw integer counts"
+                )
+                counts = is_counts and scale.startswith("Raw")
                 
-                # Display plot statistics
-                if 'statistics' in plot_results:
-                    stats = plot_results['statistics']
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        st.metric("Total Genes", stats['total_genes'])
-                    with col2:
-                        st.metric("Up-regulated", stats['up_regulated'])
-                    with col3:
-                        st.metric("Down-regulated", stats['down_regulated'])
-                    with col4:
-                        st.metric("Total Significant", stats['total_significant'])
-                
-                # Show file paths
-                if 'figure_paths' in plot_results:
-                    st.success("✅ Publication-ready volcano plot generated!")
-                    
-                    for format_type, file_path in plot_results['figure_paths'].items():
-                        st.info(f"📁 {format_type.upper()} saved: {file_path}")
-                
+                data = expression_data.select_dtypes(include=[np.number])
+                if not counts:
+                    data = np.log2(data.clip(lower=0) + 1)
+                gene_statistics = pd.DataFrame({'mean': data.mean(axis=1), 'variance': data.var(axis=1, ddof=1)})
+            else:
+                st.caption("On-disk expression store: statistics of log2(x + 1) values, streamed in blocks")
+                gene_statistics = self.streaming_analyzer().gene_statistics()
+            
+            try:
+                fig, mv_stats = self.density_renderer.mean_variance_plot(gene_statistics, counts=counts)
+                st.plotly_chart(compact_figure(fig), use_container_width=False)
+                self.figure_registry.register(fig, "mean_variance")
+                if counts:
+                    st.caption(f"Fitted dispersion trend: {mv_stats['asymptotic_dispersion']:.3g} + "
+                               f"{mv_stats['extra_poisson']:.3g} / mean "
+                               f"(biological CV ≈ {np.sqrt(mv_stats['asymptotic_dispersion']):.0%} for highly expressed genes)")
             except Exception as e:
-                st.error(f"❌ Failed to create volcano plot: {str(e)}")
+                st.error(f"❌ Failed to create mean-variance plot: {str(e)}")
     
     def create_interactive_heatmap(self, journal_style):
         """Create interactive heatmap visualization"""
@@ -1633,19 +2478,28 @@ class PrairieGenomicsEnhanced:
         col1, col2 = st.columns(2)
         
         with col1:
+            lod_mode = st.checkbox("Multi-resolution mode (large matrices)", False,
+                                   key="heatmap_lod_mode",
+                                   help="Precomputes aggregated levels; coarse overview first, "
+                                        "full detail when zoomed into a window")
             if st.session_state.de_results is not None:
                 use_de_genes = st.checkbox("Use significant DE genes only", True,
                                           key="heatmap_use_de_genes")
                 if use_de_genes:
-                    n_genes = st.slider("Number of top DE genes:", 20, 200, 50)
+                    n_genes = st.slider("Number of top DE genes:", 20, 5000 if lod_mode else 200, 50)
             else:
-                n_genes = st.slider("Number of top variable genes:", 20, 500, 100)
+                n_genes = st.slider("Number of top variable genes:", 20, 5000 if lod_mode else 500, 100)
         
         with col2:
             cluster_rows = st.checkbox("Cluster genes", True,
                                       key="heatmap_cluster_rows")
             cluster_cols = st.checkbox("Cluster samples", True,
                                       key="heatmap_cluster_cols")
+            if cluster_rows or cluster_cols:
+                cluster_metric = st.selectbox("Distance:", HeatmapClusterer.METRICS,
+                                              key="heatmap_cluster_metric")
+                cluster_method = st.selectbox("Linkage:", HeatmapClusterer.METHODS,
+                                              key="heatmap_cluster_method")
             color_scale = st.selectbox("Color scale:", ["RdBu_r", "viridis", "plasma"])
         
         plot_title = st.text_input("Heatmap title:", "Gene Expression Heatmap",
@@ -1677,6 +2531,16 @@ class PrairieGenomicsEnhanced:
                 heatmap_data = np.log2(heatmap_data + 1)
                 heatmap_data = heatmap_data.subtract(heatmap_data.mean(axis=1), axis=0)
                 
+                # Reorder by cached trees (recomputed only when the gene selection changes)
+                if cluster_rows or cluster_cols:
+                    self.heatmap_clusterer.metric = cluster_metric
+                    self.heatmap_clusterer.method = cluster_method
+                    with st.spinner("Clustering..."):
+                        heatmap_data, _, _ = self.heatmap_clusterer.order(
+                            heatmap_data, cluster_rows=cluster_rows, cluster_cols=cluster_cols,
+                            layer="log2_centered"
+                        )
+                
                 # Create interactive plotly heatmap
                 gene_labels = heatmap_data.index.tolist()
                 if st.session_state.gene_symbols:
@@ -1685,45 +2549,99 @@ class PrairieGenomicsEnhanced:
                         for gid in gene_labels
                     ]
                 
-                fig = go.Figure(data=go.Heatmap(
-                    z=heatmap_data.values,
-                    x=heatmap_data.columns,
-                    y=gene_labels,
-                    colorscale=color_scale,
-                    zmid=0,
-                    hovertemplate='Sample: %{x}<br>Gene: %{y}<br>Expression: %{z:.2f}<extra></extra>'
-                ))
-                
-                fig.update_layout(
-                    title=plot_title,
-                    width=max(800, len(heatmap_data.columns) * 20),
-                    height=max(600, len(heatmap_data) * 15),
-                    xaxis_title="Samples",
-                    yaxis_title="Genes"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Also create publication-ready version
-                plot_results = self.viz_exporter.create_heatmap(
-                    heatmap_data,
-                    row_clustering=cluster_rows,
-                    col_clustering=cluster_cols,
-                    title=plot_title,
-                    journal_style=journal_style
-                )
+                if lod_mode:
+                    # Large matrices are served from the pyramid (see below) instead
+                    with st.spinner("Building multi-resolution levels..."):
+                        st.session_state.heatmap_pyramid = {
+                            'pyramid': HeatmapPyramid(heatmap_data.set_axis(gene_labels, axis=0)),
+                            'title': plot_title,
+                            'color_scale': color_scale
+                        }
                 
-                if 'figure_paths' in plot_results:
-                    st.success("✅ Publication-ready heatmap generated!")
-                    for format_type, file_path in plot_results['figure_paths'].items():
-                        st.info(f"📁 {format_type.upper()} saved: {file_path}")
+                else:
+                    fig = go.Figure(data=go.Heatmap(
+                        z=heatmap_data.values,
+                        x=heatmap_data.columns,
+                        y=gene_labels,
+                        colorscale=color_scale,
+                        zmid=0,
+                        hovertemplate='Sample: %{x}<br>Gene: %{y}<br>Expression: %{z:.2f}<extra></extra>'
+                    ))
+                    
+                    fig.update_layout(
+                        title=plot_title,
+                        width=max(800, len(heatmap_data.columns) * 20),
+                        height=max(600, len(heatmap_data) * 15),
+                        xaxis_title="Samples",
+                        yaxis_title="Genes"
+                    )
+                    
+                    st.plotly_chart(compact_figure(fig), use_container_width=True)
+                    self.figure_registry.register(fig, "heatmap")
+                    
+                    # Also create publication-ready version (rendered in the background)
+                    self.submit_figure_export('heatmap', heatmap_data, {
+                        'row_clustering': cluster_rows,
+                        'col_clustering': cluster_cols,
+                        'title': plot_title
+                    }, journal_style)
                 
             except Exception as e:
                 st.error(f"❌ Failed to create heatmap: {str(e)}")
+        
+        self.show_figure_export('heatmap', "heatmap")
+        
+        if lod_mode and st.session_state.heatmap_pyramid is not None:
+            self.show_heatmap_pyramid()
+    
+    def show_heatmap_pyramid(self):
+        """Level-of-detail heatmap: coarse overview, refined as the window narrows"""
+        stored = st.session_state.heatmap_pyramid
+        pyramid = stored['pyramid']
+        n_rows, n_cols = pyramid.shape
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            row_range = st.slider("Gene window:", 0, n_rows, (0, n_rows), key="heatmap_lod_rows")
+        with col2:
+            col_range = st.slider("Sample window:", 0, n_cols, (0, n_cols), key="heatmap_lod_cols")
+        
+        view = pyramid.view(row_range, col_range)
+        
+        def axis_labels(labels, centers):
+            # Categorical axes need unique labels; repeated symbols get their position
+            labels = pd.Series(labels, dtype=object)
+            repeated = labels.duplicated(keep=False).values
+            labels[repeated] = [f"{l} [{int(c)}]" for l, c in zip(labels[repeated], centers[repeated])]
+            return labels.values
+        
+        fig = go.Figure(data=go.Heatmap(
+            z=view['z'],
+            x=axis_labels(view['col_labels'], view['col_centers']),
+            y=axis_labels(view['row_labels'], view['row_centers']),
+            colorscale=stored['color_scale'],
+            zmid=0,
+            hovertemplate='Samples: %{x}<br>Genes: %{y}<br>Mean expression: %{z:.2f}<extra></extra>'
+        ))
+        fig.update_layout(
+            title=stored['title'],
+            height=700,
+            xaxis_title="Samples",
+            yaxis_title="Genes",
+            xaxis=dict(showticklabels=len(view['col_labels']) <= 100),
+            yaxis=dict(showticklabels=len(view['row_labels']) <= 100)
+        )
+        st.plotly_chart(compact_figure(fig, source=pyramid, version=(row_range, col_range)),
+                        use_container_width=True)
+        
+        row_bin, col_bin = view['bin_size']
+        st.caption(f"Showing {view['z'].shape[0]} x {view['z'].shape[1]} cells of a {n_rows:,} x {n_cols:,} matrix "
+                   f"({row_bin} gene(s) x {col_bin} sample(s) per cell). "
+                   "Narrow the windows to refine to full resolution.")
     
     def create_pca_visualization(self, journal_style):
         """Create PCA visualization"""
-        if st.session_state.expression_data is None:
+        if st.session_state.expression_data is None and st.session_state.expression_store is None:
             st.warning("⚠️ No expression data available!")
             return
         
@@ -1745,33 +2663,49 @@ class PrairieGenomicsEnhanced:
             
             standardize = st.checkbox("Standardize features", True,
                                      key="pca_standardize")
+            
+            use_store = st.session_state.expression_store is not None and (
+                st.session_state.expression_data is None or
+                st.checkbox("Use full on-disk matrix (out-of-core)", True, key="pca_out_of_core")
+            )
+            log_transform = not use_store and self.log_transform_option("pca_log_transform")
         
         if st.button("Run PCA Analysis", type="primary"):
             try:
-                from sklearn.decomposition import PCA
-                from sklearn.preprocessing import StandardScaler
-                
-                # Select top variable genes
-                gene_vars = st.session_state.expression_data.var(axis=1).nlargest(n_features)
-                pca_data = st.session_state.expression_data.loc[gene_vars.index].T
-                
-                # Standardize if requested
-                if standardize:
-                    scaler = StandardScaler()
-                    pca_data_scaled = scaler.fit_transform(pca_data)
+                if use_store:
+                    # Streamed two-pass PCA over sample blocks within the memory budget
+                    progress_bar = st.progress(0)
+                    status_text = st.empty()
+                    
+                    def update_progress(message, pct):
+                        status_text.text(message)
+                        progress_bar.progress(min(max(pct, 0), 100) / 100)
+                    
+                    pca_model = self.streaming_analyzer().pca(
+                        n_components=n_components,
+                        n_features=n_features,
+                        scale=standardize,
+                        progress_callback=update_progress
+                    )
+                    progress_bar.empty()
+                    status_text.empty()
+                    pca_scores = pca_model['scores'].assign(projected=False)
                 else:
-                    pca_data_scaled = pca_data.values
-                
-                # Perform PCA
-                pca = PCA(n_components=n_components)
-                pca_result = pca.fit_transform(pca_data_scaled)
+                    # Randomized PCA on the top variable genes (standardized implicitly);
+                    # samples added since a previous fit are projected onto its axes
+                    expression_data = st.session_state.expression_data
+                    pca_model, pca_scores = self.pca_engine.fit_transform(
+                        log_layer(expression_data) if log_transform else expression_data,
+                        n_components=n_components,
+                        n_features=n_features,
+                        scale=standardize
+                    )
+                n_components = len(pca_model['explained_variance'])
+                pca_df = pca_scores.drop(columns=['projected'])
                 
-                # Create results dataframe
-                pca_df = pd.DataFrame(
-                    pca_result,
-                    index=pca_data.index,
-                    columns=[f'PC{i+1}' for i in range(n_components)]
-                )
+                n_projected = int(pca_scores['projected'].sum())
+                if n_projected > 0:
+                    st.info(f"ℹ️ {n_projected} new sample(s) projected onto the existing components")
                 
                 # Add grouping variable if available
                 groups = None
@@ -1810,7 +2744,7 @@ class PrairieGenomicsEnhanced:
                     )
                 
                 # Update layout
-                variance_explained = pca.explained_variance_ratio_
+                variance_explained = pca_model['explained_variance_ratio']
                 fig.update_layout(
                     xaxis_title=f'PC1 ({variance_explained[0]:.1%} variance)',
                     yaxis_title=f'PC2 ({variance_explained[1]:.1%} variance)',
@@ -1818,7 +2752,8 @@ class PrairieGenomicsEnhanced:
                     height=600
                 )
                 
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(compact_figure(fig), use_container_width=True)
+                self.figure_registry.register(fig, "pca")
                 
                 # Show explained variance
                 st.subheader("📊 Explained Variance")
@@ -1830,21 +2765,16 @@ class PrairieGenomicsEnhanced:
                 
                 st.dataframe(variance_df, use_container_width=True)
                 
-                # Create publication-ready version
-                plot_results = self.viz_exporter.create_pca_plot(
-                    pca_df,
-                    groups=groups,
-                    title="PCA Analysis",
-                    journal_style=journal_style
-                )
-                
-                if 'figure_paths' in plot_results:
-                    st.success("✅ Publication-ready PCA plot generated!")
-                    for format_type, file_path in plot_results['figure_paths'].items():
-                        st.info(f"📁 {format_type.upper()} saved: {file_path}")
+                # Create publication-ready version (rendered in the background)
+                self.submit_figure_export('pca_plot', pca_df, {
+                    'groups': groups,
+                    'title': "PCA Analysis"
+                }, journal_style)
             
             except Exception as e:
                 st.error(f"❌ PCA analysis failed: {str(e)}")
+        
+        self.show_figure_export('pca_plot', "PCA plot")
     
     def create_survival_visualization(self, journal_style):
         """Create survival curve visualization"""
@@ -1865,22 +2795,18 @@ class PrairieGenomicsEnhanced:
                     title=plot_title
                 )
                 
-                st.plotly_chart(survival_fig, use_container_width=True)
-                
-                # Create publication-ready version
-                plot_results = self.viz_exporter.create_survival_plot(
-                    st.session_state.survival_results,
-                    title=plot_title,
-                    journal_style=journal_style
-                )
+                st.plotly_chart(compact_figure(survival_fig), use_container_width=True)
+                self.figure_registry.register(survival_fig, "survival")
                 
-                if 'figure_paths' in plot_results:
-                    st.success("✅ Publication-ready survival plot generated!")
-                    for format_type, file_path in plot_results['figure_paths'].items():
-                        st.info(f"📁 {format_type.upper()} saved: {file_path}")
+                # Create publication-ready version (rendered in the background)
+                self.submit_figure_export('survival_plot', st.session_state.survival_results, {
+                    'title': plot_title
+                }, journal_style)
                 
             except Exception as e:
                 st.error(f"❌ Failed to create survival plot: {str(e)}")
+        
+        self.show_figure_export('survival_plot', "survival plot")
     
     def create_pathway_visualization(self, journal_style):
         """Create pathway enrichment visualization"""
@@ -1904,36 +2830,267 @@ class PrairieGenomicsEnhanced:
                     db_results = st.session_state.pathway_results['enrichr'][selected_db]
                     
                     if not db_results['results'].empty:
-                        # Create publication-ready plot
-                        plot_results = self.viz_exporter.create_pathway_enrichment_plot(
-                            db_results['results'],
-                            title=plot_title,
-                            top_n=n_pathways,
-                            journal_style=journal_style
-                        )
-                        
-                        if 'figure_paths' in plot_results:
-                            st.success("✅ Publication-ready pathway plot generated!")
-                            for format_type, file_path in plot_results['figure_paths'].items():
-                                st.info(f"📁 {format_type.upper()} saved: {file_path}")
-                        
-                        # Show statistics
-                        if 'statistics' in plot_results:
-                            stats = plot_results['statistics']
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric("Pathways Shown", stats['pathways_shown'])
-                            with col2:
-                                st.metric("Significant", stats['significant_pathways'])
+                        # Create publication-ready plot (rendered in the background)
+                        self.submit_figure_export('pathway_enrichment_plot', db_results['results'], {
+                            'title': plot_title,
+                            'top_n': n_pathways
+                        }, journal_style)
                     
                     else:
                         st.warning("No pathway results to visualize!")
                 
                 except Exception as e:
                     st.error(f"❌ Failed to create pathway plot: {str(e)}")
+            
+            plot_results = self.show_figure_export('pathway_enrichment_plot', "pathway plot")
+            if plot_results is not None and 'statistics' in plot_results:
+                # Show statistics
+                stats = plot_results['statistics']
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("Pathways Shown", stats['pathways_shown'])
+                with col2:
+                    st.metric("Significant", stats['significant_pathways'])
         
         else:
             st.info("No enrichment results available for visualization.")
+        
+        self.show_term_network()
+    
+    def show_term_network(self):
+        """Redundancy-reduced term similarity network for enrichment results"""
+        pathway_results = st.session_state.pathway_results
+        
+        # Collect result tables with per-term gene lists
+        sources = {}
+        for db_name, db_results in pathway_results.get('enrichr', {}).items():
+            sources[f"ORA: {db_name}"] = (db_results['results'], 'Genes', 'Adjusted P-value', db_name)
+        for key, gsea_data in pathway_results.items():
+            if key.startswith('gsea_') and 'Lead_genes' in gsea_data.get('results', pd.DataFrame()).columns:
+                library_name = key.replace('gsea_', '')
+                sources[f"GSEA: {library_name}"] = (gsea_data['results'], 'Lead_genes', 'FDR q-val', library_name)
+        
+        if not sources:
+            return
+        
+        st.subheader("🕸️ Term Similarity Network")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            network_source = st.selectbox("Results:", list(sources.keys()), key="network_source")
+            similarity_metric = st.selectbox("Similarity:", ["jaccard", "overlap"], key="network_metric")
+        with col2:
+            network_cutoff = st.number_input("Significance cutoff:", 0.001, 0.5, 0.05, key="network_cutoff")
+            similarity_threshold = st.slider("Grouping similarity:", 0.1, 0.9, 0.5, key="network_similarity")
+        with col3:
+            edge_threshold = st.slider("Edge similarity:", 0.05, 0.9, 0.2, key="network_edge_threshold")
+            max_nodes = st.slider("Max terms in plot:", 20, 500, 150, key="network_max_nodes")
+        
+        if st.button("Build Term Network", key="build_term_network"):
+            try:
+                results_df, gene_column, p_column, library_name = sources[network_source]
+                
+                # Local libraries give full set membership; otherwise only the listed genes are known
+                library = None
+                if library_name in self.gene_set_store:
+                    library = self.gene_set_store.get_library(library_name)
+                    st.caption(f"Similarity from full gene set membership in the local {library_name} library")
+                else:
+                    st.caption(f"Similarity from the {gene_column.replace('_', ' ').lower()} listed in the results "
+                               "(import the library locally for full-membership similarity)")
+                
+                self.term_network.metric = similarity_metric
+                self.term_network.similarity_threshold = similarity_threshold
+                self.term_network.edge_threshold = edge_threshold
+                
+                network = self.term_network.build_network(
+                    results_df, gene_column=gene_column, p_column=p_column, cutoff=network_cutoff,
+                    library=library
+                )
+                nodes = network['nodes']
+                if nodes.empty:
+                    st.warning("No terms pass the significance cutoff")
+                    return
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Significant Terms", len(nodes))
+                with col2:
+                    st.metric("Non-redundant Groups", len(network['clusters']))
+                with col3:
+                    st.metric("Edges", len(network['edges']))
+                
+                # Plot the most significant terms with their edges
+                shown = nodes.head(max_nodes)
+                shown_terms = set(shown['Term'])
+                edges = network['edges']
+                edges = edges[edges['source'].isin(shown_terms) & edges['target'].isin(shown_terms)]
+                positions = self.term_network.layout({'nodes': shown, 'edges': edges})
+                
+                edge_x, edge_y = [], []
+                for source, target in zip(edges['source'], edges['target']):
+                    edge_x += [positions.at[source, 'x'], positions.at[target, 'x'], None]
+                    edge_y += [positions.at[source, 'y'], positions.at[target, 'y'], None]
+                
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(
+                    x=edge_x, y=edge_y, mode='lines',
+                    line=dict(width=0.5, color='lightgray'),
+                    hoverinfo='skip', showlegend=False
+                ))
+                fig.add_trace(go.Scatter(
+                    x=positions.loc[shown['Term'], 'x'],
+                    y=positions.loc[shown['Term'], 'y'],
+                    mode='markers+text',
+                    text=np.where(shown['representative'], shown['Term'], ''),
+                    textposition='top center',
+                    hovertext=shown['Term'] + '<br>' + p_column + ': ' + shown[p_column].map('{:.2e}'.format),
+                    hoverinfo='text',
+                    marker=dict(
+                        size=np.clip(np.sqrt(shown['n_genes']) * 3, 6, 30),
+                        color=shown['cluster'],
+                        colorscale='Turbo',
+                        line=dict(width=1, color='white')
+                    ),
+                    showlegend=False
+                ))
+                fig.update_layout(
+                    title=f"{network_source} - term similarity network",
+                    xaxis=dict(visible=False), yaxis=dict(visible=False),
+                    height=700
+                )
+                st.plotly_chart(compact_figure(fig), use_container_width=True)
+                
+                st.write("**Non-redundant term groups**")
+                st.dataframe(network['clusters'], use_container_width=True, hide_index=True)
+            
+            except Exception as e:
+                st.error(f"❌ Failed to build term network: {str(e)}")
+    
+    def create_sample_similarity_view(self):
+        """Approximate nearest-neighbour sample search and kNN-graph embedding"""
+        if st.session_state.expression_data is None and st.session_state.expression_store is None:
+            st.warning("⚠️ No expression data available!")
+            return
+        
+        st.subheader("🧭 Sample Similarity")
+        st.write("Samples are indexed in PCA space (top 2,000 variable genes, standardized) "
+                 "with an approximate k-nearest-neighbour graph.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            n_pcs = st.slider("Principal components:", 5, 50, 20, key="similarity_n_pcs")
+        with col2:
+            n_neighbors = st.slider("Neighbours per sample (graph):", 5, 50, 15, key="similarity_n_neighbors")
+        log_transform = (st.session_state.expression_data is not None
+                         and self.log_transform_option("similarity_log_transform"))
+        
+        if st.button("🔨 Build Similarity Index", type="primary", key="similarity_build"):
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            def update_progress(message, pct):
+                status_text.text(message)
+                progress_bar.progress(min(max(pct, 0), 100) / 100)
+            
+            try:
+                if st.session_state.expression_data is not None:
+                    expression_data = st.session_state.expression_data
+                    _, scores = self.pca_engine.fit_transform(
+                        log_layer(expression_data) if log_transform else expression_data,
+                        n_components=n_pcs, n_features=2000
+                    )
+                    scores = scores.drop(columns=['projected'])
+                else:
+                    scores = self.streaming_analyzer().pca(
+                        n_components=n_pcs, n_features=2000, progress_callback=update_progress
+                    )['scores']
+                
+                self.sample_index.n_neighbors = n_neighbors
+                self.sample_index.fit(scores, progress_callback=update_progress)
+                st.success(f"✅ Indexed {len(scores):,} samples in {scores.shape[1]} dimensions")
+            except Exception as e:
+                st.error(f"❌ Failed to build similarity index: {str(e)}")
+            finally:
+                progress_bar.empty()
+                status_text.empty()
+        
+        index = self.sample_index
+        if index.digest is None:
+            return
+        
+        clinical = None
+        if st.session_state.clinical_data is not None:
+            clinical = st.session_state.clinical_data
+            if 'sample_id' in clinical.columns:
+                clinical = clinical.set_index('sample_id')
+            clinical = clinical[~clinical.index.duplicated()]
+        
+        # Similar-sample query
+        st.markdown("#### 🔎 Most Similar Samples")
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            query_sample = st.text_input("Sample ID:", str(index.samples[0]), key="similarity_query")
+        with col2:
+            n_similar = st.number_input("Results:", 1, 100, 10, key="similarity_n_results")
+        
+        neighbours = None
+        if query_sample in index.samples:
+            start_time = time.time()
+            neighbours = index.similar_samples(query_sample, int(n_similar))
+            elapsed_ms = (time.time() - start_time) * 1000
+            table = neighbours
+            if clinical is not None:
+                table = neighbours.join(clinical, on='sample')
+            st.dataframe(table, use_container_width=True)
+            st.caption(f"Query answered in {elapsed_ms:.1f} ms (distances in PCA units)")
+        else:
+            st.warning(f"⚠️ Sample '{query_sample}' is not in the index")
+        
+        # kNN-graph embedding
+        st.markdown("#### 🗺️ kNN Graph Embedding")
+        color_options = ["None"] + (clinical.columns.tolist() if clinical is not None else [])
+        color_by = st.selectbox("Color samples by:", color_options, key="similarity_color_by")
+        
+        if st.button("Compute Embedding", key="similarity_embed") or index.has_embedding:
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            def update_progress(message, pct):
+                status_text.text(message)
+                progress_bar.progress(min(max(pct, 0), 100) / 100)
+            
+            embedding = index.embedding(progress_callback=update_progress)
+            progress_bar.empty()
+            status_text.empty()
+            
+            plot_df = embedding.copy()
+            plot_df['sample'] = plot_df.index.astype(str)
+            color = None
+            if color_by != "None":
+                plot_df[color_by] = clinical[color_by].reindex(plot_df.index).values
+                color = color_by
+            
+            fig = px.scatter(
+                plot_df, x='Embedding 1', y='Embedding 2', color=color,
+                hover_name='sample', render_mode='webgl',
+                title=f"kNN Graph Embedding ({len(plot_df):,} samples)"
+            )
+            fig.update_traces(marker=dict(size=4 if len(plot_df) > 5000 else 7, opacity=0.8))
+            
+            # Highlight the queried sample and its neighbours
+            if neighbours is not None:
+                highlighted = embedding.loc[[query_sample] + neighbours['sample'].tolist()]
+                fig.add_trace(go.Scatter(
+                    x=highlighted['Embedding 1'], y=highlighted['Embedding 2'],
+                    mode='markers', name=f"{query_sample} + neighbours",
+                    marker=dict(size=11, color='rgba(0,0,0,0)', line=dict(color='black', width=2)),
+                    text=highlighted.index.astype(str), hoverinfo='text'
+                ))
+            fig.update_layout(width=800, height=650)
+            
+            st.plotly_chart(compact_figure(fig), use_container_width=True)
+            self.figure_registry.register(fig, "embedding")
     
     def create_multipanel_figure(self, journal_style):
         """Create multi-panel figure for publication"""
@@ -1948,56 +3105,73 @@ class PrairieGenomicsEnhanced:
         with col2:
             n_cols = st.selectbox("Number of columns:", [1, 2, 3], index=1)
         
-        # Panel selection
-        available_plots = []
-        plot_files = list(Path(self.viz_exporter.output_dir).glob("*.png"))
-        
-        if plot_files:
-            st.write(f"Available plots from exports directory:")
-            selected_plots = st.multiselect(
-                "Select plots for panels:",
-                [p.name for p in plot_files],
-                help=f"Select up to {n_rows * n_cols} plots"
+        # Panel selection from figures drawn this session
+        entries = self.figure_registry.entries()
+        
+        if not entries.empty:
+            st.write("Available figures from this session:")
+            figure_names = {row['id']: f"{row['title']} ({row['kind']}, {row['registered']:%H:%M:%S})"
+                            for _, row in entries.iterrows()}
+            selected_figures = st.multiselect(
+                "Select figures for panels:",
+                list(figure_names),
+                format_func=lambda figure_id: figure_names[figure_id],
+                help=f"Select up to {n_rows * n_cols} figures"
             )
             
-            if len(selected_plots) > n_rows * n_cols:
-                st.warning(f"⚠️ Too many plots selected. Maximum is {n_rows * n_cols}")
-                selected_plots = selected_plots[:n_rows * n_cols]
+            if len(selected_figures) > n_rows * n_cols:
+                st.warning(f"⚠️ Too many figures selected. Maximum is {n_rows * n_cols}")
+                selected_figures = selected_figures[:n_rows * n_cols]
         else:
-            st.info("No exported plots found. Generate some visualizations first!")
-            selected_plots = []
+            st.info("No figures drawn yet. Generate some visualizations first!")
+            selected_figures = []
         
         # Panel labels
         panel_labels = []
-        if selected_plots:
+        if selected_figures:
             st.subheader("Panel Labels")
-            default_labels = [chr(65 + i) for i in range(len(selected_plots))]  # A, B, C, etc.
+            default_labels = [chr(65 + i) for i in range(len(selected_figures))]  # A, B, C, etc.
             
-            for i, plot in enumerate(selected_plots):
-                label = st.text_input(f"Label for {plot}:", default_labels[i], key=f"label_{i}")
+            for i, figure_id in enumerate(selected_figures):
+                label = st.text_input(f"Label for {figure_names[figure_id]}:", default_labels[i], key=f"label_{i}")
                 panel_labels.append(label)
         
         figure_title = st.text_input("Overall figure title:", "Multi-panel Analysis")
+        export_format = st.selectbox(
+            "Output format:", ["svg", "pdf", "png", "html"],
+            help="SVG/PDF keep every panel as vector graphics; PNG and SVG/PDF need the kaleido package"
+        )
         
-        if st.button("Create Multi-panel Figure", type="primary") and selected_plots:
+        if st.button("Create Multi-panel Figure", type="primary") and selected_figures:
             try:
-                # Create full file paths
-                plot_paths = [str(Path(self.viz_exporter.output_dir) / plot) for plot in selected_plots]
-                
-                # Create multi-panel figure
-                combined_path = self.viz_exporter.create_figure_panel(
-                    plot_paths,
-                    panel_layout=(n_rows, n_cols),
+                # Compose directly from the registered figure objects
+                combined_fig = self.figure_registry.compose(
+                    selected_figures,
+                    layout=(n_rows, n_cols),
                     labels=panel_labels,
                     title=figure_title
                 )
+                st.plotly_chart(compact_figure(combined_fig), use_container_width=True)
                 
-                if combined_path:
-                    st.success("✅ Multi-panel figure created successfully!")
-                    st.info(f"📁 Saved: {combined_path}")
-                    
-                    # Display the combined figure
-                    st.image(combined_path, caption=figure_title, use_column_width=True)
+                rasterization = st.session_state.export_rasterization
+                content = self.figure_registry.export(
+                    combined_fig, export_format,
+                    point_threshold=rasterization['point_threshold'] if rasterization['enabled'] else None,
+                    dpi=rasterization['dpi']
+                )
+                timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+                combined_path = Path(self.viz_exporter.output_dir) / f"multipanel_{timestamp_str}.{export_format}"
+                combined_path.write_bytes(content)
+                
+                st.success("✅ Multi-panel figure created successfully!")
+                st.info(f"📁 Saved: {combined_path}")
+                st.download_button(
+                    f"📥 Download {export_format.upper()}",
+                    data=content,
+                    file_name=combined_path.name,
+                    mime={'svg': 'image/svg+xml', 'pdf': 'application/pdf',
+                          'png': 'image/png', 'html': 'text/html'}[export_format]
+                )
                 
             except Exception as e:
                 st.error(f"❌ Failed to create multi-panel figure: {str(e)}")
@@ -2079,7 +3253,8 @@ class PrairieGenomicsEnhanced:
                                 aspect="auto"
                             )
                             
-                            st.plotly_chart(fig, use_container_width=True)
+                            st.plotly_chart(compact_figure(fig), use_container_width=True)
+                            self.figure_registry.register(fig, "custom")
                         
                         else:
                             st.info(f"Custom {plot_type} generation - implementation in progress")
@@ -2312,6 +3487,7 @@ class PrairieGenomicsEnhanced:
                     if st.button("🗑️ Clear Cache"):
                         self.gene_converter.clear_cache()
                         self.pubmed_searcher.clear_cache()
+                        self.literature_store.clear_cache()
                         st.success("✅ Cache cleared!")
                 
                 with col2:
@@ -2319,6 +3495,7 @@ class PrairieGenomicsEnhanced:
                         import shutil
                         shutil.rmtree(self.viz_exporter.output_dir)
                         self.viz_exporter.output_dir.mkdir(exist_ok=True)
+                        self.figure_exports.clear_cache()
                         st.success("✅ Export directory cleared!")
     
     def generate_comprehensive_report(self):
@@ -2489,6 +3666,21 @@ For questions about this analysis, please refer to the Prairie Genomics Suite do
                 default_journal = st.selectbox("Default journal style:", ["nature", "science", "cell", "nejm"])
                 default_dpi = st.slider("Default DPI:", 150, 600, 300)
                 default_figure_format = st.selectbox("Default figure format:", ["PNG", "PDF", "EPS", "SVG"])
+                
+                # Dense layers (scatter points, heatmap cells) of PDF/EPS/SVG exports
+                # are embedded as images at the default DPI; axes and text stay vector
+                rasterize_dense = st.checkbox("Rasterize dense data layers in vector exports", True,
+                                              key="settings_rasterize_dense")
+                raster_point_threshold = st.number_input("Rasterize above (points):", 500, 1000000, 5000,
+                                                         step=500, key="settings_raster_points")
+                raster_cell_threshold = st.number_input("Rasterize above (heatmap cells):", 1000, 10000000, 20000,
+                                                        step=1000, key="settings_raster_cells")
+                st.session_state.export_rasterization = {
+                    'enabled': rasterize_dense,
+                    'dpi': default_dpi,
+                    'point_threshold': int(raster_point_threshold),
+                    'cell_threshold': int(raster_cell_threshold)
+                }
             
             with col2:
                 st.write("**Color Settings**")
@@ -2543,7 +3735,10 @@ For questions about this analysis, please refer to the Prairie Genomics Suite do
                 
                 # Memory settings
                 st.write("**Memory Management**")
-                max_memory_usage = st.slider("Max memory usage (GB):", 1, 16, 4)
+                max_memory_usage = st.slider("Max memory usage (GB):", 1, 16,
+                                             st.session_state.max_memory_gb,
+                                             help="Working memory budget for out-of-core analyses")
+                st.session_state.max_memory_gb = max_memory_usage
                 
             # Save settings
             if st.button("💾 Save Settings", type="primary"):
@@ -2562,6 +3757,7 @@ For questions about this analysis, please refer to the Prairie Genomics Suite do
                         'default_journal': default_journal,
                         'default_dpi': default_dpi,
                         'default_format': default_figure_format,
+                        'rasterization': st.session_state.export_rasterization,
                         'color_palette': color_palette,
                         'colorblind_friendly': use_colorblind_friendly
                     },
@@ -2574,7 +3770,8 @@ For questions about this analysis, please refer to the Prairie Genomics Suite do
                         'max_genes_display': max_genes_display,
                         'max_pathways_display': max_pathways_display,
                         'enable_parallel': enable_parallel,
-                        'max_workers': max_workers
+                        'max_workers': max_workers,
+                        'max_memory_gb': max_memory_usage
                     },
                     'data_sources': {
                         'pubmed_email': pubmed_email,
@@ -2675,8 +3872,9 @@ For questions about this analysis, please refer to the Prairie Genomics Suite do
             st.markdown("### ⚡ Quick Actions")
             
             if st.button("🔄 Reset All Data", key="sidebar_reset_all"):
-                for key in ['expression_data', 'clinical_data', 'gene_symbols', 'de_results', 
-                           'pathway_results', 'survival_results', 'literature_results']:
+                for key in ['expression_data', 'clinical_data', 'gene_symbols', 'de_results', 'de_design',
+                           'pathway_results', 'survival_results', 'cox_screen_results', 'literature_results',
+                           'heatmap_pyramid', 'expression_store']:
                     st.session_state[key] = None if key in ['expression_data', 'clinical_data'] else {} if key == 'gene_symbols' else None
                 st.success("✅ All data reset!")
                 st.rerun()
@@ -16,18 +16,23 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import seaborn as sns
 import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
 import scipy.stats as stats
 from scipy.stats import ttest_ind, false_discovery_control
 import requests
 import io
 import base64
 import time
+import sys
+from pathlib import Path
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.append(str(Path(__file__).parent / "utils"))
+from volcano_plot import VolcanoRenderer
+from figure_payload import compact_figure
+from pca_engine import RandomizedPCA
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="🧬 Prairie Genomics Suite",
@@ -99,6 +104,8 @@ class PrairieGenomicsWebApp:
             st.session_state.de_results = None
         if 'gene_symbols' not in st.session_state:
             st.session_state.gene_symbols = {}
+        if 'pca_engine' not in st.session_state:
+            st.session_state.pca_engine = RandomizedPCA()
     
     def show_header(self):
         """Display the main header and navigation"""
@@ -617,56 +624,23 @@ class PrairieGenomicsWebApp:
         with col3:
             point_size = st.slider("Point size", 2, 10, 4)
         
-        # Prepare data
-        plot_data = st.session_state.de_results.copy()
-        plot_data['-log10_p'] = -np.log10(plot_data['adj_p_value'] + 1e-300)
-        
-        # Color by significance
-        conditions = [
-            (plot_data['adj_p_value'] < p_cutoff) & (plot_data['log2_fold_change'] > fc_cutoff),
-            (plot_data['adj_p_value'] < p_cutoff) & (plot_data['log2_fold_change'] < -fc_cutoff),
-        ]
-        choices = ['Upregulated', 'Downregulated']
-        plot_data['Category'] = np.select(conditions, choices, default='Not Significant')
-        
-        # Create plotly figure
-        fig = px.scatter(
-            plot_data, 
-            x='log2_fold_change', 
-            y='-log10_p',
-            color='Category',
-            hover_data=['gene_symbol', 'adj_p_value'],
-            color_discrete_map={
-                'Upregulated': '#E74C3C',
-                'Downregulated': '#3498DB',
-                'Not Significant': '#7F7F7F'
-            },
-            title="Differential Expression Volcano Plot"
-        )
-        
-        # Update traces
-        fig.update_traces(marker=dict(size=point_size, opacity=0.7))
-        
-        # Add threshold lines
-        fig.add_hline(y=-np.log10(p_cutoff), line_dash="dash", line_color="gray")
-        fig.add_vline(x=fc_cutoff, line_dash="dash", line_color="gray")
-        fig.add_vline(x=-fc_cutoff, line_dash="dash", line_color="gray")
-        
-        # Update layout
-        fig.update_layout(
-            xaxis_title="Log2 Fold Change",
-            yaxis_title="-Log10(Adjusted P-value)",
-            width=800,
-            height=600,
-            hovermode='closest'
+        # WebGL traces; the non-significant cloud is density-thinned server-side
+        fig, volcano_stats = VolcanoRenderer().create_volcano_plot(
+            st.session_state.de_results,
+            p_cutoff=p_cutoff,
+            fc_cutoff=fc_cutoff,
+            point_size=point_size,
+            fc_column='log2_fold_change',
+            p_column='adj_p_value'
         )
         
-        st.plotly_chart(fig, use_container_width=True)
+        # Fixed size: gene labels are laid out in pixels for this plot area
+        st.plotly_chart(compact_figure(fig), use_container_width=False)
         
         # Summary statistics
-        up_count = len(plot_data[plot_data['Category'] == 'Upregulated'])
-        down_count = len(plot_data[plot_data['Category'] == 'Downregulated'])
-        ns_count = len(plot_data[plot_data['Category'] == 'Not Significant'])
+        up_count = volcano_stats['up_regulated']
+        down_count = volcano_stats['down_regulated']
+        ns_count = volcano_stats['not_significant']
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -681,24 +655,14 @@ class PrairieGenomicsWebApp:
         st.subheader("📊 Principal Component Analysis")
         
         with st.spinner("Computing PCA..."):
-            # Transpose data (samples as rows)
-            expr_t = st.session_state.expression_data.T
-            
-            # Standardize
-            scaler = StandardScaler()
-            expr_scaled = scaler.fit_transform(expr_t)
-            
-            # PCA
-            pca = PCA(n_components=5)
-            pca_result = pca.fit_transform(expr_scaled)
+            # Randomized PCA on the 2,000 most variable genes, standardized implicitly
+            pca_model, pca_scores = st.session_state.pca_engine.fit_transform(
+                st.session_state.expression_data, n_components=5, n_features=2000, scale=True
+            )
+            explained = pca_model['explained_variance_ratio']
             
             # Create dataframe
-            pca_df = pd.DataFrame({
-                'PC1': pca_result[:, 0],
-                'PC2': pca_result[:, 1],
-                'PC3': pca_result[:, 2],
-                'Sample': expr_t.index
-            })
+            pca_df = pca_scores[['PC1', 'PC2', 'PC3']].assign(Sample=pca_scores.index)
             
             # Create plot
             fig = px.scatter(
@@ -710,19 +674,19 @@ class PrairieGenomicsWebApp:
             )
             
             fig.update_layout(
-                xaxis_title=f'PC1 ({pca.explained_variance_ratio_[0]:.1%} variance)',
-                yaxis_title=f'PC2 ({pca.explained_variance_ratio_[1]:.1%} variance)',
+                xaxis_title=f'PC1 ({explained[0]:.1%} variance)',
+                yaxis_title=f'PC2 ({explained[1]:.1%} variance)',
                 width=800,
                 height=600
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(compact_figure(fig), use_container_width=True)
             
             # Explained variance
             st.subheader("📊 Explained Variance")
             variance_df = pd.DataFrame({
-                'Component': [f'PC{i+1}' for i in range(5)],
-                'Variance Explained': pca.explained_variance_ratio_[:5] * 100
+                'Component': [f'PC{i+1}' for i in range(len(explained))],
+                'Variance Explained': explained * 100
             })
             
             fig_var = px.bar(
@@ -731,7 +695,7 @@ class PrairieGenomicsWebApp:
                 y='Variance Explained',
                 title="Variance Explained by Principal Components"
             )
-            st.plotly_chart(fig_var, use_container_width=True)
+            st.plotly_chart(compact_figure(fig_var), use_container_width=True)
     
     def create_heatmap(self):
         """Create heatmap of top genes"""
@@ -776,7 +740,7 @@ class PrairieGenomicsWebApp:
             yaxis_title="Genes"
         )
         
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(compact_figure(fig), use_container_width=True)
     
     def create_expression_plot(self):
         """Create expression plot for specific gene"""
@@ -817,11 +781,11 @@ class PrairieGenomicsWebApp:
                 
                 # Box plot
                 fig = px.box(plot_df, y='Expression', title=f"{selected_gene} Expression Distribution")
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(compact_figure(fig), use_container_width=True)
                 
                 # Histogram
                 fig_hist = px.histogram(plot_df, x='Expression', title=f"{selected_gene} Expression Histogram")
-                st.plotly_chart(fig_hist, use_container_width=True)
+                st.plotly_chart(compact_figure(fig_hist), use_container_width=True)
     
     def results_section(self, tab):
         """Results download and summary"""
@@ -0,0 +1,6 @@
+"""Shared test setup: utility modules are imported flat, as the app does"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "utils"))
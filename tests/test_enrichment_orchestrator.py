@@ -0,0 +1,76 @@
+"""Enrichment tasks for every pathway analysis mode, run on local libraries"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from camera_test import CompetitiveGeneSetTest
+from enrichment_orchestrator import ANALYSIS_METHODS, EnrichmentOrchestrator, enrichment_tasks
+from gene_set_library import GeneSetStore
+from gsea_engine import PrerankedGSEA
+from ora_engine import OverRepresentationAnalyzer
+
+GENES = [f"G{i}" for i in range(300)]
+REMOTE = "KEGG_2021_Human"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = GeneSetStore(tmp_path / "libraries")
+    for name, offset in [("LOCAL_A", 0), ("LOCAL_B", 7)]:
+        gmt = tmp_path / f"{name}.gmt"
+        gmt.write_text("".join(
+            f"SET_{i}\tdescription\t" + "\t".join(GENES[offset + 20 * i:offset + 20 * i + 30]) + "\n"
+            for i in range(10)
+        ))
+        store.import_gmt(gmt)
+    return store
+
+
+@pytest.mark.parametrize("analysis_type", list(ANALYSIS_METHODS))
+def test_every_analysis_type_runs(store, analysis_type):
+    rng = np.random.default_rng(0)
+    ranking = pd.Series(rng.normal(size=len(GENES)), index=GENES)
+    ranking[GENES[:30]] += 3
+    remote_calls = []
+
+    def remote(payload, library, **params):
+        remote_calls.append((library, sorted(params)))
+        return {'results': pd.DataFrame(), 'significant_terms': 0}
+
+    ora = OverRepresentationAnalyzer(store)
+    gsea = PrerankedGSEA(store, n_workers=1)
+    tasks = enrichment_tasks(
+        analysis_type, ["LOCAL_A", "LOCAL_B", REMOTE], store,
+        local_runners={'ora': ora.enrichr_analysis, 'gsea': gsea.gsea_preranked},
+        remote_runners={'ora': remote, 'gsea': remote},
+        gene_list=GENES[:30], ranking=ranking,
+        ora_params={'background': GENES, 'cutoff': 0.05},
+        gsea_params={'min_size': 15, 'max_size': 500, 'permutation_num': 100}
+    )
+
+    methods = [m for m in ANALYSIS_METHODS[analysis_type] if m != "camera"]
+    # One task for both local libraries plus one per remote library, per method
+    assert sorted(task.method for task in tasks) == sorted(methods * 2)
+
+    yielded = [(task.method, library, result, error)
+               for task, library, result, _, error in EnrichmentOrchestrator(max_workers=2).run(tasks)]
+    assert all(error is None for *_, error in yielded)
+    assert sorted((method, library) for method, library, *_ in yielded) == sorted(
+        (method, library) for method in methods for library in ["LOCAL_A", "LOCAL_B", REMOTE]
+    )
+    assert len(remote_calls) == len(methods)
+    for method, library, result, _ in yielded:
+        if library != REMOTE:
+            assert len(result['results']) > 0
+
+    if analysis_type.startswith("CAMERA"):
+        samples = [f"S{i}" for i in range(12)]
+        expression = pd.DataFrame(rng.poisson(50, size=(len(GENES), 12)), index=GENES, columns=samples)
+        expression.iloc[:30, 6:] *= 3
+        groups = pd.Series(["control"] * 6 + ["case"] * 6, index=samples)
+        results = CompetitiveGeneSetTest(store).camera(
+            expression, groups, "control", "case", ["LOCAL_A", "LOCAL_B", REMOTE], min_size=15
+        )
+        assert sorted(results) == ["LOCAL_A", "LOCAL_B"]
+        assert results["LOCAL_A"]['results'].iloc[0]['Term'] == "SET_0"
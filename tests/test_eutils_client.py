@@ -0,0 +1,118 @@
+"""AsyncEUtilsClient against the local E-utilities stand-in server"""
+
+import time
+
+import pytest
+
+from eutils_client import AsyncEUtilsClient
+from eutils_stub_server import start_stub_server, stub_pmids
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_stub_server(**kwargs)
+        servers.append(server)
+        return server.RequestHandlerClass.history, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def gene_queries(client, n_genes):
+    return {f"GENE{i}": client.gene_query(f"GENE{i}") for i in range(n_genes)}
+
+
+def test_requests_are_paced_to_the_rate_limit(stub):
+    history, base_url = stub(rate_limit=3)
+    client = AsyncEUtilsClient(base_url=base_url, max_retries=0)
+
+    start = time.monotonic()
+    results = client.search(gene_queries(client, 7), max_results=5)
+    elapsed = time.monotonic() - start
+
+    assert all('error' not in result for result in results.values())
+    assert all(entry['status'] == 200 for entry in history)
+    # Request starts are spaced 1/3 s apart
+    starts = [entry['time'] for entry in history]
+    assert elapsed >= (len(starts) - 1) / 3 * 0.9
+    assert all(later - earlier >= 1 / 3 * 0.8 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_api_key_raises_the_pace(stub):
+    history, base_url = stub(rate_limit=3)
+    client = AsyncEUtilsClient(api_key="test-key", base_url=base_url, max_retries=0)
+    assert client.rate == 10
+
+    start = time.monotonic()
+    results = client.search(gene_queries(client, 15), max_results=5)
+    elapsed = time.monotonic() - start
+
+    # 15+ requests would take over 5 s at 3/s; the stub allows 10/s with a key
+    assert all('error' not in result for result in results.values())
+    assert all(entry['status'] == 200 for entry in history)
+    assert elapsed < (len(history) - 1) / 3
+    assert elapsed >= (len(history) - 1) / 10 * 0.9
+
+
+def test_retries_after_rate_limit_responses(stub):
+    # The client paces at 3/s but the server only allows 1/s, so some requests get 429
+    history, base_url = stub(rate_limit=1)
+    client = AsyncEUtilsClient(base_url=base_url, max_retries=4)
+
+    results = client.search(gene_queries(client, 3), max_results=5)
+
+    assert any(entry['status'] == 429 for entry in history)
+    assert all('error' not in result for result in results.values())
+    for name, result in results.items():
+        count, pmids = stub_pmids(client.gene_query(name), 5)
+        assert result['total_results'] == count
+        assert [article['pmid'] for article in result['articles']] == pmids
+
+
+def test_retries_after_server_errors(stub):
+    history, base_url = stub(rate_limit=3, fail_first=2)
+    client = AsyncEUtilsClient(base_url=base_url, max_retries=3)
+
+    results = client.search({'TP53': client.gene_query('TP53')}, max_results=5)
+
+    assert [entry['status'] for entry in history[:2]] == [503, 503]
+    assert 'error' not in results['TP53']
+    assert len(results['TP53']['articles']) == min(stub_pmids(client.gene_query('TP53'), 5)[0], 5)
+
+
+def test_gives_up_after_max_retries(stub):
+    history, base_url = stub(rate_limit=3, fail_first=100)
+    client = AsyncEUtilsClient(base_url=base_url, max_retries=1)
+
+    results = client.search({'TP53': client.gene_query('TP53')}, max_results=5)
+
+    assert len(history) == 2
+    assert 'error' in results['TP53']
+    assert results['TP53']['articles'] == []
+
+
+def test_efetch_is_batched_and_deduplicated(stub):
+    history, base_url = stub(rate_limit=10)
+    client = AsyncEUtilsClient(api_key="test-key", base_url=base_url, fetch_batch_size=7)
+
+    # The same gene twice under different names shares its PMIDs
+    query = client.gene_query('MYC')
+    queries = dict(gene_queries(client, 4), MYC=query, MYC_again=query)
+    results = client.search(queries, max_results=20)
+
+    expected = set()
+    for name, query in queries.items():
+        expected.update(stub_pmids(query, 20)[1])
+        assert [article['pmid'] for article in results[name]['articles']] == stub_pmids(query, 20)[1]
+
+    fetches = [entry['ids'] for entry in history if entry['endpoint'] == 'efetch.fcgi' and entry['status'] == 200]
+    searches = [entry for entry in history if entry['endpoint'] == 'esearch.fcgi' and entry['status'] == 200]
+    fetched = [pmid for batch in fetches for pmid in batch]
+    assert len(searches) == len(queries)
+    assert all(0 < len(batch) <= 7 for batch in fetches)
+    assert len(fetched) == len(set(fetched)) == len(expected)
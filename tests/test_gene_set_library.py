@@ -0,0 +1,25 @@
+"""Gene set stores sharing one directory"""
+
+from gene_set_library import GeneSetStore
+
+
+def write_gmt(path, sets):
+    path.write_text("".join(f"{term}\tdescription\t" + "\t".join(genes) + "\n" for term, genes in sets.items()))
+    return path
+
+
+def test_two_stores_extend_one_vocabulary(tmp_path):
+    root = tmp_path / "libraries"
+    first, second = GeneSetStore(root), GeneSetStore(root)
+
+    # Both stores start from the same empty vocabulary and import different genes
+    first.import_gmt(write_gmt(tmp_path / "LIB_A.gmt", {"SET_A": ["TP53", "BRCA1", "EGFR"]}))
+    second.import_gmt(write_gmt(tmp_path / "LIB_B.gmt", {"SET_B": ["MYC", "KRAS", "TP53"]}))
+
+    reopened = GeneSetStore(root)
+    assert reopened.n_genes == 5
+    for store in [first, second, reopened]:
+        assert sorted(store.get_library("LIB_A").genes("SET_A")) == ["BRCA1", "EGFR", "TP53"]
+    for store in [second, reopened]:
+        assert sorted(store.get_library("LIB_B").genes("SET_B")) == ["KRAS", "MYC", "TP53"]
+    assert reopened.encode_genes(["TP53"])[0] == first.encode_genes(["TP53"])[0]
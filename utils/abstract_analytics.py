@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Abstract Analytics Engine for Prairie Genomics Suite
+
+Corpus-level analysis of the abstracts held in the local literature store.
+Titles and abstracts are tokenized once, streamed in chunks, into a sparse
+documents x tokens count matrix over a case-preserving vocabulary. Every
+other view is a sparse product with that matrix:
+
+- TF-IDF over lower-cased, stop-word-filtered terms (tokens -> terms map)
+- Gene mentions from exact matches against the gene symbol index
+  (tokens -> genes map), and gene co-mentions as G.T @ G
+- Gene novelty: DE significance against each gene's total PubMed hit count
+  (the local corpus holds at most max_results articles per gene query, so
+  its counts saturate for well-studied genes), and term novelty:
+  association with significant genes against corpus frequency
+
+Author: Prairie Genomics Team
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from itertools import chain
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+import warnings
+
+warnings.filterwarnings('ignore')
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9\-]*[A-Za-z0-9])?")
+
+
+class AbstractAnalyzer:
+    """
+    Sparse TF-IDF, gene co-mention and novelty analysis of stored abstracts
+    """
+
+    def __init__(self, store, min_df=2, max_df=0.5, chunk_size=5000):
+        """
+        Initialize the analyzer
+
+        Args:
+            store: LiteratureStore holding the articles
+            min_df: Minimum number of documents containing a term
+            max_df: Maximum fraction of documents containing a term
+            chunk_size: Articles tokenized per chunk
+        """
+        self.store = store
+        self.min_df = min_df
+        self.max_df = max_df
+        self.chunk_size = chunk_size
+
+    def build_corpus(self, pmids=None, progress_callback=None):
+        """
+        Tokenize stored articles into a sparse documents x tokens count matrix
+
+        Args:
+            pmids: Articles to include (all stored articles when None)
+            progress_callback: Optional function(message, pct)
+
+        Returns:
+            Dict with 'counts' (CSR documents x tokens), 'tokens' (vocabulary
+            array) and 'pmids'
+        """
+        vocabulary = {}
+        blocks, doc_pmids = [], []
+        n_docs = 0
+        total = len(pmids) if pmids is not None else self.store.stats()['articles']
+
+        for chunk in self.store.iter_articles(pmids, chunk_size=self.chunk_size):
+            text = chunk['title'].fillna('') + ' ' + chunk['abstract'].fillna('')
+            tokens = [TOKEN_PATTERN.findall(t) for t in text]
+            lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+
+            # Factorize within the chunk, then map only the chunk's distinct tokens globally
+            codes, uniques = pd.factorize(pd.Series(list(chain.from_iterable(tokens)), dtype=object))
+            global_ids = np.fromiter(
+                (vocabulary.setdefault(u, len(vocabulary)) for u in uniques),
+                dtype=np.int64, count=len(uniques)
+            )
+            rows = np.repeat(np.arange(n_docs, n_docs + len(chunk)), lengths)
+            blocks.append((rows, global_ids[codes]))
+
+            doc_pmids.append(chunk['pmid'].values)
+            n_docs += len(chunk)
+
+            if progress_callback:
+                progress_callback(f"Tokenized {n_docs:,}/{total:,} abstracts",
+                                  int(100 * n_docs / max(total, 1)))
+
+        if n_docs == 0:
+            return {
+                'counts': sparse.csr_matrix((0, 0)),
+                'tokens': np.array([], dtype=object),
+                'pmids': np.array([], dtype=object)
+            }
+
+        rows = np.concatenate([b[0] for b in blocks])
+        cols = np.concatenate([b[1] for b in blocks])
+        # Duplicate (document, token) entries are summed into counts
+        counts = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(n_docs, len(vocabulary))
+        )
+        counts.sum_duplicates()
+
+        tokens = np.empty(len(vocabulary), dtype=object)
+        tokens[list(vocabulary.values())] = list(vocabulary.keys())
+        return {
+            'counts': counts,
+            'tokens': tokens,
+            'pmids': np.concatenate(doc_pmids)
+        }
+
+    def term_matrix(self, corpus, exclude=None):
+        """
+        Sparse TF-IDF matrix over lower-cased terms
+
+        Args:
+            corpus: Output of build_corpus
+            exclude: Tokens left out of the term vocabulary (e.g. gene symbols,
+                which are analyzed through the mention matrix instead)
+
+        Returns:
+            Tuple (tfidf CSR documents x terms, term array, document frequency array)
+        """
+        counts, tokens = corpus['counts'], corpus['tokens']
+        n_docs = counts.shape[0]
+
+        lowered = pd.Series(tokens, dtype=object).str.lower()
+        keep = (~lowered.isin(ENGLISH_STOP_WORDS) & ~lowered.str.fullmatch(r"[\d\-]+")
+                & (lowered.str.len() > 1)).values
+        if exclude is not None:
+            keep = keep & ~pd.Series(tokens, dtype=object).isin(set(exclude)).values
+        term_ids, terms = pd.factorize(lowered[keep])
+        token_to_term = sparse.csr_matrix(
+            (np.ones(keep.sum(), dtype=np.float32), (np.flatnonzero(keep), term_ids)),
+            shape=(len(tokens), len(terms))
+        )
+        term_counts = (counts @ token_to_term).tocsc()
+
+        df = np.diff(term_counts.indptr)
+        retained = (df >= self.min_df) & (df <= self.max_df * n_docs)
+        term_counts = term_counts[:, retained].tocsr()
+        df = df[retained]
+
+        # Sublinear tf, smooth idf, l2-normalized rows
+        tfidf = term_counts.copy()
+        tfidf.data = 1 + np.log(tfidf.data)
+        tfidf = tfidf @ sparse.diags(np.log((1 + n_docs) / (1 + df)) + 1)
+        norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        tfidf = sparse.diags(1 / np.where(norms > 0, norms, 1)) @ tfidf
+
+        return tfidf.tocsr(), np.asarray(terms, dtype=object)[retained], df
+
+    @staticmethod
+    def gene_matrix(corpus, gene_symbols):
+        """
+        Binary documents x genes mention matrix from exact symbol matches
+
+        Returns:
+            Tuple (mentions CSR documents x genes, gene symbol array)
+        """
+        genes = pd.Index(pd.unique(pd.Series(list(gene_symbols), dtype=object).dropna().astype(str)))
+        gene_ids = genes.get_indexer(corpus['tokens'])
+        matched = np.flatnonzero(gene_ids >= 0)
+        token_to_gene = sparse.csr_matrix(
+            (np.ones(len(matched), dtype=np.float32), (matched, gene_ids[matched])),
+            shape=(len(corpus['tokens']), len(genes))
+        )
+        mentions = (corpus['counts'] @ token_to_gene).tocsr()
+        mentions.data[:] = 1
+        return mentions, genes.values
+
+    @staticmethod
+    def co_mentions(mentions, genes, min_articles=2, max_pairs=500):
+        """
+        Gene pairs mentioned together, ranked by shared article count
+
+        Returns:
+            DataFrame with gene_a, gene_b, n_articles and jaccard columns
+        """
+        shared = sparse.triu(mentions.T @ mentions, k=1).tocoo()
+        per_gene = np.asarray(mentions.sum(axis=0)).ravel()
+
+        keep = shared.data >= min_articles
+        i, j, n = shared.row[keep], shared.col[keep], shared.data[keep]
+        order = np.argsort(-n, kind='stable')[:max_pairs]
+        i, j, n = i[order], j[order], n[order]
+
+        return pd.DataFrame({
+            'gene_a': genes[i],
+            'gene_b': genes[j],
+            'n_articles': n.astype(int),
+            'jaccard': n / (per_gene[i] + per_gene[j] - n)
+        })
+
+    def analyze(self, gene_symbols, de_results=None, pmids=None, symbol_column='gene_symbol',
+                publication_counts=None, top_terms=50, progress_callback=None):
+        """
+        Run the full abstract analysis
+
+        Args:
+            gene_symbols: Gene symbol index matched against abstract tokens
+            de_results: Optional DE table with 'padj' (and a symbol column or
+                symbol index) for novelty ranking
+            pmids: Articles to analyze (all stored articles when None)
+            symbol_column: DE column holding gene symbols
+            publication_counts: Dict of gene symbol -> total PubMed hits of
+                its search query; gene novelty covers these genes only
+            top_terms: Number of terms in the ranked term tables
+            progress_callback: Optional function(message, pct)
+
+        Returns:
+            Dict with 'n_documents', 'top_terms', 'gene_mentions',
+            'co_mentions' and, when DE results are given, 'gene_novelty'
+            and 'term_novelty' DataFrames
+        """
+        corpus = self.build_corpus(pmids, progress_callback)
+        n_docs = corpus['counts'].shape[0]
+        if n_docs == 0:
+            return {'n_documents': 0}
+
+        if progress_callback:
+            progress_callback("Building TF-IDF and co-mention matrices", 100)
+
+        mentions, genes = self.gene_matrix(corpus, gene_symbols)
+        tfidf, terms, df = self.term_matrix(corpus, exclude=genes)
+        articles_per_gene = np.asarray(mentions.sum(axis=0)).ravel().astype(int)
+
+        weight = np.asarray(tfidf.sum(axis=0)).ravel()
+        order = np.argsort(-weight, kind='stable')[:top_terms]
+        term_table = pd.DataFrame({
+            'term': terms[order],
+            'n_articles': df[order],
+            'tfidf_weight': weight[order]
+        })
+
+        mentioned = articles_per_gene > 0
+        gene_table = pd.DataFrame({
+            'gene': genes[mentioned],
+            'n_articles': articles_per_gene[mentioned]
+        }).sort_values('n_articles', ascending=False, kind='stable').reset_index(drop=True)
+
+        results = {
+            'n_documents': n_docs,
+            'top_terms': term_table,
+            'gene_mentions': gene_table,
+            'co_mentions': self.co_mentions(mentions, genes)
+        }
+
+        if de_results is not None and 'padj' in de_results.columns:
+            results.update(self._novelty(de_results, symbol_column, genes, articles_per_gene,
+                                         publication_counts or {}, mentions, tfidf, terms, df,
+                                         top_terms))
+        return results
+
+    @staticmethod
+    def _novelty(de_results, symbol_column, genes, articles_per_gene, publication_counts,
+                 mentions, tfidf, terms, df, top_terms):
+        """Gene and term novelty from DE significance versus publication counts"""
+        symbols = de_results[symbol_column] if symbol_column in de_results.columns \
+            else pd.Series(de_results.index, index=de_results.index)
+        significance = pd.Series(
+            -np.log10(np.clip(de_results['padj'].astype(float).values, 1e-300, 1)),
+            index=symbols.astype(str).values
+        ).dropna()
+        significance = significance.groupby(level=0).max()
+
+        gene_sig = significance.reindex(genes).fillna(0).values
+
+        counts = pd.Series(publication_counts, dtype=float)
+        counted_sig = significance.reindex(counts.index).fillna(0).values
+        gene_novelty = pd.DataFrame({
+            'gene': counts.index.astype(str),
+            'significance': counted_sig,
+            'n_publications': counts.values.astype(int),
+            'novelty': counted_sig / np.log2(2 + counts.values)
+        })
+        gene_novelty = gene_novelty[gene_novelty['significance'] > 0]
+        gene_novelty = gene_novelty.sort_values('novelty', ascending=False, kind='stable').reset_index(drop=True)
+
+        # Term signal: significance-weighted TF-IDF mass in articles mentioning each gene,
+        # normalized per gene so heavily studied genes do not dominate
+        per_gene = gene_sig / np.maximum(articles_per_gene, 1)
+        doc_weight = mentions @ per_gene
+        signal = np.asarray(tfidf.T @ doc_weight).ravel()
+        novelty = signal / np.log2(2 + df)
+        order = np.argsort(-novelty, kind='stable')[:top_terms]
+        term_novelty = pd.DataFrame({
+            'term': terms[order],
+            'n_articles': df[order],
+            'signal': signal[order],
+            'novelty': novelty[order]
+        })
+        term_novelty = term_novelty[term_novelty['signal'] > 0].reset_index(drop=True)
+
+        return {'gene_novelty': gene_novelty, 'term_novelty': term_novelty}
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Batched Cox Proportional Hazards Fitter for Prairie Genomics Suite
+
+Fits thousands of small Cox models (one gene + shared clinical covariates)
+simultaneously. All models share a single risk-set ordering, so the partial
+likelihood, score and information for every model are computed with reverse
+cumulative sums over one sorted sample axis, and Newton-Raphson steps are
+taken for all unconverged models at once.
+
+Author: Prairie Genomics Team
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+class BatchCoxFitter:
+    """
+    Vectorized Newton-Raphson Cox PH fitter for gene-level survival screens
+    """
+
+    def __init__(self, ties="efron", max_iter=50, tol=1e-9, chunk_size=256):
+        """
+        Initialize the fitter
+
+        Args:
+            ties: Tie handling for the partial likelihood ("efron" or "breslow")
+            max_iter: Maximum Newton-Raphson iterations per model
+            tol: Convergence tolerance on the log partial likelihood change
+            chunk_size: Number of models fitted together in one batch
+        """
+        if ties not in ("efron", "breslow"):
+            raise ValueError(f"Unknown ties method: {ties}")
+
+        self.ties = ties
+        self.max_iter = max_iter
+        self.tol = tol
+        self.chunk_size = chunk_size
+
+    def prepare_covariates(self, clinical_data, covariates):
+        """Encode clinical covariates as a numeric design matrix"""
+        if not covariates:
+            return pd.DataFrame(index=clinical_data.index)
+
+        design = pd.get_dummies(
+            clinical_data[covariates], drop_first=True, dtype=float
+        )
+        return design.astype(float)
+
+    def fit_genes(self, expression_data, durations, events, covariate_data=None,
+                  confidence_level=0.95, progress_callback=None):
+        """
+        Fit one Cox model per gene (gene + covariates) in vectorized batches
+
+        Args:
+            expression_data: Genes x samples DataFrame (already transformed)
+            durations: Series of survival times indexed by sample
+            events: Series of event indicators (1=event, 0=censored) indexed by sample
+            covariate_data: Optional samples x covariates DataFrame (numeric)
+            confidence_level: Confidence level for hazard ratio intervals
+            progress_callback: Optional callback(message, progress)
+
+        Returns:
+            DataFrame with one row per gene: coef, HR, CI, Wald and LRT p-values
+        """
+        # Align samples across expression, survival and covariates
+        samples = expression_data.columns.intersection(durations.index).intersection(events.index)
+        if covariate_data is not None and covariate_data.shape[1] > 0:
+            samples = samples.intersection(covariate_data.dropna().index)
+
+        time = pd.to_numeric(durations.loc[samples], errors='coerce')
+        event = pd.to_numeric(events.loc[samples], errors='coerce')
+        valid = time.notna() & event.notna() & (time >= 0)
+        samples = samples[valid.values]
+
+        if len(samples) < 10:
+            raise ValueError("At least 10 samples with complete survival data are required")
+
+        time = time.loc[samples].values.astype(float)
+        event = event.loc[samples].values.astype(float) > 0
+
+        if covariate_data is not None and covariate_data.shape[1] > 0:
+            covariate_names = list(covariate_data.columns)
+            Z = covariate_data.loc[samples].values.astype(float)
+        else:
+            covariate_names = []
+            Z = np.empty((len(samples), 0))
+
+        genes = expression_data.values[:, expression_data.columns.get_indexer(samples)].astype(float)
+
+        # Shared risk-set ordering: ascending time, events before censored at ties
+        order = np.lexsort((~event, time))
+        risk = self._build_risk_sets(time[order], event[order])
+        genes = genes[:, order]
+        Z = Z[order] - Z.mean(axis=0)
+
+        # Genes without variation or with missing values cannot be fitted
+        fittable = np.isfinite(genes).all(axis=1) & (genes.std(axis=1) > 0)
+
+        # Reduced (covariates-only) model for the likelihood ratio test
+        if Z.shape[1] > 0:
+            reduced = self._fit_batch(Z[None, :, :], risk)
+            ll_reduced = reduced['log_likelihood'][0]
+        else:
+            ll_reduced = self._log_likelihood_null(risk, len(samples))
+
+        n_genes = genes.shape[0]
+        n_params = 1 + Z.shape[1]
+        coef = np.full((n_genes, n_params), np.nan)
+        se = np.full((n_genes, n_params), np.nan)
+        log_likelihood = np.full(n_genes, np.nan)
+        n_iter = np.zeros(n_genes, dtype=int)
+        converged = np.zeros(n_genes, dtype=bool)
+
+        fit_idx = np.flatnonzero(fittable)
+        for start in range(0, len(fit_idx), self.chunk_size):
+            idx = fit_idx[start:start + self.chunk_size]
+            gene_block = genes[idx] - genes[idx].mean(axis=1, keepdims=True)
+
+            X = np.empty((len(idx), len(samples), n_params))
+            X[:, :, 0] = gene_block
+            X[:, :, 1:] = Z[None, :, :]
+
+            batch = self._fit_batch(X, risk)
+            coef[idx] = batch['coef']
+            se[idx] = batch['se']
+            log_likelihood[idx] = batch['log_likelihood']
+            n_iter[idx] = batch['n_iter']
+            converged[idx] = batch['converged']
+
+            if progress_callback:
+                done = min(start + self.chunk_size, len(fit_idx))
+                progress_callback(f"Fitted {done}/{len(fit_idx)} Cox models", done / len(fit_idx) * 100)
+
+        # Gene-term statistics
+        z_crit = stats.norm.ppf(1 - (1 - confidence_level) / 2)
+        gene_coef = coef[:, 0]
+        gene_se = se[:, 0]
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            z_scores = gene_coef / gene_se
+            wald_p = 2 * stats.norm.sf(np.abs(z_scores))
+            lrt_stat = np.maximum(2 * (log_likelihood - ll_reduced), 0)
+            lrt_p = stats.chi2.sf(lrt_stat, df=1)
+
+            results = pd.DataFrame({
+                'coef': gene_coef,
+                'se': gene_se,
+                'hazard_ratio': np.exp(gene_coef),
+                'ci_lower': np.exp(gene_coef - z_crit * gene_se),
+                'ci_upper': np.exp(gene_coef + z_crit * gene_se),
+                'z': z_scores,
+                'wald_p': wald_p,
+                'lrt_stat': lrt_stat,
+                'lrt_p': lrt_p,
+                'log_likelihood': log_likelihood,
+                'n_iter': n_iter,
+                'converged': converged
+            }, index=expression_data.index)
+
+            # Covariate hazard ratios per model
+            for j, name in enumerate(covariate_names, start=1):
+                results[f'HR_{name}'] = np.exp(coef[:, j])
+
+        # Benjamini-Hochberg over the genes that could be fitted
+        padj = np.full(n_genes, np.nan)
+        tested = np.isfinite(wald_p)
+        if tested.any():
+            padj[tested] = stats.false_discovery_control(wald_p[tested])
+        results['padj'] = padj
+        results.attrs['n_samples'] = len(samples)
+        results.attrs['n_events'] = int(event.sum())
+        results.attrs['ties'] = self.ties
+        results.attrs['covariates'] = covariate_names
+
+        return results
+
+    def fit_replicates(self, design, durations, events, weights):
+        """
+        Fit one covariate design under many case weightings at once
+
+        Every weighting (e.g. bootstrap resampling counts) shares the risk-set
+        ordering of the full data, so replicates are just additional models.
+
+        Args:
+            design: Samples x covariates numeric array
+            durations: Array of survival times
+            events: Array of event indicators
+            weights: Replicates x samples array of non-negative case weights
+
+        Returns:
+            Dict with per-replicate 'coef', 'se' and 'converged' arrays
+        """
+        design = np.asarray(design, dtype=float)
+        if design.ndim == 1:
+            design = design[:, None]
+        time = np.asarray(durations, dtype=float)
+        event = np.asarray(events, dtype=float) > 0
+        weights = np.asarray(weights, dtype=float)
+
+        order = np.lexsort((~event, time))
+        risk = self._build_risk_sets(time[order], event[order])
+        design = design[order] - design.mean(axis=0)
+        weights = weights[:, order]
+
+        coef = np.empty((len(weights), design.shape[1]))
+        se = np.empty_like(coef)
+        converged = np.empty(len(weights), dtype=bool)
+        for start in range(0, len(weights), self.chunk_size):
+            block = slice(start, start + self.chunk_size)
+            n_block = len(weights[block])
+            X = np.broadcast_to(design, (n_block,) + design.shape)
+            batch = self._fit_batch(X, risk, weights[block])
+            coef[block], se[block] = batch['coef'], batch['se']
+            converged[block] = batch['converged']
+
+        return {'coef': coef, 'se': se, 'converged': converged}
+
+    def _build_risk_sets(self, time, event):
+        """Precompute the shared risk-set structure from sorted times and events"""
+        event_pos = np.flatnonzero(event)
+        if len(event_pos) == 0:
+            raise ValueError("No events observed - Cox model cannot be fitted")
+
+        event_times = time[event_pos]
+        new_group = np.r_[True, event_times[1:] != event_times[:-1]]
+        group_starts = np.flatnonzero(new_group)
+        group_sizes = np.diff(np.r_[group_starts, len(event_pos)])
+
+        # First sorted index still at risk for each distinct event time
+        risk_start = np.searchsorted(time, event_times[group_starts], side='left')
+
+        # Expand each tied group into d entries (Efron fractions l/d, Breslow 0)
+        expand = np.repeat(np.arange(len(group_starts)), group_sizes)
+        within = np.arange(len(event_pos)) - np.repeat(group_starts, group_sizes)
+        if self.ties == "efron":
+            fraction = within / np.repeat(group_sizes, group_sizes)
+        else:
+            fraction = np.zeros(len(event_pos))
+
+        return {
+            'event_pos': event_pos,
+            'group_starts': group_starts,
+            'risk_start': risk_start,
+            'expand': expand,
+            'fraction': fraction
+        }
+
+    def _log_likelihood_null(self, risk, n_samples):
+        """Log partial likelihood with all coefficients at zero"""
+        return self._evaluate(np.zeros((1, n_samples, 0)), np.zeros((1, 0)), risk)[0][0]
+
+    def _tie_weights(self, risk, weights):
+        """Per-model Efron fractions and event-term weights under case weights"""
+        ep, gs, ex = risk['event_pos'], risk['group_starts'], risk['expand']
+        event_weights = weights[:, ep]
+
+        if self.ties == "breslow":
+            return np.zeros_like(event_weights), event_weights
+
+        # Efron as in survival::coxph - only tied deaths with positive weight
+        # count, each of the ndead terms carrying the mean death weight
+        present = event_weights > 0
+        before = np.cumsum(present, axis=1) - present
+        rank = before - before[:, gs][:, ex]
+        n_dead = np.add.reduceat(present, gs, axis=1)
+        mean_weight = np.add.reduceat(event_weights, gs, axis=1) / np.maximum(n_dead, 1)
+
+        fraction = np.where(present, rank / np.maximum(n_dead[:, ex], 1), 0)
+        entry_weight = np.where(present, mean_weight[:, ex], 0)
+        return fraction, entry_weight
+
+    def _evaluate(self, X, beta, risk, weights=None):
+        """Log partial likelihood, score and Hessian for a batch of models"""
+        eta = np.einsum('mnp,mp->mn', X, beta)
+        # The max-shift cancels between event and risk-set terms
+        eta -= eta.max(axis=1, keepdims=True)
+        w = np.exp(eta)
+        if weights is not None:
+            w = w * weights
+
+        wx = w[:, :, None] * X
+        wxx = wx[:, :, :, None] * X[:, :, None, :]
+
+        # Risk-set sums via reverse cumulative sums, read at each group start
+        rs = risk['risk_start']
+        S0 = np.cumsum(w[:, ::-1], axis=1)[:, ::-1][:, rs]
+        S1 = np.cumsum(wx[:, ::-1], axis=1)[:, ::-1][:, rs]
+        S2 = np.cumsum(wxx[:, ::-1], axis=1)[:, ::-1][:, rs]
+
+        # Sums over the tied events at each distinct time
+        ep, gs = risk['event_pos'], risk['group_starts']
+        D0 = np.add.reduceat(w[:, ep], gs, axis=1)
+        D1 = np.add.reduceat(wx[:, ep], gs, axis=1)
+        D2 = np.add.reduceat(wxx[:, ep], gs, axis=1)
+
+        ex = risk['expand']
+        if weights is None:
+            f = np.broadcast_to(risk['fraction'], (X.shape[0], len(ep)))
+            entry_weight = np.ones_like(f)
+            event_weights = np.ones((X.shape[0], len(ep)))
+        else:
+            f, entry_weight = self._tie_weights(risk, weights)
+            event_weights = weights[:, ep]
+
+        den = S0[:, ex] - f * D0[:, ex]
+        den = np.where(entry_weight > 0, den, 1)
+        num1 = S1[:, ex] - f[:, :, None] * D1[:, ex]
+        num2 = S2[:, ex] - f[:, :, None, None] * D2[:, ex]
+
+        a = num1 / den[:, :, None]
+        log_likelihood = (event_weights * eta[:, ep]).sum(axis=1) - (entry_weight * np.log(den)).sum(axis=1)
+        score = (event_weights[:, :, None] * X[:, ep]).sum(axis=1) - (entry_weight[:, :, None] * a).sum(axis=1)
+        hessian = (
+            -(entry_weight[:, :, None, None] * num2 / den[:, :, None, None]).sum(axis=1)
+            + np.einsum('mk,mkp,mkq->mpq', entry_weight, a, a)
+        )
+
+        return log_likelihood, score, hessian
+
+    def _fit_batch(self, X, risk, weights=None):
+        """Newton-Raphson with step halving and per-model convergence masks"""
+        n_models, _, n_params = X.shape
+        beta = np.zeros((n_models, n_params))
+        ll, score, hessian = self._evaluate(X, beta, risk, weights)
+        converged = np.zeros(n_models, dtype=bool)
+        n_iter = np.zeros(n_models, dtype=int)
+
+        for _ in range(self.max_iter):
+            active = np.flatnonzero(~converged)
+            if len(active) == 0:
+                break
+
+            X_active = X[active]
+            w_active = weights[active] if weights is not None else None
+
+            information = -hessian[active]
+            step = self._solve(information, score[active])
+
+            new_beta = beta[active] + step
+            new_ll, new_score, new_hessian = self._evaluate(X_active, new_beta, risk, w_active)
+
+            # Halve steps for models whose likelihood decreased
+            for _ in range(10):
+                worse = ~(new_ll >= ll[active] - 1e-12)
+                if not worse.any():
+                    break
+                step[worse] /= 2
+                new_beta[worse] = beta[active][worse] + step[worse]
+                sub_ll, sub_score, sub_hessian = self._evaluate(
+                    X_active[worse], new_beta[worse], risk,
+                    w_active[worse] if w_active is not None else None
+                )
+                new_ll[worse], new_score[worse], new_hessian[worse] = sub_ll, sub_score, sub_hessian
+
+            delta = np.abs(new_ll - ll[active])
+            beta[active] = new_beta
+            ll[active], score[active], hessian[active] = new_ll, new_score, new_hessian
+            n_iter[active] += 1
+            converged[active] = (delta < self.tol) | (np.abs(step).max(axis=1) < self.tol)
+
+        covariance = np.linalg.pinv(-hessian)
+        se = np.sqrt(np.clip(np.diagonal(covariance, axis1=1, axis2=2), 0, None))
+        se[~np.isfinite(se) | (se == 0)] = np.nan
+
+        return {
+            'coef': beta,
+            'se': se,
+            'log_likelihood': ll,
+            'n_iter': n_iter,
+            'converged': converged
+        }
+
+    @staticmethod
+    def _solve(information, score):
+        """Batched Newton step, falling back to pseudo-inverse when singular"""
+        try:
+            return np.linalg.solve(information, score[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            return np.einsum('mpq,mq->mp', np.linalg.pinv(information), score)
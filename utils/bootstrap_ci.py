@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Bootstrap Confidence Intervals for Prairie Genomics Suite
+
+Resampling engine for survival and differential expression effect sizes.
+Bootstrap replicates are drawn as index matrices from independent,
+reproducible RNG streams (one SeedSequence child per replicate chunk, so
+results do not depend on the number of workers) and converted to resampling
+count matrices. Statistics are then evaluated for whole blocks of replicates
+at once - KM medians as weighted cumulative products, hazard ratios as
+case-weighted batched Cox fits, fold changes as a single matrix product -
+spread across a process pool.
+
+Author: Prairie Genomics Team
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import warnings
+
+from batch_cox import BatchCoxFitter
+
+warnings.filterwarnings('ignore')
+
+
+class BootstrapEngine:
+    """
+    Parallel, batched bootstrap for KM medians, hazard ratios and fold changes
+    """
+
+    def __init__(self, n_bootstrap=1000, confidence_level=0.95, n_workers=None,
+                 seed=42, chunk_size=100):
+        """
+        Initialize the bootstrap engine
+
+        Args:
+            n_bootstrap: Number of bootstrap replicates
+            confidence_level: Confidence level for percentile intervals
+            n_workers: Worker processes (defaults to min(4, CPU count); 1 runs inline)
+            seed: Root seed for the per-chunk RNG streams
+            chunk_size: Replicates drawn and evaluated per task
+        """
+        self.n_bootstrap = n_bootstrap
+        self.confidence_level = confidence_level
+        self.n_workers = n_workers if n_workers is not None else min(4, os.cpu_count() or 1)
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def km_median_ci(self, durations, events, groups):
+        """
+        Bootstrap confidence intervals for Kaplan-Meier median survival per group
+
+        Samples are resampled within each group. Replicates whose median is not
+        reached are treated as infinite, so an unbounded upper limit is None.
+
+        Returns:
+            Dict of group -> {'median', 'confidence_interval', 'n_bootstrap'}
+        """
+        data = pd.DataFrame({
+            'duration': pd.to_numeric(pd.Series(durations), errors='coerce').values,
+            'event': pd.to_numeric(pd.Series(events), errors='coerce').values,
+            'group': pd.Series(groups).values
+        }).dropna()
+
+        results = {}
+        for group, group_data in data.groupby('group'):
+            order = np.argsort(group_data['duration'].values, kind='stable')
+            time = group_data['duration'].values[order]
+            event = group_data['event'].values[order] > 0
+
+            point = _km_medians(time, event, np.ones((1, len(time))))[0]
+            medians = np.concatenate(self._map(
+                _km_median_chunk,
+                [(time, event, stream, n_reps) for stream, n_reps in self._chunks()]
+            ))
+
+            lower, upper = self._percentile_interval(np.where(np.isnan(medians), np.inf, medians))
+            results[group] = {
+                'median': float(point) if np.isfinite(point) else 'Not reached',
+                'confidence_interval': [lower, upper],
+                'n_bootstrap': self.n_bootstrap
+            }
+
+        return results
+
+    def hazard_ratio_ci(self, durations, events, covariate_data, ties="efron"):
+        """
+        Bootstrap percentile intervals for Cox hazard ratios
+
+        Args:
+            durations: Survival times aligned with covariate_data rows
+            events: Event indicators aligned with covariate_data rows
+            covariate_data: Samples x covariates numeric DataFrame
+            ties: Tie handling passed to the batched Cox fitter
+
+        Returns:
+            DataFrame indexed by covariate with hazard ratio and bootstrap CI
+        """
+        design = covariate_data.values.astype(float)
+        time = np.asarray(durations, dtype=float)
+        event = np.asarray(events, dtype=float)
+
+        fitter = BatchCoxFitter(ties=ties)
+        point = fitter.fit_replicates(design, time, event, np.ones((1, len(time))))['coef'][0]
+
+        chunks = self._map(
+            _cox_chunk,
+            [(design, time, event, ties, stream, n_reps) for stream, n_reps in self._chunks()]
+        )
+        coef = np.concatenate([c['coef'] for c in chunks])
+        converged = np.concatenate([c['converged'] for c in chunks])
+        coef = coef[converged]
+
+        lower, upper = self._percentile_interval(coef, axis=0)
+        return pd.DataFrame({
+            'hazard_ratio': np.exp(point),
+            'boot_ci_lower': np.exp(lower),
+            'boot_ci_upper': np.exp(upper),
+            'n_converged': int(converged.sum())
+        }, index=covariate_data.columns)
+
+    def fold_change_ci(self, expression_data, groups, reference, target,
+                       log_transform=True, gene_block_size=5000):
+        """
+        Bootstrap confidence intervals for log2 fold changes of every gene
+
+        Samples are resampled within each group; all replicates for a block of
+        genes are evaluated as one matrix product of log expression with the
+        resampling count matrix.
+
+        Args:
+            expression_data: Genes x samples expression DataFrame
+            groups: Series of group labels indexed by sample
+            reference: Reference group label (denominator)
+            target: Target group label (numerator)
+            log_transform: Apply log2(x + 1) before averaging
+            gene_block_size: Genes evaluated per worker task
+
+        Returns:
+            DataFrame indexed by gene with log2FC, bootstrap SE and CI
+        """
+        groups = pd.Series(groups)
+        ref_samples = expression_data.columns.intersection(groups.index[groups == reference])
+        target_samples = expression_data.columns.intersection(groups.index[groups == target])
+        if len(ref_samples) < 2 or len(target_samples) < 2:
+            raise ValueError("Each group needs at least 2 samples for bootstrapping")
+
+        values = expression_data[ref_samples.append(target_samples)].values.astype(float)
+        if log_transform:
+            values = np.log2(np.clip(values, 0, None) + 1)
+        n_ref = len(ref_samples)
+
+        # Resampling weights drawn once per chunk stream, shared by all genes
+        ref_weights, target_weights = [], []
+        for stream, n_reps in self._chunks():
+            rng = np.random.default_rng(stream)
+            ref_weights.append(_resample_counts(rng, n_reps, n_ref) / n_ref)
+            target_weights.append(_resample_counts(rng, n_reps, len(target_samples)) / len(target_samples))
+        ref_weights = np.vstack(ref_weights)
+        target_weights = np.vstack(target_weights)
+
+        tail = (1 - self.confidence_level) / 2 * 100
+        tasks = [
+            (values[start:start + gene_block_size, :n_ref], values[start:start + gene_block_size, n_ref:],
+             ref_weights, target_weights, tail)
+            for start in range(0, len(values), gene_block_size)
+        ]
+        summary = np.vstack(self._map(_fold_change_block, tasks))
+
+        point = values[:, n_ref:].mean(axis=1) - values[:, :n_ref].mean(axis=1)
+        return pd.DataFrame({
+            'log2FoldChange': point,
+            'log2FC_se': summary[:, 0],
+            'log2FC_ci_lower': summary[:, 1],
+            'log2FC_ci_upper': summary[:, 2]
+        }, index=expression_data.index)
+
+    def _chunks(self):
+        """Independent SeedSequence per replicate chunk, with its replicate count"""
+        n_chunks = int(np.ceil(self.n_bootstrap / self.chunk_size))
+        streams = np.random.SeedSequence(self.seed).spawn(n_chunks)
+        sizes = [min(self.chunk_size, self.n_bootstrap - i * self.chunk_size) for i in range(n_chunks)]
+        return list(zip(streams, sizes))
+
+    def _map(self, func, tasks):
+        """Run tasks on the process pool, or inline for a single worker"""
+        if self.n_workers <= 1 or len(tasks) <= 1:
+            return [func(*task) for task in tasks]
+
+        with ProcessPoolExecutor(max_workers=min(self.n_workers, len(tasks))) as executor:
+            return list(executor.map(func, *zip(*tasks)))
+
+    def _percentile_interval(self, values, axis=None):
+        """Percentile interval; infinite bounds are reported as None"""
+        tail = (1 - self.confidence_level) / 2 * 100
+        if len(values) == 0:
+            return None, None
+
+        lower, upper = np.percentile(values, [tail, 100 - tail], axis=axis)
+        if axis is None:
+            return (
+                float(lower) if np.isfinite(lower) else None,
+                float(upper) if np.isfinite(upper) else None
+            )
+        return lower, upper
+
+
+def _resample_counts(rng, n_reps, n):
+    """Draw a bootstrap index matrix and convert it to per-sample counts"""
+    index = rng.integers(0, n, size=(n_reps, n))
+    flat = index + (np.arange(n_reps) * n)[:, None]
+    return np.bincount(flat.ravel(), minlength=n_reps * n).reshape(n_reps, n).astype(float)
+
+
+def _km_medians(time, event, weights):
+    """Vectorized KM median for many weightings of time-sorted samples"""
+    starts = np.flatnonzero(np.r_[True, time[1:] != time[:-1]])
+    at_risk = np.cumsum(weights[:, ::-1], axis=1)[:, ::-1][:, starts]
+    deaths = np.add.reduceat(weights * event, starts, axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hazard = np.where(at_risk > 0, deaths / at_risk, 0)
+    survival = np.cumprod(1 - hazard, axis=1)
+
+    below = survival <= 0.5
+    first = below.argmax(axis=1)
+    return np.where(below.any(axis=1), time[starts][first], np.nan)
+
+
+def _km_median_chunk(time, event, stream, n_reps):
+    """Worker: KM medians for one chunk of bootstrap replicates"""
+    rng = np.random.default_rng(stream)
+    return _km_medians(time, event, _resample_counts(rng, n_reps, len(time)))
+
+
+def _cox_chunk(design, time, event, ties, stream, n_reps):
+    """Worker: case-weighted batched Cox fits for one chunk of replicates"""
+    rng = np.random.default_rng(stream)
+    weights = _resample_counts(rng, n_reps, len(time))
+    return BatchCoxFitter(ties=ties).fit_replicates(design, time, event, weights)
+
+
+def _fold_change_block(ref_values, target_values, ref_weights, target_weights, tail):
+    """Worker: bootstrap log2FC summaries for one block of genes"""
+    replicates = target_values @ target_weights.T - ref_values @ ref_weights.T
+    lower, upper = np.percentile(replicates, [tail, 100 - tail], axis=1)
+    return np.column_stack([replicates.std(axis=1, ddof=1), lower, upper])
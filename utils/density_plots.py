@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+MA and Mean-Variance Density Plots for Prairie Genomics Suite
+
+Diagnostic scatter plots over every gene (tens of thousands of points)
+drawn from server-side hexagonal binning: genes are assigned to the
+nearest centre of a hexagonal lattice laid out in display space, and only
+the occupied cells (centre, gene count) are sent to the browser, drawn as
+hexagon markers colored by log count. The payload depends on the grid
+size, not on the number of genes, and dense regions show their density
+instead of a solid blot of overlapping markers.
+
+- MA plot: log2 fold change (M) against mean expression (A) from DE
+  results, with a running-median trend (should stay on zero for a well
+  normalized comparison), a capped set of the most significant genes
+  marked on top, and highlighted genes labelled by the shared LabelPlacer.
+- Mean-variance plot: per-gene standard deviation against mean of
+  log-scale data with a running-median trend (as in meanSdPlot), or for
+  raw counts variance against mean on log axes with the Poisson line and
+  the fitted negative binomial dispersion trend (a0 + a1 / mean).
+
+Author: Prairie Genomics Team
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from label_layout import LabelPlacer, plotly_annotations
+from volcano_plot import FC_COLUMNS, P_COLUMNS, LABEL_COLUMNS, COLORS, _first_column
+import warnings
+
+warnings.filterwarnings('ignore')
+
+# Mean expression columns; log-scale ones are used as-is
+MEAN_COLUMNS = ['baseMean', 'base_mean', 'mean_expression', 'AveExpr', 'logCPM']
+LOG_MEAN_COLUMNS = ['AveExpr', 'logCPM']
+
+# Plot area margins around the nominal width x height (room for the colorbar)
+MARGINS = dict(l=70, r=110, t=60, b=60)
+
+HEX_COLORSCALE = 'Viridis'
+
+
+class DensityPlotRenderer:
+    """
+    Hexbin MA and mean-variance plots with fitted trends
+    """
+
+    def __init__(self, gridsize=40, max_marked=150, trend_bins=40, label_placer=None):
+        """
+        Initialize the renderer
+
+        Args:
+            gridsize: Hexagons across the plot width (rows follow the aspect ratio)
+            max_marked: Most significant genes drawn individually on the MA plot
+            trend_bins: Quantile bins of the running-median trends
+            label_placer: LabelPlacer for highlighted gene labels
+        """
+        self.gridsize = gridsize
+        self.max_marked = max_marked
+        self.trend_bins = trend_bins
+        self.label_placer = label_placer or LabelPlacer()
+
+    def hexbin(self, x, y, x_range, y_range, width, height, flags=None):
+        """
+        Aggregate points into a hexagonal lattice that is regular on screen
+
+        Args:
+            x, y: Point coordinates (data units)
+            x_range, y_range: Axis ranges spanning the plot area
+            width, height: Plot area size in pixels
+            flags: Optional boolean per point, counted per cell
+
+        Returns:
+            DataFrame of occupied cells with 'x', 'y' (centre), 'count' and
+            'flagged', plus the hexagon width in pixels (as attrs['hex_width'])
+        """
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        cell_w = (x_range[1] - x_range[0]) / self.gridsize
+        hex_width = width / self.gridsize
+        # Row spacing of sqrt(3) hex widths (on screen) makes the hexagons regular
+        cell_h = (y_range[1] - y_range[0]) * np.sqrt(3) * hex_width / height
+
+        sx = (x - x_range[0]) / cell_w
+        sy = (y - y_range[0]) / cell_h
+
+        # Nearest centre on the two offset rectangular lattices (in doubled units)
+        i1, j1 = np.round(sx), np.round(sy)
+        i2, j2 = np.floor(sx), np.floor(sy)
+        d1 = (sx - i1) ** 2 + 3 * (sy - j1) ** 2
+        d2 = (sx - i2 - 0.5) ** 2 + 3 * (sy - j2 - 0.5) ** 2
+        first = d1 <= d2
+        cx = np.where(first, 2 * i1, 2 * i2 + 1).astype(np.int64)
+        cy = np.where(first, 2 * j1, 2 * j2 + 1).astype(np.int64)
+
+        keys = (cx - cx.min()) * (cy.max() - cy.min() + 1) + (cy - cy.min()) if len(cx) else cx
+        cells, first_index, inverse, counts = np.unique(keys, return_index=True, return_inverse=True,
+                                                        return_counts=True)
+        flagged = np.bincount(inverse, weights=np.asarray(flags, dtype=float), minlength=len(cells)) \
+            if flags is not None else np.zeros(len(cells))
+
+        binned = pd.DataFrame({
+            'x': x_range[0] + cx[first_index] / 2 * cell_w,
+            'y': y_range[0] + cy[first_index] / 2 * cell_h,
+            'count': counts.astype(np.int64),
+            'flagged': flagged.astype(np.int64)
+        })
+        binned.attrs['hex_width'] = hex_width
+        return binned
+
+    def ma_plot(self, de_results, p_cutoff=0.05, fc_cutoff=1.0, highlight_genes=None,
+                title="MA Plot", mean_values=None, width=720, height=480,
+                fc_column=None, p_column=None, mean_column=None, label_column=None):
+        """
+        MA plot from DE results
+
+        Args:
+            de_results: DE results DataFrame
+            p_cutoff, fc_cutoff: Significance thresholds
+            highlight_genes: Gene labels to mark and annotate
+            title: Plot title
+            mean_values: Per-gene mean expression (Series indexed like
+                de_results) when the results carry no mean column
+            width, height: Plot area size in pixels
+            fc_column, p_column, mean_column, label_column: Column names
+                (detected when None)
+
+        Returns:
+            Tuple (figure, statistics)
+        """
+        fc_column = fc_column or _first_column(de_results, FC_COLUMNS)
+        p_column = p_column or _first_column(de_results, P_COLUMNS)
+        label_column = label_column or _first_column(de_results, LABEL_COLUMNS, required=False)
+
+        if mean_values is not None:
+            a = np.log2(pd.to_numeric(mean_values.reindex(de_results.index), errors='coerce').values + 1)
+        else:
+            mean_column = mean_column or _first_column(de_results, MEAN_COLUMNS)
+            a = pd.to_numeric(de_results[mean_column], errors='coerce').values.astype(float)
+            if mean_column not in LOG_MEAN_COLUMNS:
+                a = np.log2(a + 1)
+
+        m = pd.to_numeric(de_results[fc_column], errors='coerce').values.astype(float)
+        p = pd.to_numeric(de_results[p_column], errors='coerce').values.astype(float)
+        labels = (de_results[label_column] if label_column else de_results.index.to_series()).astype(str).values
+
+        valid = np.isfinite(a) & np.isfinite(m)
+        a, m, p, labels = a[valid], m[valid], p[valid], labels[valid]
+        if len(a) == 0:
+            raise ValueError("No genes with finite mean expression and fold change")
+        significant = np.nan_to_num(p, nan=1.0) < p_cutoff
+        up = significant & (m > fc_cutoff)
+        down = significant & (m < -fc_cutoff)
+
+        x_range = _padded_range(a)
+        m_limit = max(np.abs(m).max() if len(m) else 1.0, fc_cutoff) * 1.05
+        y_range = [-m_limit, m_limit]
+
+        fig = go.Figure()
+        binned = self.hexbin(a, m, x_range, y_range, width, height, flags=up | down)
+        fig.add_trace(self._hex_trace(binned, "genes", "significant"))
+
+        trend_x, trend_y = binned_trend(a, m, self.trend_bins)
+        fig.add_trace(go.Scatter(x=trend_x, y=trend_y, mode='lines', name='Running median',
+                                 line=dict(color='#E67E22', width=2.5)))
+
+        # Most significant up/down genes drawn individually (capped, so the payload stays bounded)
+        order = np.argsort(np.nan_to_num(p, nan=1.0), kind='stable')
+        for category, mask in [('Upregulated', up), ('Downregulated', down)]:
+            marked = order[mask[order]][:self.max_marked]
+            if len(marked) == 0:
+                continue
+            fig.add_trace(go.Scattergl(
+                x=a[marked], y=m[marked], mode='markers',
+                name=f"{category} (top {len(marked):,} of {int(mask.sum()):,})",
+                marker=dict(size=4, color=COLORS[category], opacity=0.8),
+                text=labels[marked],
+                hovertemplate="<b>%{text}</b><br>A: %{x:.2f}<br>M: %{y:.3f}<extra></extra>"
+            ))
+
+        labels_placed = 0
+        highlighted = np.flatnonzero(np.isin(labels, list(highlight_genes or [])))
+        if len(highlighted) > 0:
+            highlighted = highlighted[np.argsort(np.nan_to_num(p[highlighted], nan=1.0), kind='stable')]
+            fig.add_trace(go.Scatter(
+                x=a[highlighted], y=m[highlighted], mode='markers', name='Highlighted',
+                marker=dict(size=8, color=COLORS['Highlighted'], line=dict(width=1, color='black')),
+                text=labels[highlighted],
+                hovertemplate="<b>%{text}</b><br>A: %{x:.2f}<br>M: %{y:.3f}<extra></extra>"
+            ))
+            placement = self.label_placer.place_on_axes(
+                a[highlighted], m[highlighted], labels[highlighted], x_range, y_range, width, height,
+                obstacles=binned[['x', 'y']].values
+            )
+            fig.update_layout(annotations=plotly_annotations(placement, self.label_placer.font_size))
+            labels_placed = int(placement['placed'].sum())
+
+        fig.add_hline(y=0, line_color="black", line_width=1)
+        for cutoff in (fc_cutoff, -fc_cutoff):
+            fig.add_hline(y=cutoff, line_dash="dash", line_color="gray")
+
+        self._layout(fig, title, "Mean Expression (log2)", "Log2 Fold Change (M)", x_range, y_range,
+                     width, height)
+
+        statistics = {
+            'total_genes': int(len(a)),
+            'up_regulated': int(up.sum()),
+            'down_regulated': int(down.sum()),
+            'hexagons': int(len(binned)),
+            'highlighted': int(len(highlighted)),
+            'labels_placed': labels_placed
+        }
+        return fig, statistics
+
+    def mean_variance_plot(self, gene_statistics, counts=False, title="Mean-Variance Trend",
+                           width=720, height=480):
+        """
+        Mean-variance plot from per-gene statistics
+
+        Args:
+            gene_statistics: DataFrame with 'mean' and 'variance' columns
+                (e.g. StreamingAnalyzer.gene_statistics())
+            counts: Statistics are of raw counts: plot log10 variance against
+                log10 mean with the Poisson line and negative binomial trend;
+                otherwise standard deviation against mean of log-scale data
+            title: Plot title
+            width, height: Plot area size in pixels
+
+        Returns:
+            Tuple (figure, statistics); for counts the statistics include the
+            dispersion trend coefficients 'asymptotic_dispersion' (a0) and
+            'extra_poisson' (a1)
+        """
+        mean = pd.to_numeric(gene_statistics['mean'], errors='coerce').values.astype(float)
+        variance = pd.to_numeric(gene_statistics['variance'], errors='coerce').values.astype(float)
+        statistics = {}
+
+        if counts:
+            valid = np.isfinite(mean) & np.isfinite(variance) & (mean > 0) & (variance > 0)
+            mean, variance = mean[valid], variance[valid]
+            x, y = np.log10(mean), np.log10(variance)
+            x_label, y_label = "Mean Count (log10)", "Variance (log10)"
+        else:
+            valid = np.isfinite(mean) & np.isfinite(variance)
+            mean, variance = mean[valid], variance[valid]
+            x, y = mean, np.sqrt(np.maximum(variance, 0))
+            x_label, y_label = "Mean Expression (log2)", "Standard Deviation"
+        if len(x) == 0:
+            raise ValueError("No genes with finite mean and variance")
+
+        x_range, y_range = _padded_range(x), _padded_range(y)
+        if not counts:
+            y_range[0] = max(y_range[0], 0)
+
+        fig = go.Figure()
+        binned = self.hexbin(x, y, x_range, y_range, width, height)
+        fig.add_trace(self._hex_trace(binned, "genes"))
+
+        trend_x, trend_y = binned_trend(x, y, self.trend_bins)
+        fig.add_trace(go.Scatter(x=trend_x, y=trend_y, mode='lines', name='Running median',
+                                 line=dict(color='#E67E22', width=2.5)))
+
+        if counts:
+            grid = np.linspace(x_range[0], x_range[1], 100)
+            fig.add_trace(go.Scatter(x=grid, y=grid, mode='lines', name='Poisson (variance = mean)',
+                                     line=dict(color='gray', dash='dash')))
+            a0, a1 = fit_dispersion_trend(mean, variance)
+            grid_mean = 10 ** grid
+            fig.add_trace(go.Scatter(
+                x=grid, y=np.log10(grid_mean + (a0 + a1 / grid_mean) * grid_mean ** 2), mode='lines',
+                name=f"NB trend (dispersion = {a0:.3g} + {a1:.3g} / mean)",
+                line=dict(color='#C0392B', width=2.5)
+            ))
+            statistics.update(asymptotic_dispersion=float(a0), extra_poisson=float(a1))
+
+        self._layout(fig, title, x_label, y_label, x_range, y_range, width, height)
+        statistics.update(total_genes=int(len(x)), hexagons=int(len(binned)))
+        return fig, statistics
+
+    def _hex_trace(self, binned, noun, flagged_noun=None):
+        """Hexagon marker trace colored by log10 gene count"""
+        counts = binned['count'].values
+        hovertemplate = "%{customdata[0]:,} " + noun
+        customdata = counts[:, None]
+        if flagged_noun:
+            hovertemplate += "<br>%{customdata[1]:,} " + flagged_noun
+            customdata = np.c_[counts, binned['flagged'].values]
+        tick_values = [v for v in [1, 10, 100, 1000, 10000, 100000] if v <= max(counts.max(), 1)]
+        return go.Scattergl(
+            x=binned['x'].values, y=binned['y'].values, mode='markers', name=f"Density ({counts.sum():,} {noun})",
+            marker=dict(
+                symbol='hexagon',
+                # Vertex-to-vertex height of a pointy-top hexagon of the cell width
+                size=binned.attrs['hex_width'] * 2 / np.sqrt(3),
+                color=np.log10(counts), colorscale=HEX_COLORSCALE, cmin=0,
+                colorbar=dict(title="Genes", tickvals=np.log10(tick_values).tolist(),
+                              ticktext=[f"{v:,}" for v in tick_values]),
+                line=dict(width=0)
+            ),
+            customdata=customdata,
+            hovertemplate=hovertemplate + "<extra></extra>"
+        )
+
+    @staticmethod
+    def _layout(fig, title, x_label, y_label, x_range, y_range, width, height):
+        # Fixed size and ranges keep the hexagons regular and the label offsets exact
+        fig.update_layout(
+            title=title,
+            xaxis=dict(title=x_label, range=x_range, zeroline=False),
+            yaxis=dict(title=y_label, range=y_range, zeroline=False),
+            width=width + MARGINS['l'] + MARGINS['r'],
+            height=height + MARGINS['t'] + MARGINS['b'],
+            margin=MARGINS,
+            template='plotly_white',
+            hovermode='closest',
+            legend=dict(orientation='h', yanchor='bottom', y=1.02, x=0, itemsizing='constant')
+        )
+
+
+def binned_trend(x, y, n_bins=40, min_count=5):
+    """
+    Running-median trend over quantile bins of x
+
+    Returns:
+        Tuple (bin centers, bin medians) for bins with at least min_count points
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) < min_count:
+        return np.array([]), np.array([])
+
+    order = np.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+    edges = np.unique(np.linspace(0, len(x), min(n_bins, len(x) // min_count) + 1).astype(int))
+    centers, medians = [], []
+    for start, stop in zip(edges[:-1], edges[1:]):
+        if stop - start >= min_count:
+            centers.append(np.median(x[start:stop]))
+            medians.append(np.median(y[start:stop]))
+    return np.array(centers), np.array(medians)
+
+
+def fit_dispersion_trend(mean, variance, min_mean=0.5, max_iter=25, tol=1e-6):
+    """
+    Parametric negative binomial dispersion trend, dispersion = a0 + a1 / mean
+
+    Per-gene moment estimates (variance - mean) / mean^2 are fitted by a
+    gamma-family GLM with identity link (iteratively reweighted least
+    squares), refitting without genes whose estimate lies outside
+    [1e-4, 15] times the fitted trend, as DESeq2's parametric fit does.
+
+    Returns:
+        Tuple (a0, a1)
+    """
+    mean, variance = np.asarray(mean, dtype=float), np.asarray(variance, dtype=float)
+    usable = np.isfinite(mean) & np.isfinite(variance) & (mean >= min_mean)
+    mean, dispersion = mean[usable], (variance[usable] - mean[usable]) / mean[usable] ** 2
+    positive = dispersion > 0
+    mean, dispersion = mean[positive], dispersion[positive]
+    if len(mean) < 3:
+        return (float(np.median(dispersion)) if len(dispersion) else 0.0), 0.0
+
+    design = np.c_[np.ones(len(mean)), 1 / mean]
+    coefficients = np.array([0.1, 1.0])
+    keep = np.ones(len(mean), dtype=bool)
+    for _ in range(max_iter):
+        fitted = np.maximum(design[keep] @ coefficients, 1e-8)
+        weights = 1 / fitted ** 2
+        weighted = design[keep] * weights[:, None]
+        updated = np.linalg.lstsq(weighted.T @ design[keep], weighted.T @ dispersion[keep], rcond=None)[0]
+        if np.any(updated < 0):
+            # Trend must stay positive; fall back to a constant dispersion
+            return float(np.median(dispersion[keep])), 0.0
+
+        ratio = dispersion / np.maximum(design @ updated, 1e-8)
+        keep = (ratio > 1e-4) & (ratio < 15)
+        converged = np.all(np.abs(np.log(updated + 1e-12) - np.log(coefficients + 1e-12)) < tol)
+        coefficients = updated
+        if converged or keep.sum() < 3:
+            break
+    return float(coefficients[0]), float(coefficients[1])
+
+
+def _padded_range(values, pad=0.04):
+    """Axis range spanning finite values with a small margin"""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return [0.0, 1.0]
+    low, high = float(values.min()), float(values.max())
+    margin = (high - low) * pad if high > low else 0.5
+    return [low - margin, high + margin]
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Enrichment Orchestrator for Prairie Genomics Suite
+
+Schedules enrichment runs as independent tasks on a shared worker pool and
+hands results back per library as they complete, so the UI can show each
+library as soon as it is done instead of waiting for a serial ORA-then-GSEA
+loop. Local engines score all selected libraries in one call (one stacked
+sparse product for ORA, one shared ranking and permutation null for GSEA),
+so they run as a single task covering several libraries; remote Enrichr
+calls are one task per library. Every task result is cached under a content
+hash of its input (gene list or ranked list), the library versions and the
+parameters, so re-running with unchanged DE results is a cache lookup.
+
+Author: Prairie Genomics Team
+"""
+
+import json
+import hashlib
+import threading
+import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import warnings
+
+warnings.filterwarnings('ignore')
+
+# Methods run by each pathway analysis mode ("camera" is not an enrichment task)
+ANALYSIS_METHODS = {
+    "Over-representation (Enrichr)": ["ora"],
+    "GSEA Pre-ranked": ["gsea"],
+    "Both": ["ora", "gsea"],
+    "CAMERA (competitive, local libraries)": ["camera"]
+}
+
+
+class EnrichmentTask:
+    """
+    One enrichment run of a method against one library or a group of libraries
+    """
+
+    def __init__(self, method, library, func, payload, params=None, version=None):
+        """
+        Args:
+            method: Method label (e.g. "ora", "gsea")
+            library: Library name, or a list of names for a task that scores
+                several libraries in one call
+            func: Callable run as func(payload, library, **params); for a list
+                of libraries it returns a dict of library -> result
+            payload: Gene list or ranked Series
+            params: Keyword parameters passed to func (part of the cache key)
+            version: Library version(s) (local content hashes; remote
+                libraries are versioned by name)
+        """
+        self.method = method
+        self.library = list(library) if isinstance(library, (list, tuple)) else library
+        self.func = func
+        self.payload = payload
+        self.params = params or {}
+        self.version = version or library
+
+    @property
+    def libraries(self):
+        """Libraries covered by the task"""
+        return self.library if isinstance(self.library, list) else [self.library]
+
+    @property
+    def cache_key(self):
+        """Hash of (method, library, version, payload, parameters)"""
+        digest = hashlib.sha1()
+        digest.update(json.dumps(
+            [self.method, self.library, self.version, self.params], sort_keys=True, default=str
+        ).encode('utf-8'))
+        digest.update(_payload_digest(self.payload))
+        return digest.hexdigest()
+
+
+class EnrichmentOrchestrator:
+    """
+    Concurrent enrichment tasks with per-task result caching
+    """
+
+    def __init__(self, max_workers=4, max_cache_entries=256):
+        """
+        Initialize the orchestrator
+
+        Args:
+            max_workers: Threads in the shared worker pool
+            max_cache_entries: Cached task results kept (least recently used evicted)
+        """
+        self.max_workers = max_workers
+        self.max_cache_entries = max_cache_entries
+        self._executor = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """Shared worker pool (created on first use)"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="enrichment")
+        return self._executor
+
+    def run(self, tasks):
+        """
+        Run tasks concurrently and yield results per library as they complete
+
+        Cached results are yielded first without touching the pool.
+
+        Yields:
+            Tuple (task, library, result, from_cache, error); result is None
+            when the task raised (with the exception in error, yielded for
+            every library of the task) or found nothing for the library
+        """
+        # Everything not cached is submitted before anything is yielded
+        cached, pending = [], {}
+        for task in tasks:
+            key = task.cache_key
+            result = self._get(key)
+            if result is not None:
+                cached.append((task, result))
+            else:
+                pending[self.executor.submit(task.func, task.payload, task.library, **task.params)] = (task, key)
+
+        for task, result in cached:
+            yield from _per_library(task, result, True)
+
+        for future in as_completed(pending):
+            task, key = pending[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                for library in task.libraries:
+                    yield task, library, None, False, e
+                continue
+
+            if result is not None:
+                self._put(key, result)
+            yield from _per_library(task, result, False)
+
+    def clear_cache(self):
+        """Drop all cached task results"""
+        with self._lock:
+            self._cache.clear()
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _put(self, key, result):
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+
+
+def enrichment_tasks(analysis_type, libraries, store, local_runners, remote_runners,
+                     gene_list=None, ranking=None, ora_params=None, gsea_params=None):
+    """
+    Enrichment tasks of one pathway analysis mode
+
+    Local libraries are scored together in one task per method; every other
+    (remote Enrichr) library is one task per method.
+
+    Args:
+        analysis_type: Mode (a key of ANALYSIS_METHODS)
+        libraries: Selected library names
+        store: GeneSetStore deciding which libraries are local
+        local_runners: Dict of method -> func(payload, libraries, **params)
+            returning a dict of library -> result
+        remote_runners: Dict of method -> func(payload, library, **params)
+        gene_list: ORA query genes
+        ranking: GSEA ranked Series
+        ora_params: ORA parameters
+        gsea_params: GSEA parameters
+
+    Returns:
+        List of EnrichmentTask (empty for CAMERA)
+    """
+    payloads = {'ora': gene_list, 'gsea': ranking}
+    params = {'ora': ora_params or {}, 'gsea': gsea_params or {}}
+    local = [library for library in libraries if library in store]
+    remote = [library for library in libraries if library not in store]
+    versions = [store.get_library(library).version for library in local]
+
+    tasks = []
+    for method in ANALYSIS_METHODS[analysis_type]:
+        if method not in payloads:
+            continue
+        if local:
+            tasks.append(EnrichmentTask(method, local, local_runners[method],
+                                        payloads[method], params[method], versions))
+        for library in remote:
+            tasks.append(EnrichmentTask(method, library, remote_runners[method],
+                                        payloads[method], params[method]))
+    return tasks
+
+
+def _per_library(task, result, from_cache):
+    """Split a task result into (task, library, result, from_cache, error) tuples"""
+    if isinstance(task.library, list):
+        for library in task.library:
+            yield task, library, (result or {}).get(library), from_cache, None
+    else:
+        yield task, task.library, result, from_cache, None
+
+
+def _payload_digest(payload):
+    """Stable digest of a gene list or ranked Series"""
+    if isinstance(payload, pd.Series):
+        hashed = pd.util.hash_pandas_object(payload, index=True).values
+        return hashlib.sha1(hashed.tobytes()).digest()
+
+    # Gene lists are order-independent
+    genes = sorted({str(g) for g in payload})
+    return hashlib.sha1("\n".join(genes).encode('utf-8')).digest()
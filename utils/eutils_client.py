@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Asynchronous NCBI E-utilities Client for Prairie Genomics Suite
+
+Runs many PubMed searches concurrently while respecting the NCBI rate limit
+(3 requests/s, or 10/s with an API key). One ESearch is issued per query;
+the PMIDs of all queries are then de-duplicated and fetched with batched
+EFetch POST requests (up to 200 IDs each), so searching hundreds of genes
+costs roughly one request per gene plus a handful of fetches. Results are
+streamed back per query as soon as its articles are available.
+
+With a LiteratureStore attached, cached query results and previously
+fetched articles are served locally, and only unseen PMIDs go to EFetch.
+
+HTTP goes through aiohttp when it is installed; otherwise requests calls
+are run on worker threads from the event loop.
+
+Author: Prairie Genomics Team
+"""
+
+import asyncio
+import json
+import queue
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import date, datetime
+import warnings
+
+import requests
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+warnings.filterwarnings('ignore')
+
+EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1
+)}
+
+
+class RateLimiter:
+    """
+    Async limiter spacing request starts at least 1/rate seconds apart
+    """
+
+    def __init__(self, rate, margin=0.1):
+        # Pacing exactly at the limit gets 429s from connection-time jitter
+        self.interval = (1.0 + margin) / rate
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncEUtilsClient:
+    """
+    Concurrent, rate-limited PubMed ESearch/EFetch client
+    """
+
+    def __init__(self, api_key=None, email=None, tool="prairie_genomics",
+                 base_url=EUTILS_URL, max_concurrency=None, fetch_batch_size=200,
+                 max_retries=3, timeout=30, store=None):
+        """
+        Initialize the client
+
+        Args:
+            api_key: NCBI API key (raises the limit from 3 to 10 requests/s)
+            email: Contact email sent with each request
+            tool: Tool name sent with each request
+            base_url: E-utilities base URL (point at a stub server for tests)
+            max_concurrency: Requests in flight (defaults to the rate limit)
+            fetch_batch_size: PMIDs per EFetch request
+            max_retries: Retries for 429/5xx responses and connection errors
+            timeout: Per-request timeout in seconds
+            store: Optional LiteratureStore used as a persistent query/article cache
+        """
+        self.api_key = api_key or None
+        self.email = email
+        self.tool = tool
+        self.base_url = base_url.rstrip('/')
+        self.rate = 10 if self.api_key else 3
+        self.max_concurrency = max_concurrency or self.rate
+        self.fetch_batch_size = fetch_batch_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.store = store
+
+    def gene_query(self, gene, disease_context=None):
+        """PubMed query for a gene symbol, optionally within a disease context"""
+        query = f'"{gene}"[Title/Abstract]'
+        if disease_context:
+            query += f' AND "{disease_context}"[Title/Abstract]'
+        return query
+
+    def pathway_query(self, pathway, disease_context=None):
+        """PubMed query for a pathway or term name"""
+        query = f'"{pathway}"[Title/Abstract]'
+        if disease_context:
+            query += f' AND "{disease_context}"[Title/Abstract]'
+        return query
+
+    def search_stream(self, queries, max_results=50, years_back=None):
+        """
+        Run searches concurrently and yield results as each query completes
+
+        Args:
+            queries: Dict of name -> PubMed query string
+            max_results: Maximum articles per query
+            years_back: Restrict to publications from the last N years
+
+        Yields:
+            Tuple (name, result) with result as {'query', 'total_results',
+            'articles'} (plus 'error' when the search failed)
+        """
+        results = queue.Queue()
+        done = object()
+
+        def worker():
+            async def emit(name, result):
+                results.put((name, result))
+            try:
+                asyncio.run(self._search_all(queries, max_results, years_back, emit))
+            finally:
+                results.put(done)
+
+        thread = threading.Thread(target=worker, name="eutils", daemon=True)
+        thread.start()
+        while True:
+            item = results.get()
+            if item is done:
+                break
+            yield item
+        thread.join()
+
+    def search(self, queries, max_results=50, years_back=None):
+        """Run searches concurrently and return all results as a dict"""
+        return dict(self.search_stream(queries, max_results, years_back))
+
+    def search_gene_list(self, gene_list, disease_context=None, max_results=50,
+                         years_back=None, progress_callback=None):
+        """
+        Search PubMed for every gene in a list
+
+        Returns:
+            Dict with 'gene_results', 'total_articles', 'genes_with_results'
+            and 'top_genes_by_publications', as produced for multi-gene searches
+        """
+        queries = {gene: self.gene_query(gene, disease_context) for gene in dict.fromkeys(gene_list)}
+        gene_results = {}
+        for gene, result in self.search_stream(queries, max_results, years_back):
+            gene_results[gene] = result
+            if progress_callback:
+                progress_callback(f"Searched {len(gene_results)}/{len(queries)} genes",
+                                  int(100 * len(gene_results) / max(len(queries), 1)))
+        return summarize_gene_results(gene_results)
+
+    async def _search_all(self, queries, max_results, years_back, emit):
+        """ESearch every query, then fetch the union of PMIDs in batches"""
+        limiter = RateLimiter(self.rate)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._session() as session:
+            async def request(endpoint, params, method="GET"):
+                params = dict(params, tool=self.tool)
+                if self.email:
+                    params['email'] = self.email
+                if self.api_key:
+                    params['api_key'] = self.api_key
+
+                for attempt in range(self.max_retries + 1):
+                    async with semaphore:
+                        await limiter.wait()
+                        try:
+                            status, text = await self._request(session, method, f"{self.base_url}/{endpoint}", params)
+                        except Exception:
+                            if attempt == self.max_retries:
+                                raise
+                            status, text = None, None
+                    if status == 200:
+                        return text
+                    if status is not None and status != 429 and status < 500:
+                        raise RuntimeError(f"E-utilities {endpoint} returned HTTP {status}")
+                    if attempt == self.max_retries:
+                        raise RuntimeError(f"E-utilities {endpoint} failed after {self.max_retries} retries")
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+
+            search_params = {'db': 'pubmed', 'retmax': max_results, 'retmode': 'json', 'sort': 'relevance'}
+            if years_back:
+                this_year = datetime.now().year
+                search_params.update(datetype='pdat', mindate=this_year - int(years_back), maxdate=this_year)
+
+            async def esearch(name, query):
+                try:
+                    if self.store is not None:
+                        cached = self.store.get_query(query, search_params)
+                        if cached is not None:
+                            return 'search', (name, query, cached[0], cached[1], None)
+
+                    payload = json.loads(await request("esearch.fcgi", dict(search_params, term=query)))
+                    result = payload.get('esearchresult', {})
+                    count, pmids = int(result.get('count', 0)), result.get('idlist', [])
+                    if self.store is not None:
+                        self.store.put_query(query, count, pmids, search_params)
+                    return 'search', (name, query, count, pmids, None)
+                except Exception as e:
+                    return 'search', (name, query, 0, [], str(e))
+
+            async def efetch(batch):
+                try:
+                    text = await request("efetch.fcgi", {'db': 'pubmed', 'id': ",".join(batch),
+                                                         'retmode': 'xml'}, method="POST")
+                    parsed = parse_pubmed_xml(text)
+                    if self.store is not None:
+                        self.store.put_articles(parsed)
+                    return 'fetch', (batch, parsed, None)
+                except Exception as e:
+                    return 'fetch', (batch, [], str(e))
+
+            pending = {}
+            remaining = {}
+            waiting_on = {}
+            articles = {}
+            fetched = set()
+            errors = {}
+            unfetched = []
+
+            async def finish(name):
+                query, count, pmids = pending.pop(name)
+                result = {
+                    'query': query,
+                    'total_results': count,
+                    'articles': [articles[p] for p in pmids if p in articles]
+                }
+                if name in errors:
+                    result['error'] = errors[name]
+                await emit(name, result)
+
+            # EFetch batches start as soon as enough new PMIDs have accumulated,
+            # so articles stream back while later searches are still running
+            tasks = {asyncio.create_task(esearch(name, query)) for name, query in queries.items()}
+            n_searching = len(tasks)
+            while tasks:
+                finished, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    kind, payload = task.result()
+
+                    if kind == 'search':
+                        n_searching -= 1
+                        name, query, count, pmids, error = payload
+                        if error or not pmids:
+                            result = {'query': query, 'total_results': count, 'articles': []}
+                            if error:
+                                result['error'] = error
+                            await emit(name, result)
+                        else:
+                            pending[name] = (query, count, pmids)
+                            remaining[name] = set(pmids)
+                            new = [p for p in dict.fromkeys(pmids) if p not in waiting_on]
+                            stored = self.store.get_articles(new) if self.store is not None and new else {}
+                            articles.update(stored)
+                            fetched.update(stored)
+                            for pmid in new:
+                                waiting_on[pmid] = set()
+                                if pmid not in stored:
+                                    unfetched.append(pmid)
+                            for pmid in pmids:
+                                waiting_on[pmid].add(name)
+                            # PMIDs already fetched for earlier queries or held in the store
+                            remaining[name] -= fetched
+                            if not remaining[name]:
+                                await finish(name)
+                    else:
+                        batch, parsed, error = payload
+                        fetched.update(batch)
+                        for article in parsed:
+                            articles[article['pmid']] = article
+                        for pmid in batch:
+                            for name in waiting_on.get(pmid, ()):
+                                if name not in pending:
+                                    continue
+                                if error:
+                                    errors[name] = error
+                                remaining[name].discard(pmid)
+                                if not remaining[name]:
+                                    await finish(name)
+
+                while len(unfetched) >= self.fetch_batch_size or (unfetched and n_searching == 0):
+                    batch, unfetched = unfetched[:self.fetch_batch_size], unfetched[self.fetch_batch_size:]
+                    tasks.add(asyncio.create_task(efetch(batch)))
+
+            for name in list(pending):
+                await finish(name)
+
+    def _session(self):
+        """aiohttp session, or a no-op context when falling back to requests"""
+        if AIOHTTP_AVAILABLE:
+            return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return _NullSession()
+
+    async def _request(self, session, method, url, params):
+        """Issue one HTTP request and return (status, text)"""
+        if AIOHTTP_AVAILABLE:
+            kwargs = {'data': params} if method == "POST" else {'params': params}
+            async with session.request(method, url, **kwargs) as response:
+                return response.status, await response.text()
+
+        def blocking():
+            if method == "POST":
+                response = requests.post(url, data=params, timeout=self.timeout)
+            else:
+                response = requests.get(url, params=params, timeout=self.timeout)
+            return response.status_code, response.text
+
+        return await asyncio.to_thread(blocking)
+
+
+class _NullSession:
+    """Stand-in async context manager when aiohttp is not installed"""
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def parse_pubmed_xml(text):
+    """Parse an EFetch PubmedArticleSet into article dicts"""
+    articles = []
+    root = ET.fromstring(text)
+    for node in root.iter('PubmedArticle'):
+        citation = node.find('MedlineCitation')
+        article = citation.find('Article') if citation is not None else None
+        if article is None:
+            continue
+
+        abstract = " ".join(
+            "".join(part.itertext()).strip() for part in article.findall('Abstract/AbstractText')
+        )
+        authors = []
+        for author in article.findall('AuthorList/Author'):
+            last, initials = author.findtext('LastName'), author.findtext('Initials')
+            if last:
+                authors.append(f"{last} {initials}" if initials else last)
+            elif author.findtext('CollectiveName'):
+                authors.append(author.findtext('CollectiveName'))
+
+        articles.append({
+            'pmid': citation.findtext('PMID', ''),
+            'title': "".join(article.find('ArticleTitle').itertext()).strip()
+            if article.find('ArticleTitle') is not None else '',
+            'abstract': abstract,
+            'authors': authors,
+            'journal': article.findtext('Journal/Title', ''),
+            'publication_date': _publication_date(article.find('Journal/JournalIssue/PubDate'))
+        })
+    return articles
+
+
+def _publication_date(node):
+    """PubDate element -> date (month/day default to 1), or None"""
+    if node is None:
+        return None
+
+    year = node.findtext('Year') or (node.findtext('MedlineDate') or '')[:4]
+    if not year.isdigit():
+        return None
+
+    month_text = (node.findtext('Month') or '1').strip()
+    month = int(month_text) if month_text.isdigit() else MONTHS.get(month_text[:3].lower(), 1)
+    day_text = node.findtext('Day') or '1'
+    try:
+        return date(int(year), month, int(day_text) if day_text.isdigit() else 1)
+    except ValueError:
+        return date(int(year), 1, 1)
+
+
+def publication_counts(gene_results):
+    """Total PubMed hits per gene query (failed searches left out)"""
+    return {gene: int(result.get('total_results', 0))
+            for gene, result in gene_results.items() if 'error' not in result}
+
+
+def summarize_gene_results(gene_results):
+    """Aggregate per-gene search results into the multi-gene result layout"""
+    counts = Counter({gene: result.get('total_results', 0) for gene, result in gene_results.items()})
+    return {
+        'gene_results': gene_results,
+        'total_articles': int(sum(counts.values())),
+        'genes_with_results': int(sum(1 for c in counts.values() if c > 0)),
+        'top_genes_by_publications': counts.most_common()
+    }
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Local E-utilities Stand-in Server for Prairie Genomics Suite
+
+Minimal offline replacement for the NCBI ESearch and EFetch endpoints used
+by AsyncEUtilsClient, for tests and demos without network access. Results
+are deterministic functions of the query text, and the server enforces a
+requests-per-second limit (answering HTTP 429 like NCBI) so client rate
+limiting can be checked. The first N requests can be made to fail with
+HTTP 503 to exercise retries, and every request is logged (endpoint,
+status, IDs, time) for assertions.
+
+Usage:
+    server, base_url = start_stub_server()
+    client = AsyncEUtilsClient(base_url=base_url)
+    ...
+    server.shutdown()
+
+or run standalone: python eutils_stub_server.py --port 8765
+
+Author: Prairie Genomics Team
+"""
+
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+JOURNALS = ["Nature", "Cell", "Cancer Research", "Bioinformatics", "Genome Biology"]
+TOPICS = ["tumor growth", "immune infiltration", "metabolic reprogramming",
+          "DNA repair", "cell cycle control", "metastasis", "drug resistance"]
+
+
+def _seed(text):
+    return int(hashlib.md5(text.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def stub_pmids(query, retmax):
+    """Deterministic (count, PMID list) for a query"""
+    seed = _seed(query)
+    count = seed % 120
+    pmids = [str(10_000_000 + (seed * 7919 + i * 104729) % 30_000_000) for i in range(min(count, retmax))]
+    return count, pmids
+
+
+def stub_article_xml(pmid):
+    """Deterministic PubmedArticle XML for a PMID"""
+    seed = _seed(pmid)
+    year = 2005 + seed % 20
+    topic = TOPICS[seed % len(TOPICS)]
+    return (
+        "<PubmedArticle><MedlineCitation>"
+        f"<PMID>{pmid}</PMID><Article>"
+        f"<Journal><JournalIssue><PubDate><Year>{year}</Year><Month>Mar</Month></PubDate></JournalIssue>"
+        f"<Title>{escape(JOURNALS[seed % len(JOURNALS)])}</Title></Journal>"
+        f"<ArticleTitle>Study {pmid} of {escape(topic)}</ArticleTitle>"
+        f"<Abstract><AbstractText>Synthetic abstract about {escape(topic)} for article {pmid}."
+        "</AbstractText></Abstract>"
+        "<AuthorList><Author><LastName>Doe</LastName><Initials>J</Initials></Author>"
+        "<Author><LastName>Roe</LastName><Initials>R</Initials></Author></AuthorList>"
+        "</Article></MedlineCitation></PubmedArticle>"
+    )
+
+
+class EUtilsStubHandler(BaseHTTPRequestHandler):
+    """ESearch/EFetch handler with a sliding-window rate limit"""
+
+    rate_limit = 3
+    fail_first = 0
+    request_log = deque()
+    log_lock = threading.Lock()
+    history = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = parse_qs(self.rfile.read(length).decode('utf-8'))
+        params.update(parse_qs(urlparse(self.path).query))
+        self._handle(params)
+
+    def _handle(self, params):
+        params = {k: v[0] for k, v in params.items()}
+        endpoint = urlparse(self.path).path.rstrip('/').split('/')[-1]
+        ids = [i for i in params.get('id', '').split(',') if i]
+
+        with self.log_lock:
+            failing = len(self.history) < self.fail_first
+        if failing:
+            self._record(endpoint, 503, ids)
+            return self._respond(503, "text/plain", "service unavailable")
+
+        limit = 10 if params.get('api_key') else self.rate_limit
+        if not self._allow(limit):
+            self._record(endpoint, 429, ids)
+            return self._respond(429, "application/json", json.dumps({"error": "API rate limit exceeded"}))
+
+        self._record(endpoint, 200, ids)
+        if endpoint == "esearch.fcgi":
+            count, pmids = stub_pmids(params.get('term', ''), int(params.get('retmax', 20)))
+            body = {"esearchresult": {"count": str(count), "retmax": str(len(pmids)), "idlist": pmids}}
+            return self._respond(200, "application/json", json.dumps(body))
+
+        if endpoint == "efetch.fcgi":
+            body = "<?xml version=\"1.0\"?><PubmedArticleSet>" + \
+                "".join(stub_article_xml(i) for i in ids) + "</PubmedArticleSet>"
+            return self._respond(200, "text/xml", body)
+
+        self._respond(404, "text/plain", "unknown endpoint")
+
+    @classmethod
+    def _record(cls, endpoint, status, ids):
+        with cls.log_lock:
+            cls.history.append({'endpoint': endpoint, 'status': status, 'ids': ids, 'time': time.monotonic()})
+
+    @classmethod
+    def _allow(cls, limit):
+        now = time.monotonic()
+        with cls.log_lock:
+            while cls.request_log and now - cls.request_log[0] >= 1.0:
+                cls.request_log.popleft()
+            if len(cls.request_log) >= limit:
+                return False
+            cls.request_log.append(now)
+            return True
+
+    def _respond(self, status, content_type, body):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_server(host="127.0.0.1", port=0, rate_limit=3, fail_first=0):
+    """
+    Start the stand-in server on a background thread
+
+    Args:
+        rate_limit: Requests per second allowed without an API key (10 with one)
+        fail_first: Number of initial requests answered with HTTP 503
+
+    Returns:
+        Tuple (server, base_url); call server.shutdown() to stop it. The
+        request log is server.RequestHandlerClass.history
+    """
+    handler = type("Handler", (EUtilsStubHandler,), {
+        'rate_limit': rate_limit, 'fail_first': fail_first, 'request_log': deque(),
+        'log_lock': threading.Lock(), 'history': []
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local E-utilities stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate-limit", type=int, default=3)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.host, args.port, args.rate_limit)
+    print(f"E-utilities stub serving at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Out-of-core Expression Store for Prairie Genomics Suite
+
+Keeps expression matrices that do not fit in memory (e.g. 100k-sample
+compendia) on disk as a raw float32 genes x samples array, imported from
+CSV/TSV in row chunks so the full table is never loaded. Analyses stream
+fixed-size blocks with explicit reads (no memory mapping of the whole
+file, so touched pages do not accumulate in the resident set), and block
+sizes are derived from a memory budget so peak usage stays within it.
+
+Store layout:
+    <root>/matrix.f32    float32 values, genes x samples, row-major
+    <root>/genes.txt     gene IDs, one per line
+    <root>/samples.txt   sample IDs, one per line
+    <root>/meta.json     shape and version
+
+Streaming analyses (StreamingAnalyzer):
+- Per-gene statistics (mean, variance, min, max, missing) in row blocks
+- Top-variable gene selection from those statistics
+- PCA over sample blocks: the gene x gene scatter matrix is accumulated
+  block by block and eigendecomposed (exact); when it would not fit the
+  budget, scikit-learn's IncrementalPCA is fed the same blocks instead
+
+Analyses run on log2(x + 1) values; log_layer() gives the same layer for
+in-memory data (e.g. a subset loaded with to_dataframe(), which holds the
+raw values).
+
+Author: Prairie Genomics Team
+"""
+
+import json
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import warnings
+
+try:
+    from sklearn.decomposition import IncrementalPCA
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+warnings.filterwarnings('ignore')
+
+ITEM_SIZE = np.dtype(np.float32).itemsize
+
+
+class ExpressionStore:
+    """
+    On-disk float32 genes x samples matrix with block reads
+    """
+
+    def __init__(self, root_dir):
+        """
+        Open an existing store
+
+        Args:
+            root_dir: Store directory (see module docstring for the layout)
+        """
+        self.root_dir = Path(root_dir)
+        meta = json.loads((self.root_dir / "meta.json").read_text())
+        self.shape = tuple(meta['shape'])
+        self.version = meta['version']
+        self.genes = pd.Index((self.root_dir / "genes.txt").read_text().splitlines())
+        self.samples = pd.Index((self.root_dir / "samples.txt").read_text().splitlines())
+        self.matrix_path = self.root_dir / "matrix.f32"
+
+    @classmethod
+    def import_table(cls, source, root_dir, sep=',', memory_budget_gb=4.0, chunksize=None,
+                     progress_callback=None):
+        """
+        Stream a genes x samples CSV/TSV into a new store
+
+        Args:
+            source: File path or file-like object (first column = gene IDs)
+            root_dir: Store directory (replaced if it exists)
+            sep: Field separator
+            memory_budget_gb: Peak working memory for parsed chunks
+            chunksize: Genes parsed per chunk (derived from the budget and
+                the number of samples when None)
+            progress_callback: Optional function(message, pct) (pct is -1,
+                the total number of genes being unknown while streaming)
+
+        Returns:
+            ExpressionStore
+        """
+        root_dir = Path(root_dir)
+        root_dir.mkdir(parents=True, exist_ok=True)
+        matrix_path = root_dir / "matrix.f32"
+        digest = hashlib.sha1()
+
+        if chunksize is None:
+            # The parser's float64 frame, its buffers and the float32 copy of each chunk
+            n_columns = len(pd.read_csv(source, sep=sep, index_col=0, nrows=0).columns)
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            chunksize = max(1, int(memory_budget_gb * 1024 ** 3 // (max(n_columns, 1) * 8 * 4)))
+
+        n_genes, samples = 0, None
+        with open(matrix_path, 'wb') as out, open(root_dir / "genes.txt", 'w') as gene_file:
+            for chunk in pd.read_csv(source, sep=sep, index_col=0, chunksize=chunksize):
+                if samples is None:
+                    samples = chunk.columns.astype(str)
+                values = chunk.values
+                if values.dtype == object:
+                    # Non-numeric entries become NaN, converted in one call for the whole chunk
+                    values = pd.to_numeric(values.ravel(), errors='coerce').reshape(values.shape)
+                values = np.ascontiguousarray(values, dtype=np.float32)
+                out.write(values.tobytes())
+                digest.update(values.tobytes())
+                gene_file.write("".join(f"{g}\n" for g in chunk.index.astype(str)))
+                n_genes += len(chunk)
+                if progress_callback:
+                    progress_callback(f"Imported {n_genes:,} genes", -1)
+
+        return cls._finalize(root_dir, n_genes, samples, digest)
+
+    @classmethod
+    def from_dataframe(cls, data, root_dir, chunksize=1000):
+        """Write an in-memory genes x samples DataFrame as a store"""
+        root_dir = Path(root_dir)
+        root_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha1()
+        with open(root_dir / "matrix.f32", 'wb') as out:
+            for start in range(0, len(data), chunksize):
+                values = np.ascontiguousarray(data.iloc[start:start + chunksize].values, dtype=np.float32)
+                out.write(values.tobytes())
+                digest.update(values.tobytes())
+        (root_dir / "genes.txt").write_text("".join(f"{g}\n" for g in data.index.astype(str)))
+        return cls._finalize(root_dir, len(data), data.columns.astype(str), digest)
+
+    @classmethod
+    def _finalize(cls, root_dir, n_genes, samples, digest):
+        samples = list(samples) if samples is not None else []
+        (root_dir / "samples.txt").write_text("".join(f"{s}\n" for s in samples))
+        digest.update(f"{n_genes}x{len(samples)}".encode('utf-8'))
+        meta = {'shape': [n_genes, len(samples)], 'version': digest.hexdigest()[:16],
+                'created': time.strftime("%Y-%m-%dT%H:%M:%S")}
+        (root_dir / "meta.json").write_text(json.dumps(meta))
+        return cls(root_dir)
+
+    @property
+    def nbytes(self):
+        """Size of the matrix on disk"""
+        return self.shape[0] * self.shape[1] * ITEM_SIZE
+
+    def read_rows(self, start, stop):
+        """Contiguous block of full gene rows as float32 (one read)"""
+        start, stop = max(0, start), min(self.shape[0], stop)
+        with open(self.matrix_path, 'rb') as f:
+            f.seek(start * self.shape[1] * ITEM_SIZE)
+            block = np.fromfile(f, dtype=np.float32, count=(stop - start) * self.shape[1])
+        return block.reshape(stop - start, self.shape[1])
+
+    def read_block(self, rows, col_start, col_stop):
+        """
+        Selected gene rows restricted to a sample range
+
+        Args:
+            rows: Integer gene positions (read in the given order)
+            col_start, col_stop: Sample range
+
+        Returns:
+            float32 array of shape (len(rows), col_stop - col_start)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n_cols = min(self.shape[1], col_stop) - col_start
+        block = np.empty((len(rows), n_cols), dtype=np.float32)
+        row_bytes = self.shape[1] * ITEM_SIZE
+
+        # Reads in file order to keep seeks forward-only
+        order = np.argsort(rows, kind='stable')
+        with open(self.matrix_path, 'rb') as f:
+            for position in order:
+                f.seek(rows[position] * row_bytes + col_start * ITEM_SIZE)
+                f.readinto(memoryview(block[position]).cast('B'))
+        return block
+
+    def to_dataframe(self, genes=None):
+        """Load selected genes (all genes when None) into memory"""
+        rows = np.arange(self.shape[0]) if genes is None else self.genes.get_indexer(genes)
+        rows = rows[rows >= 0]
+        return pd.DataFrame(self.read_block(rows, 0, self.shape[1]),
+                            index=self.genes[rows], columns=self.samples)
+
+
+class StreamingAnalyzer:
+    """
+    Budgeted block-streaming gene statistics and PCA over an ExpressionStore
+    """
+
+    def __init__(self, store, memory_budget_gb=4.0, log_transform=True):
+        """
+        Initialize the analyzer
+
+        Args:
+            store: ExpressionStore
+            memory_budget_gb: Peak working memory for block buffers and
+                accumulators (the block size is derived from it)
+            log_transform: Analyze log2(x + 1) values
+        """
+        self.store = store
+        self.memory_budget = memory_budget_gb * 1024 ** 3
+        self.log_transform = log_transform
+        self._statistics = None
+
+    @property
+    def statistics(self):
+        """Gene statistics computed for the current store version (None if not yet computed)"""
+        if self._statistics is not None and self._statistics[0] == self.store.version:
+            return self._statistics[1]
+        return None
+
+    def block_size(self, row_length, copies=4, reserved=0):
+        """
+        Rows per block so that `copies` float64 working copies of a block
+        fit in the budget left after `reserved` bytes
+        """
+        available = max(self.memory_budget - reserved, self.memory_budget * 0.1)
+        return max(1, int(available // (row_length * 8 * copies)))
+
+    def gene_statistics(self, progress_callback=None):
+        """
+        Per-gene statistics streamed over row blocks
+
+        Returns:
+            DataFrame indexed by gene with mean, variance (ddof=1), std,
+            min, max and n_missing columns
+        """
+        if self.statistics is not None:
+            return self.statistics
+
+        n_genes, n_samples = self.store.shape
+        step = self.block_size(n_samples)
+        columns = {name: np.empty(n_genes) for name in ['mean', 'variance', 'min', 'max', 'n_missing']}
+
+        for start in range(0, n_genes, step):
+            stop = min(start + step, n_genes)
+            block = self._transform(self.store.read_rows(start, stop).astype(np.float64))
+            finite = np.isfinite(block)
+            counts = finite.sum(axis=1)
+            block[~finite] = np.nan
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns['mean'][start:stop] = np.nanmean(block, axis=1)
+                columns['variance'][start:stop] = np.nanvar(block, axis=1, ddof=1)
+                columns['min'][start:stop] = np.nanmin(block, axis=1)
+                columns['max'][start:stop] = np.nanmax(block, axis=1)
+            columns['n_missing'][start:stop] = n_samples - counts
+
+            if progress_callback:
+                progress_callback(f"Gene statistics: {stop:,}/{n_genes:,} genes", int(100 * stop / n_genes))
+
+        statistics = pd.DataFrame(columns, index=self.store.genes)
+        statistics['std'] = np.sqrt(statistics['variance'])
+        statistics['n_missing'] = statistics['n_missing'].astype(int)
+        self._statistics = (self.store.version, statistics)
+        return statistics
+
+    def top_variable_genes(self, n_genes=2000, progress_callback=None):
+        """Gene IDs of the n most variable genes"""
+        variance = self.gene_statistics(progress_callback)['variance'].dropna()
+        return variance.nlargest(min(n_genes, len(variance))).index
+
+    def pca(self, n_components=5, n_features=2000, scale=True, features=None, progress_callback=None):
+        """
+        Streaming sample PCA on the top-variable genes
+
+        Returns:
+            Model dict with 'components' (PCs x genes), 'mean', 'scale',
+            'explained_variance', 'explained_variance_ratio', 'features',
+            'samples', 'scores' (samples x PCs) and 'method'
+        """
+        statistics = self.gene_statistics(progress_callback)
+        if features is None:
+            features = self.top_variable_genes(n_features)
+        rows = self.store.genes.get_indexer(features)
+        features = self.store.genes[rows[rows >= 0]]
+        rows = rows[rows >= 0]
+
+        n_genes, n_samples = len(rows), self.store.shape[1]
+        n_components = min(n_components, n_genes, n_samples)
+        mean = statistics.loc[features, 'mean'].values
+        std = statistics.loc[features, 'std'].values if scale else np.ones(n_genes)
+        std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+
+        scatter_bytes = n_genes * n_genes * 8 * 2
+        exact = scatter_bytes <= self.memory_budget / 2 or not SKLEARN_AVAILABLE
+        step = self.block_size(n_genes, copies=3, reserved=scatter_bytes if exact else 0)
+        step = max(step, n_components + 1)
+
+        def blocks(label, pct_offset):
+            for start in range(0, n_samples, step):
+                stop = min(start + step, n_samples)
+                block = self._transform(self.store.read_block(rows, start, stop).astype(np.float64))
+                block = (np.where(np.isfinite(block), block, mean[:, None]) - mean[:, None]) / std[:, None]
+                if progress_callback:
+                    progress_callback(f"PCA {label}: {stop:,}/{n_samples:,} samples",
+                                      pct_offset + int(50 * stop / n_samples))
+                yield start, stop, block
+
+        if exact:
+            # Scatter matrix of standardized genes, accumulated over sample blocks
+            scatter = np.zeros((n_genes, n_genes))
+            for _, _, block in blocks("pass 1/2", 0):
+                scatter += block @ block.T
+            eigenvalues, eigenvectors = np.linalg.eigh(scatter)
+            order = np.argsort(eigenvalues)[::-1][:n_components]
+            components = eigenvectors[:, order].T
+            explained_variance = np.maximum(eigenvalues[order], 0) / max(n_samples - 1, 1)
+            total_variance = np.trace(scatter) / max(n_samples - 1, 1)
+            del scatter
+        else:
+            incremental = IncrementalPCA(n_components=n_components)
+            total_variance = 0.0
+            for _, _, block in blocks("pass 1/2", 0):
+                incremental.partial_fit(block.T)
+                total_variance += (block ** 2).sum()
+            total_variance /= max(n_samples - 1, 1)
+            components = incremental.components_
+            explained_variance = incremental.explained_variance_
+
+        # Deterministic signs: largest loading of each component positive
+        signs = np.sign(components[np.arange(n_components), np.abs(components).argmax(axis=1)])
+        signs[signs == 0] = 1
+        components = components * signs[:, None]
+
+        scores = np.empty((n_samples, n_components))
+        for start, stop, block in blocks("pass 2/2", 50):
+            scores[start:stop] = block.T @ components.T
+
+        pc_names = [f'PC{i + 1}' for i in range(n_components)]
+        return {
+            'components': pd.DataFrame(components, index=pc_names, columns=features),
+            'mean': mean,
+            'scale': std,
+            'explained_variance': explained_variance,
+            'explained_variance_ratio': explained_variance / total_variance if total_variance > 0
+            else np.zeros(n_components),
+            'features': features,
+            'samples': self.store.samples,
+            'scores': pd.DataFrame(scores, index=self.store.samples, columns=pc_names),
+            'method': 'exact scatter' if exact else 'incremental'
+        }
+
+    def _transform(self, block):
+        """Analysis layer of a raw block (in place where possible)"""
+        if self.log_transform:
+            np.log2(np.maximum(block, 0) + 1, out=block, where=np.isfinite(block))
+        return block
+
+
+def log_layer(expression_data):
+    """
+    log2(x + 1) layer of an in-memory genes x samples DataFrame, the same
+    values StreamingAnalyzer analyzes, so in-memory and streamed PCA agree
+    """
+    numeric = expression_data.select_dtypes(include=[np.number])
+    return np.log2(numeric.clip(lower=0) + 1)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Background Figure Export Service for Prairie Genomics Suite
+
+Publication exports (VisualizationExporter.create_* rendering PNG/PDF/EPS
+with matplotlib) run in a separate process pool instead of on the Streamlit
+script thread, so the page stays responsive while files are written and
+several figures can render at once. Every export is keyed by a hash of
+(data version, plot type, parameters, journal style): submitting an
+identical request returns the finished file paths immediately (or joins the
+render already in flight) instead of drawing the same figure again.
+
+Usage:
+    key = service.submit('volcano_plot', de_results, {'title': title}, journal_style)
+    status = service.status(key)   # 'running', 'done' or 'failed'
+
+Author: Prairie Genomics Team
+"""
+
+import json
+import time
+import pickle
+import hashlib
+import threading
+import multiprocessing
+import pandas as pd
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import warnings
+
+warnings.filterwarnings('ignore')
+
+# Result entries handed back from the workers (figures themselves stay there)
+RESULT_KEYS = ('figure_paths', 'statistics')
+
+
+class FigureExportService:
+    """
+    Process-pool publication rendering with a parameter-hash result cache
+    """
+
+    def __init__(self, max_workers=2, max_cache_entries=128):
+        """
+        Initialize the service
+
+        Args:
+            max_workers: Rendering processes (started on first use)
+            max_cache_entries: Finished exports kept (least recently used evicted)
+        """
+        self.max_workers = max_workers
+        self.max_cache_entries = max_cache_entries
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """Shared rendering pool (spawned processes, safe alongside Streamlit's threads)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def submit(self, plot_type, data, params=None, journal_style="default", data_version=None,
+               raster_options=None):
+        """
+        Queue an export (or reuse an identical finished or running one)
+
+        Args:
+            plot_type: Exporter method suffix (e.g. 'volcano_plot' for create_volcano_plot)
+            data: First argument of the exporter method
+            params: Keyword arguments of the exporter method
+            journal_style: Journal style name
+            data_version: Identifier of the data (hashed from data when None)
+            raster_options: DenseLayerRasterizer keyword arguments (dpi,
+                point_threshold, cell_threshold, enabled) for vector formats
+
+        Returns:
+            Export key for status()
+        """
+        params = params or {}
+        raster_options = raster_options or {'enabled': False}
+        key = self.export_key(plot_type, data, dict(params, _raster=raster_options), journal_style, data_version)
+
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and (not job['future'].done() or self._usable(job)):
+                job['hits'] += 1
+                self._jobs.move_to_end(key)
+                return key
+
+            future = self.executor.submit(_render, plot_type, data, params, journal_style, raster_options)
+            self._jobs[key] = {'future': future, 'plot_type': plot_type, 'submitted': time.time(),
+                               'finished': None, 'hits': 0}
+            self._evict()
+
+        future.add_done_callback(lambda _: self._mark_finished(key))
+        return key
+
+    def status(self, key):
+        """
+        State of an export
+
+        Returns:
+            Dict with 'state' ('running', 'done', 'failed' or 'unknown'),
+            'result' (exporter result with 'figure_paths' / 'statistics'),
+            'error', 'cached' (served without rendering again) and 'seconds'
+            (render time)
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is None:
+            return {'state': 'unknown', 'result': None, 'error': None, 'cached': False, 'seconds': None}
+
+        future = job['future']
+        status = {'state': 'running', 'result': None, 'error': None, 'cached': job['hits'] > 0,
+                  'seconds': None}
+        if future.done():
+            status['seconds'] = (job['finished'] or time.time()) - job['submitted']
+            error = future.exception()
+            if error is not None:
+                status.update(state='failed', error=error)
+            else:
+                status.update(state='done', result=future.result())
+        return status
+
+    def wait(self, key, timeout=None):
+        """Block until an export finishes; returns status()"""
+        with self._lock:
+            job = self._jobs.get(key)
+        if job is not None:
+            try:
+                job['future'].result(timeout=timeout)
+            except Exception:
+                pass
+        return self.status(key)
+
+    @property
+    def pending(self):
+        """Number of exports still rendering"""
+        with self._lock:
+            return sum(not job['future'].done() for job in self._jobs.values())
+
+    def clear_cache(self):
+        """Forget finished exports (running ones are kept)"""
+        with self._lock:
+            for key in [k for k, job in self._jobs.items() if job['future'].done()]:
+                del self._jobs[key]
+
+    def shutdown(self):
+        """Stop the rendering processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    def export_key(plot_type, data, params, journal_style, data_version=None):
+        """Hash of (data version, plot type, parameters, journal style)"""
+        digest = hashlib.sha1()
+        digest.update(json.dumps([plot_type, journal_style, params], sort_keys=True, default=str).encode('utf-8'))
+        digest.update(str(data_version).encode('utf-8') if data_version is not None else _data_digest(data))
+        return digest.hexdigest()
+
+    def _mark_finished(self, key):
+        with self._lock:
+            if key in self._jobs:
+                self._jobs[key]['finished'] = time.time()
+
+    def _usable(self, job):
+        """A finished job can be reused if it succeeded and its files still exist"""
+        if job['future'].exception() is not None:
+            return False
+        paths = (job['future'].result() or {}).get('figure_paths', {})
+        return all(Path(path).exists() for path in paths.values())
+
+    def _evict(self):
+        finished = [k for k, job in self._jobs.items() if job['future'].done()]
+        while len(self._jobs) > self.max_cache_entries and finished:
+            del self._jobs[finished.pop(0)]
+
+
+def _render(plot_type, data, params, journal_style, raster_options):
+    """
+    Worker: run one exporter method with a non-interactive matplotlib backend,
+    rasterizing dense data layers of vector-format saves
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from visualization_export import VisualizationExporter
+    from raster_layers import DenseLayerRasterizer
+
+    global _worker_exporter
+    if _worker_exporter is None:
+        _worker_exporter = VisualizationExporter()
+
+    with DenseLayerRasterizer(**raster_options):
+        result = getattr(_worker_exporter, f"create_{plot_type}")(data, journal_style=journal_style, **params)
+    plt.close('all')
+    return {key: value for key, value in (result or {}).items() if key in RESULT_KEYS}
+
+
+_worker_exporter = None
+
+
+def _data_digest(data):
+    """Content digest of DataFrames, Series and (picklable) result dicts"""
+    digest = hashlib.sha1()
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+        digest.update("\n".join(map(str, columns)).encode('utf-8'))
+        try:
+            digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        except TypeError:
+            # Unhashable cells (e.g. gene lists)
+            digest.update(pickle.dumps(data, protocol=4))
+    elif isinstance(data, dict):
+        for name in sorted(data, key=str):
+            digest.update(str(name).encode('utf-8'))
+            digest.update(_data_digest(data[name]))
+    else:
+        try:
+            digest.update(pickle.dumps(data, protocol=4))
+        except Exception:
+            digest.update(repr(data).encode('utf-8'))
+    return digest.digest()
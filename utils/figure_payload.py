@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Compact Plotly Figure Payloads for Prairie Genomics Suite
+
+Plotly figures sent to the browser serialize every numeric array as JSON
+text, so a 500 x 1,000 heatmap becomes several megabytes of float64
+literals. This module converts figures to plain figure dicts in which
+numeric arrays are plotly.js typed-array specs ({dtype, bdata, shape}):
+float data is cast to float32 (float64 is kept where float32 would lose
+integer precision, e.g. genomic coordinates) and base64-encoded. Encoded
+buffers are cached by a content digest, so unchanged data on a Streamlit
+rerun reuses the encoded buffer instead of being re-cast and re-encoded.
+
+Callers that know what a figure was drawn from can pass that object (held
+by weak reference, so a replacement never matches) and a version of the
+drawing parameters; arrays of a figure already encoded for the same source
+and version are then looked up by position, skipping decode, cast and hash.
+
+Usage:
+    st.plotly_chart(compact_figure(fig), use_container_width=True)
+    st.plotly_chart(compact_figure(fig, source=de_results, version=(p_cutoff, fc_cutoff)))
+
+Author: Prairie Genomics Team
+"""
+
+import base64
+import hashlib
+import threading
+import weakref
+import numpy as np
+from collections import OrderedDict
+import warnings
+
+warnings.filterwarnings('ignore')
+
+# Largest magnitude float32 represents every integer exactly
+FLOAT32_EXACT = 2 ** 24
+
+
+class FigureEncoder:
+    """
+    Typed-array figure encoding with a content-addressed buffer cache
+    """
+
+    def __init__(self, min_size=64, max_cache_entries=256, max_cache_mb=256):
+        """
+        Initialize the encoder
+
+        Args:
+            min_size: Arrays shorter than this stay plain JSON lists
+            max_cache_entries: Encoded buffers kept (least recently used evicted)
+            max_cache_mb: Total size of cached buffers in megabytes
+        """
+        self.min_size = min_size
+        self.max_cache_entries = max_cache_entries
+        self.max_cache_bytes = max_cache_mb * 1024 * 1024
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, fig, source=None, version=None):
+        """
+        Figure (or figure dict) -> figure dict with typed-array data
+
+        Args:
+            fig: Plotly figure or figure dict
+            source: Object the figure's arrays were computed from (e.g. a DE
+                results DataFrame); must support weak references
+            version: Hashable covering everything else the arrays depend on
+                (cutoffs, selected genes, ...); layout-only settings can be left out
+
+        Returns:
+            Dict accepted by st.plotly_chart and plotly.io.to_json
+        """
+        positions = self._positions(source, version)
+
+        if isinstance(fig, dict):
+            figure = {key: value for key, value in fig.items()}
+            figure['data'] = [self._walk(dict(trace), ('data', i), positions)
+                              for i, trace in enumerate(fig.get('data', []))]
+            return figure
+
+        figure = {
+            'data': [self._walk(trace.to_plotly_json(), ('data', i), positions)
+                     for i, trace in enumerate(fig.data)],
+            'layout': fig.layout.to_plotly_json()
+        }
+        if fig.frames:
+            figure['frames'] = []
+            for f, frame in enumerate(fig.frames):
+                spec = frame.to_plotly_json()
+                figure['frames'].append(dict(spec, data=[
+                    self._walk(t, ('frames', f, i), positions) for i, t in enumerate(spec.get('data', []))
+                ]))
+        return figure
+
+    def encode_array(self, values):
+        """
+        Typed-array spec for a numeric array (None when it should stay as-is)
+
+        Returns:
+            Dict with 'dtype', 'bdata' and (for 2D arrays) 'shape', or None
+        """
+        return self._encode(values)[1]
+
+    def clear_cache(self):
+        """Drop all cached buffers"""
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+            self._versions.clear()
+
+    def _encode(self, values):
+        """Tuple (content key, typed-array spec), or (None, None) when values stay as-is"""
+        array = _typed_array(values)
+        if array is None or array.size < self.min_size or array.ndim > 2:
+            return None, None
+
+        array = np.ascontiguousarray(array)
+        digest = hashlib.blake2b(array.view(np.uint8).reshape(-1), digest_size=16)
+        digest.update(f"{array.dtype.str}{array.shape}".encode('utf-8'))
+        key = digest.hexdigest()
+
+        cached = self._cached(key)
+        if cached is not None:
+            return key, cached
+
+        spec = {
+            'dtype': array.dtype.str[1:],
+            'bdata': base64.b64encode(array.astype(array.dtype.newbyteorder('<'), copy=False)).decode('ascii')
+        }
+        if array.ndim == 2:
+            spec['shape'] = f"{array.shape[0]}, {array.shape[1]}"
+
+        with self._lock:
+            self._cache[key] = spec
+            self._cache_bytes += len(spec['bdata'])
+            while self._cache and (len(self._cache) > self.max_cache_entries
+                                   or self._cache_bytes > self.max_cache_bytes):
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted['bdata'])
+        return key, spec
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _positions(self, source, version):
+        """Content keys of arrays already encoded for (source, version), by position in the figure"""
+        if source is None and version is None:
+            return None
+
+        entry_key = (id(source), version)
+        with self._lock:
+            entry = self._versions.get(entry_key)
+            # A dead or different object at a reused id starts a new entry
+            if entry is None or (source is not None and entry[0]() is not source):
+                entry = (weakref.ref(source) if source is not None else None, {})
+                self._versions[entry_key] = entry
+            self._versions.move_to_end(entry_key)
+            while len(self._versions) > self.max_cache_entries:
+                self._versions.popitem(last=False)
+        return entry[1]
+
+    def _walk(self, node, path=(), positions=None):
+        """Replace numeric arrays in a trace dict (recursively) with typed-array specs"""
+        if positions is not None and path in positions:
+            spec = self._cached(positions[path])
+            if spec is not None:
+                return spec
+
+        if isinstance(node, dict):
+            if 'bdata' in node and 'dtype' in node:
+                decoded = _decode_spec(node)
+                key, spec = self._encode(decoded) if decoded is not None else (None, None)
+                if spec is not None and positions is not None:
+                    positions[path] = key
+                return spec or node
+            return {key: self._walk(value, path + (key,), positions) for key, value in node.items()}
+
+        if isinstance(node, (np.ndarray, list, tuple)):
+            key, spec = self._encode(node)
+            if spec is not None:
+                if positions is not None:
+                    positions[path] = key
+                return spec
+            if isinstance(node, np.ndarray):
+                return node
+            return [self._walk(item, path + (i,), positions) if isinstance(item, (dict, list, tuple)) else item
+                    for i, item in enumerate(node)]
+
+        return node
+
+
+def _typed_array(values):
+    """Numeric array in the narrowest lossless-enough dtype, or None"""
+    if isinstance(values, (list, tuple)):
+        if not values or isinstance(values[0], (str, dict, list, tuple)):
+            return None
+        try:
+            values = np.asarray(values)
+        except (ValueError, TypeError):
+            return None
+    if not isinstance(values, np.ndarray):
+        return None
+
+    kind = values.dtype.kind
+    if kind == 'b':
+        return values.astype(np.uint8)
+    if kind == 'u':
+        if values.size and values.max() > np.iinfo(np.uint32).max:
+            return values.astype(np.float64)
+        return values.astype(np.uint32)
+    if kind == 'i':
+        if values.size and (values.min() < np.iinfo(np.int32).min or values.max() > np.iinfo(np.int32).max):
+            return values.astype(np.float64)
+        return values.astype(np.int32)
+    if kind == 'f':
+        finite = values[np.isfinite(values)]
+        # Large integer-valued data (e.g. genomic positions) would lose precision in float32
+        if finite.size and np.abs(finite).max() > FLOAT32_EXACT and np.all(finite == np.round(finite)):
+            return values.astype(np.float64)
+        return values.astype(np.float32)
+    return None
+
+
+def _decode_spec(spec):
+    """Typed-array spec (as produced by plotly.py >= 6) -> ndarray"""
+    try:
+        array = np.frombuffer(base64.b64decode(spec['bdata']), dtype=np.dtype(spec['dtype']).newbyteorder('<'))
+        if 'shape' in spec:
+            array = array.reshape([int(s) for s in str(spec['shape']).split(',')])
+        return array
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+_default_encoder = FigureEncoder()
+
+
+def compact_figure(fig, source=None, version=None):
+    """Encode a figure with the shared module-level encoder"""
+    return _default_encoder.encode(fig, source=source, version=version)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Figure Registry for Prairie Genomics Suite
+
+Keeps the figures drawn during a session (volcano, heatmap, PCA, survival,
+...) as Plotly figure objects addressable by ID, so multi-panel layouts are
+composed from the vector sources themselves rather than by re-reading PNG
+exports from a directory scan. Panels are rebuilt as subplots of a single
+figure (traces, axis settings, shapes and annotations remapped to each
+cell, panel letters added), which is then written once in the requested
+format: SVG/PDF (vector) or PNG (raster) through kaleido, or standalone
+HTML without any extra dependency.
+
+Figure IDs are content digests, so re-registering an unchanged figure on a
+Streamlit rerun keeps a single entry.
+
+Author: Prairie Genomics Team
+"""
+
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from collections import OrderedDict
+from datetime import datetime
+from raster_layers import rasterize_dense_traces
+import warnings
+
+warnings.filterwarnings('ignore')
+
+# Formats rendered by kaleido; HTML is always available
+STATIC_FORMATS = ['svg', 'pdf', 'png']
+
+# Axis settings carried over to a panel's subplot axes
+AXIS_KEYS = ['title', 'type', 'range', 'autorange', 'tickvals', 'ticktext', 'tickangle',
+             'showticklabels', 'categoryorder', 'categoryarray', 'showgrid', 'zeroline', 'tickformat']
+
+
+class FigureRegistry:
+    """
+    Session figure store with in-memory multi-panel composition
+    """
+
+    def __init__(self, max_figures=30):
+        """
+        Initialize the registry
+
+        Args:
+            max_figures: Figures kept (least recently registered evicted)
+        """
+        self.max_figures = max_figures
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, fig, kind, title=None):
+        """
+        Store a figure (unchanged figures keep their existing entry)
+
+        Args:
+            fig: Plotly figure
+            kind: Figure kind (e.g. "volcano", "heatmap")
+            title: Display title (defaults to the figure's layout title)
+
+        Returns:
+            Figure ID
+        """
+        digest = hashlib.sha1(kind.encode('utf-8'))
+        _digest_spec(fig.to_plotly_json(), digest)
+        figure_id = f"{kind}-{digest.hexdigest()[:10]}"
+
+        if title is None:
+            title = fig.layout.title.text or kind
+
+        with self._lock:
+            if figure_id in self._figures:
+                self._figures.move_to_end(figure_id)
+                return figure_id
+            self._figures[figure_id] = {
+                'figure': go.Figure(fig),
+                'kind': kind,
+                'title': title,
+                'registered': datetime.now()
+            }
+            while len(self._figures) > self.max_figures:
+                self._figures.popitem(last=False)
+        return figure_id
+
+    def get(self, figure_id):
+        """Copy of a registered figure"""
+        with self._lock:
+            return go.Figure(self._figures[figure_id]['figure'])
+
+    def entries(self):
+        """
+        Registered figures, newest first
+
+        Returns:
+            DataFrame with 'id', 'kind', 'title', 'traces' and 'registered' columns
+        """
+        with self._lock:
+            rows = [{'id': figure_id, 'kind': entry['kind'], 'title': entry['title'],
+                     'traces': len(entry['figure'].data), 'registered': entry['registered']}
+                    for figure_id, entry in self._figures.items()]
+        return pd.DataFrame(rows[::-1], columns=['id', 'kind', 'title', 'traces', 'registered'])
+
+    def remove(self, figure_id):
+        with self._lock:
+            self._figures.pop(figure_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+    def compose(self, figure_ids, layout=(2, 2), labels=None, title=None, panel_width=450, panel_height=380):
+        """
+        Compose registered figures into one multi-panel figure
+
+        Args:
+            figure_ids: Figure IDs in panel order (row-major)
+            layout: (rows, columns)
+            labels: Panel letters (default A, B, C, ...)
+            title: Overall figure title
+            panel_width, panel_height: Size of one panel in pixels
+
+        Returns:
+            Plotly figure
+        """
+        n_rows, n_cols = layout
+        figure_ids = list(figure_ids)[:n_rows * n_cols]
+        if not figure_ids:
+            raise ValueError("No figures selected for the panel layout")
+        sources = [self.get(figure_id) for figure_id in figure_ids]
+        labels = list(labels or [])
+        labels += [chr(65 + i) for i in range(len(labels), len(sources))]
+
+        specs = [[None] * n_cols for _ in range(n_rows)]
+        for i, source in enumerate(sources):
+            trace_type = source.data[0].type if source.data else 'scatter'
+            specs[i // n_cols][i % n_cols] = {'type': trace_type}
+
+        subplot_titles = [source.layout.title.text or "" for source in sources]
+        composite = make_subplots(rows=n_rows, cols=n_cols, specs=specs,
+                                  subplot_titles=subplot_titles + [""] * (n_rows * n_cols - len(sources)),
+                                  horizontal_spacing=0.12, vertical_spacing=0.15)
+
+        for i, (source, label) in enumerate(zip(sources, labels)):
+            self._add_panel(composite, source, label, i // n_cols + 1, i % n_cols + 1)
+
+        composite.update_layout(
+            title=title,
+            width=panel_width * n_cols,
+            height=panel_height * n_rows + (60 if title else 0),
+            template=sources[0].layout.template or 'plotly_white',
+            legend=dict(tracegroupgap=4)
+        )
+        return composite
+
+    @staticmethod
+    def export(fig, file_format='svg', scale=2, point_threshold=None, dpi=300):
+        """
+        Render a figure to bytes
+
+        Args:
+            fig: Plotly figure
+            file_format: 'svg', 'pdf', 'png' (kaleido required) or 'html'
+            scale: Raster scale factor for PNG
+            point_threshold: In SVG/PDF, scatter traces with more points are
+                drawn as a raster layer (None keeps every trace vector)
+            dpi: Resolution of those raster layers (the page size is unchanged)
+
+        Returns:
+            Bytes of the rendered file
+        """
+        if file_format == 'html':
+            return fig.to_html(include_plotlyjs='cdn', full_html=True).encode('utf-8')
+        if file_format not in STATIC_FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        try:
+            if point_threshold is not None and file_format in ('svg', 'pdf'):
+                fig, _ = rasterize_dense_traces(fig, point_threshold, dpi)
+            return fig.to_image(format=file_format, scale=scale if file_format == 'png' else 1)
+        except (ImportError, ValueError) as e:
+            raise RuntimeError(f"Static {file_format.upper()} export is unavailable: {e}")
+
+    def _add_panel(self, composite, source, label, row, col):
+        """Copy one source figure into subplot (row, col)"""
+        for trace in source.data:
+            trace = go.Figure(trace).data[0]
+            if trace.name:
+                trace.name = f"{label}: {trace.name}"
+            trace.legendgroup = label
+            # A colorbar per panel would overlap its neighbours
+            if 'showscale' in trace:
+                trace.showscale = False
+            if 'marker' in trace and 'showscale' in trace.marker:
+                trace.marker.showscale = False
+            composite.add_trace(trace, row=row, col=col)
+
+        subplot = composite.get_subplot(row, col)
+        x_ref = y_ref = None
+        if hasattr(subplot, 'xaxis'):
+            for target, axis in [(subplot.xaxis, source.layout.xaxis), (subplot.yaxis, source.layout.yaxis)]:
+                settings = axis.to_plotly_json()
+                target.update({key: settings[key] for key in AXIS_KEYS if key in settings})
+            x_ref = subplot.xaxis.plotly_name.replace('axis', '')
+            y_ref = subplot.yaxis.plotly_name.replace('axis', '')
+
+            # Threshold lines and labels drawn in data coordinates move with their panel
+            for shape in source.layout.shapes:
+                remapped = _remap_refs(shape.to_plotly_json(), x_ref, y_ref)
+                if remapped is not None:
+                    composite.add_shape(remapped)
+            for annotation in source.layout.annotations:
+                remapped = _remap_refs(annotation.to_plotly_json(), x_ref, y_ref)
+                if remapped is not None:
+                    composite.add_annotation(remapped)
+
+        # Panel letter at the top-left corner of the cell
+        x_domain, y_domain = _cell_domain(composite, subplot)
+        composite.add_annotation(text=f"<b>{label}</b>", xref='paper', yref='paper',
+                                 x=max(x_domain[0] - 0.04, 0), y=min(y_domain[1] + 0.06, 1.0),
+                                 xanchor='left', yanchor='bottom', showarrow=False, font=dict(size=18))
+
+
+def _remap_refs(item, x_ref, y_ref):
+    """Point an x/y-referenced shape or annotation at a subplot's axes (None for paper refs)"""
+    item = dict(item)
+    for key, ref in [('xref', x_ref), ('yref', y_ref)]:
+        current = item.get(key, key[0])
+        if current == 'paper':
+            return None
+        item[key] = ref + (' domain' if current.endswith('domain') else '')
+    return item
+
+
+def _cell_domain(composite, subplot):
+    """Paper-coordinate (x, y) domains of a subplot cell"""
+    if hasattr(subplot, 'xaxis'):
+        return subplot.xaxis.domain, subplot.yaxis.domain
+    return subplot.x, subplot.y
+
+
+def _digest_spec(node, digest):
+    """Feed a figure spec into a digest (array buffers hashed directly, not as JSON)"""
+    if isinstance(node, dict):
+        for key in sorted(node):
+            digest.update(str(key).encode('utf-8'))
+            _digest_spec(node[key], digest)
+    elif isinstance(node, np.ndarray):
+        digest.update(f"{node.dtype}{node.shape}".encode('utf-8'))
+        digest.update(node.tobytes() if node.dtype != object else repr(node.tolist()).encode('utf-8'))
+    elif isinstance(node, (list, tuple)):
+        digest.update(b"[")
+        for item in node:
+            _digest_spec(item, digest)
+        digest.update(b"]")
+    else:
+        digest.update(json.dumps(node, default=str).encode('utf-8'))
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Local Gene Set Library Store for Prairie Genomics Suite
+
+Imports GMT files once and keeps every library offline as a compressed
+sparse membership matrix (gene sets x genes). Gene symbols are interned to
+integer IDs in a vocabulary shared by all libraries, and the CSR arrays are
+stored as plain .npy files so they can be memory-mapped at startup. Set and
+gene lookups become array operations instead of dict-of-list scans.
+
+Imports hold an exclusive lock on the store directory and re-read the
+vocabulary first, so several stores opened on the same directory (other
+sessions or processes) extend one append-only vocabulary instead of
+handing out clashing IDs.
+
+Store layout:
+    <root>/genes.txt               interned gene symbols, one per line
+    <root>/<library>/meta.json     terms, descriptions, version
+    <root>/<library>/indptr.npy    CSR row pointers
+    <root>/<library>/indices.npy   CSR gene IDs
+
+Author: Prairie Genomics Team
+"""
+
+import json
+import hashlib
+import shutil
+import tempfile
+import threading
+import numpy as np
+from pathlib import Path
+from contextlib import contextmanager
+from scipy import sparse
+import warnings
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): imports are serialized within this process only
+    fcntl = None
+
+warnings.filterwarnings('ignore')
+
+_IMPORT_LOCK = threading.Lock()
+
+
+class GeneSetLibrary:
+    """
+    One gene set library as a sparse sets x genes membership matrix
+    """
+
+    def __init__(self, name, terms, descriptions, indptr, indices, n_genes, version, store=None):
+        """Wrap CSR arrays (possibly memory-mapped) as a membership matrix"""
+        self.name = name
+        self.terms = np.asarray(terms, dtype=object)
+        self.descriptions = np.asarray(descriptions, dtype=object)
+        self.version = version
+        self.store = store
+        self._indptr = indptr
+        self._indices = indices
+        self._n_genes = n_genes
+        self._matrix = None
+        self._term_index = None
+
+    @property
+    def matrix(self):
+        """CSR membership matrix (sets x genes) over the shared vocabulary"""
+        if self._matrix is None or self._matrix.shape[1] != self._n_genes:
+            data = np.ones(len(self._indices), dtype=np.float32)
+            self._matrix = sparse.csr_matrix(
+                (data, self._indices, self._indptr),
+                shape=(len(self.terms), self._n_genes),
+                copy=False
+            )
+        return self._matrix
+
+    @property
+    def set_sizes(self):
+        """Number of genes in each set"""
+        return np.diff(np.asarray(self._indptr))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def term_index(self, term):
+        """Row index of a term"""
+        if self._term_index is None:
+            self._term_index = {t: i for i, t in enumerate(self.terms)}
+        return self._term_index[term]
+
+    def gene_ids(self, term):
+        """Integer gene IDs of one set"""
+        row = self.term_index(term)
+        return np.asarray(self._indices[self._indptr[row]:self._indptr[row + 1]])
+
+    def genes(self, term):
+        """Gene symbols of one set"""
+        return self.store.decode_genes(self.gene_ids(term))
+
+
+class GeneSetStore:
+    """
+    Persistent, memory-mapped store of local gene set libraries
+    """
+
+    def __init__(self, root_dir="gene_set_libraries"):
+        """
+        Open (or create) a gene set store and memory-map its libraries
+
+        Args:
+            root_dir: Directory holding the interned vocabulary and libraries
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+
+        self._symbols = []
+        self._symbol_array = None
+        self._gene_index = {}
+        self._libraries = {}
+
+        self._load_vocabulary()
+        self._load_libraries()
+
+    @property
+    def n_genes(self):
+        """Size of the shared gene vocabulary"""
+        return len(self._symbols)
+
+    @property
+    def symbols(self):
+        """Interned gene symbols as an array indexed by gene ID"""
+        if self._symbol_array is None or len(self._symbol_array) != len(self._symbols):
+            self._symbol_array = np.asarray(self._symbols, dtype=object)
+        return self._symbol_array
+
+    @property
+    def libraries(self):
+        """Names of available libraries"""
+        return list(self._libraries.keys())
+
+    def __contains__(self, name):
+        return name in self._libraries
+
+    def get_library(self, name):
+        """Return a loaded library by name"""
+        if name not in self._libraries:
+            raise KeyError(f"Gene set library not found: {name}")
+        return self._libraries[name]
+
+    def list_libraries(self):
+        """Summary of available libraries"""
+        return [
+            {
+                'library': name,
+                'gene_sets': len(lib),
+                'genes': int(len(np.unique(lib._indices))),
+                'version': lib.version
+            }
+            for name, lib in self._libraries.items()
+        ]
+
+    def encode_genes(self, symbols):
+        """Map gene symbols to integer IDs (-1 when not in the vocabulary)"""
+        return np.fromiter(
+            (self._gene_index.get(str(s).strip().upper(), -1) for s in symbols),
+            dtype=np.int64
+        )
+
+    def decode_genes(self, gene_ids):
+        """Map integer IDs back to gene symbols"""
+        return [self._symbols[i] for i in np.asarray(gene_ids)]
+
+    def indicator(self, symbols):
+        """Boolean vector over the vocabulary marking the given genes"""
+        ids = self.encode_genes(symbols)
+        mask = np.zeros(self.n_genes, dtype=bool)
+        mask[ids[ids >= 0]] = True
+        return mask
+
+    def import_gmt(self, gmt_path, library_name=None, overwrite=False):
+        """
+        Import a GMT file into the store
+
+        Args:
+            gmt_path: Path to a GMT file (or file-like object with text lines)
+            library_name: Library name (defaults to the file stem)
+            overwrite: Replace an existing library with the same name
+
+        Returns:
+            The imported GeneSetLibrary
+        """
+        if hasattr(gmt_path, 'read'):
+            content = gmt_path.read()
+            if isinstance(content, bytes):
+                content = content.decode('utf-8')
+            default_name = Path(getattr(gmt_path, 'name', 'custom_library')).stem
+        else:
+            content = Path(gmt_path).read_text()
+            default_name = Path(gmt_path).stem
+
+        name = library_name or default_name
+        if name in self._libraries and not overwrite:
+            raise ValueError(f"Library {name} already exists")
+
+        terms, descriptions, gene_lists = [], [], []
+        for line in content.splitlines():
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 3 or not fields[0]:
+                continue
+
+            genes = [g.split(',')[0].strip().upper() for g in fields[2:]]
+            terms.append(fields[0])
+            descriptions.append(fields[1])
+            gene_lists.append([g for g in genes if g])
+
+        if not terms:
+            raise ValueError("No gene sets found in GMT file")
+
+        with self._locked():
+            # Another store may have extended the vocabulary since it was read
+            self._load_vocabulary()
+            self._load_libraries()
+            rows = [self._intern(genes) for genes in gene_lists]
+
+            indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(r) for r in rows])
+            indices = np.concatenate(rows).astype(np.int32) if indptr[-1] else np.zeros(0, dtype=np.int32)
+
+            meta = {
+                'name': name,
+                'terms': terms,
+                'descriptions': descriptions,
+                'version': hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+            }
+
+            self._save_vocabulary()
+            self._write_library(name, meta, indptr, indices)
+            self._load_library(name)
+        return self._libraries[name]
+
+    def _intern(self, genes):
+        """Assign integer IDs to gene symbols, extending the vocabulary"""
+        ids = []
+        for gene in dict.fromkeys(genes):
+            gene_id = self._gene_index.get(gene)
+            if gene_id is None:
+                gene_id = len(self._symbols)
+                self._gene_index[gene] = gene_id
+                self._symbols.append(gene)
+            ids.append(gene_id)
+        return np.sort(np.array(ids, dtype=np.int64))
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the store directory, across stores and processes"""
+        with _IMPORT_LOCK, open(self.root_dir / ".lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _load_vocabulary(self):
+        """Read the interned gene vocabulary (append-only, so IDs already handed out stay valid)"""
+        vocab_path = self.root_dir / "genes.txt"
+        if vocab_path.exists():
+            self._symbols = vocab_path.read_text().splitlines()
+            self._gene_index = {g: i for i, g in enumerate(self._symbols)}
+
+    def _load_libraries(self):
+        """Memory-map every library in the store directory"""
+        for library_dir in sorted(self.root_dir.iterdir()):
+            # Dot directories are libraries still being written
+            if not library_dir.name.startswith('.') and (library_dir / "meta.json").exists():
+                self._load_library(library_dir.name)
+
+    def _save_vocabulary(self):
+        """Persist the interned gene vocabulary (append-only)"""
+        vocab_path = self.root_dir / "genes.txt"
+        tmp_path = vocab_path.with_suffix(".tmp")
+        tmp_path.write_text("\n".join(self._symbols) + "\n")
+        tmp_path.replace(vocab_path)
+
+        # Existing libraries see the grown vocabulary as extra empty columns
+        for library in self._libraries.values():
+            library._n_genes = self.n_genes
+
+    def _write_library(self, name, meta, indptr, indices):
+        """Write library arrays to a temporary directory, then swap it in"""
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.root_dir, prefix=f".{name}."))
+        np.save(tmp_dir / "indptr.npy", indptr)
+        np.save(tmp_dir / "indices.npy", indices)
+        (tmp_dir / "meta.json").write_text(json.dumps(meta))
+
+        target = self.root_dir / name
+        if target.exists():
+            shutil.rmtree(target)
+        tmp_dir.rename(target)
+
+    def _load_library(self, name):
+        """Memory-map a library's CSR arrays"""
+        library_dir = self.root_dir / name
+        meta = json.loads((library_dir / "meta.json").read_text())
+
+        self._libraries[name] = GeneSetLibrary(
+            name=name,
+            terms=meta['terms'],
+            descriptions=meta['descriptions'],
+            indptr=np.load(library_dir / "indptr.npy", mmap_mode='r'),
+            indices=np.load(library_dir / "indices.npy", mmap_mode='r'),
+            n_genes=self.n_genes,
+            version=meta['version'],
+            store=self
+        )
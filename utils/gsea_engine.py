@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Preranked GSEA Engine for Prairie Genomics Suite
+
+Native preranked gene set enrichment analysis over the local gene set
+store. The ranking is sorted once and every gene set is mapped to the
+positions of its members in that shared ranking; running-sum enrichment
+scores are then evaluated for all sets of the same size as one array
+operation (the extremes of the running sum only occur at hit positions).
+
+Gene-set permutations depend only on set size, so each permutation chunk
+draws one random gene order per replicate and uses its prefixes as the
+random sets for every size. Chunks run on a process pool with one
+SeedSequence child each, so results are reproducible for any number of
+workers. NES, nominal p, FDR q and FWER p follow the GSEA definitions.
+
+Author: Prairie Genomics Team
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+class PrerankedGSEA:
+    """
+    Vectorized preranked GSEA with batched, parallel gene-set permutations
+    """
+
+    def __init__(self, store, weight=1.0, n_workers=None, seed=42, chunk_size=100):
+        """
+        Initialize the GSEA engine
+
+        Args:
+            store: GeneSetStore holding the libraries
+            weight: Exponent applied to ranking values in the running sum
+            n_workers: Worker processes (defaults to min(4, CPU count); 1 runs inline)
+            seed: Root seed for the per-chunk RNG streams
+            chunk_size: Permutations drawn and evaluated per task
+        """
+        self.store = store
+        self.weight = weight
+        self.n_workers = n_workers if n_workers is not None else min(4, os.cpu_count() or 1)
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def gsea_preranked(self, ranking, databases, min_size=15, max_size=500,
+                       permutation_num=1000, progress_callback=None):
+        """
+        Run preranked GSEA for several local libraries from one shared ranking
+
+        Args:
+            ranking: Series of ranking metric values indexed by gene symbol
+            databases: Local library names
+            min_size: Minimum number of ranked genes per set
+            max_size: Maximum number of ranked genes per set
+            permutation_num: Number of gene-set permutations
+            progress_callback: Optional progress callback function
+
+        Returns:
+            Dict of library -> {'results': DataFrame, 'n_sets': int} with
+            GSEA-style columns (Term, ES, NES, NOM p-val, FDR q-val,
+            FWER p-val, Tag %, Gene %, Lead_genes)
+        """
+        databases = [db for db in databases if db in self.store]
+        if not databases:
+            return {}
+
+        if progress_callback:
+            progress_callback("Sorting ranking...", 5)
+
+        symbols, weights, gene_positions = self._prepare_ranking(ranking)
+        n_ranked = len(symbols)
+
+        # Map every library's sets to sorted positions in the shared ranking
+        libraries = {}
+        for db in databases:
+            sets = self._ranked_sets(self.store.get_library(db), gene_positions, min_size, max_size)
+            if sets['sizes'].size > 0:
+                libraries[db] = sets
+
+        if not libraries:
+            return {}
+
+        sizes = np.unique(np.concatenate([sets['sizes'] for sets in libraries.values()]))
+
+        if progress_callback:
+            progress_callback(f"Running {permutation_num} permutations for {len(sizes)} set sizes...", 20)
+
+        null = np.vstack(self._map(
+            _permutation_chunk,
+            [(weights, sizes, stream, n_reps) for stream, n_reps in self._chunks(permutation_num)]
+        ))
+
+        if progress_callback:
+            progress_callback("Computing enrichment statistics...", 80)
+
+        results = {}
+        for db, sets in libraries.items():
+            table = self._statistics(sets, weights, null, sizes, symbols, n_ranked)
+            results[db] = {
+                'results': table,
+                'n_sets': len(table)
+            }
+
+        if progress_callback:
+            progress_callback("GSEA complete!", 100)
+
+        return results
+
+    def _prepare_ranking(self, ranking):
+        """Sort the ranking (descending) and map vocabulary IDs to ranked positions"""
+        ranking = pd.Series(ranking).dropna()
+        ranking.index = [str(g).strip().upper() for g in ranking.index]
+
+        # Duplicate symbols keep their strongest value
+        ranking = ranking.iloc[np.argsort(-np.abs(ranking.values), kind='stable')]
+        ranking = ranking[~ranking.index.duplicated(keep='first')]
+        ranking = ranking.sort_values(ascending=False, kind='stable')
+
+        weights = np.abs(ranking.values.astype(float)) ** self.weight
+        gene_ids = self.store.encode_genes(ranking.index)
+        gene_positions = np.full(self.store.n_genes, -1, dtype=np.int64)
+        known = gene_ids >= 0
+        gene_positions[gene_ids[known]] = np.flatnonzero(known)
+
+        return np.asarray(ranking.index, dtype=object), weights, gene_positions
+
+    @staticmethod
+    def _ranked_sets(library, gene_positions, min_size, max_size):
+        """Sorted ranked positions of each set's members, grouped by set size"""
+        indptr = np.asarray(library._indptr)
+        positions = gene_positions[np.asarray(library._indices)]
+        rows = np.repeat(np.arange(len(library)), np.diff(indptr))
+
+        # Sort members by (set, ranked position) through one combined key
+        keep = positions >= 0
+        n_ranked = max(int(gene_positions.max()) + 1, 1)
+        key = np.sort(rows[keep] * n_ranked + positions[keep])
+        rows, positions = np.divmod(key, n_ranked)
+
+        counts = np.bincount(rows, minlength=len(library))
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        selected = np.flatnonzero((counts >= max(min_size, 1)) & (counts <= max_size))
+
+        groups = {}
+        for size in np.unique(counts[selected]):
+            group_rows = selected[counts[selected] == size]
+            groups[int(size)] = (group_rows, positions[starts[group_rows][:, None] + np.arange(size)])
+
+        return {
+            'terms': library.terms,
+            'sizes': counts[selected],
+            'groups': groups
+        }
+
+    def _statistics(self, sets, weights, null, sizes, symbols, n_ranked):
+        """ES, NES, nominal p, FDR q, FWER p and leading edges for one library"""
+        terms, es, null_idx, tag, gene, lead = [], [], [], [], [], []
+        for size, (rows, positions) in sets['groups'].items():
+            scores, peak = _enrichment_scores(positions, weights, return_peak=True)
+            terms.append(sets['terms'][rows])
+            es.append(scores)
+            null_idx.append(np.full(len(rows), np.searchsorted(sizes, size)))
+
+            # Leading edge: hits up to the peak (positive ES) or from it (negative ES)
+            hit_index = np.arange(size)
+            in_edge = np.where((scores >= 0)[:, None], hit_index <= peak[:, None], hit_index >= peak[:, None])
+            tag.append(in_edge.mean(axis=1))
+            peak_position = positions[np.arange(len(rows)), peak]
+            gene.append(np.where(scores >= 0, peak_position + 1, n_ranked - peak_position) / n_ranked)
+            lead.extend(";".join(symbols[p[m]]) for p, m in zip(positions, in_edge))
+
+        es = np.concatenate(es)
+        null_idx = np.concatenate(null_idx)
+
+        # Per-size null means of each sign normalize both observed and null scores
+        positive = np.where(null >= 0, null, np.nan)
+        negative = np.where(null < 0, null, np.nan)
+        pos_mean = np.nanmean(positive, axis=0)
+        neg_mean = np.abs(np.nanmean(negative, axis=0))
+        null_nes = np.where(null >= 0, null / pos_mean, null / neg_mean)
+
+        is_pos = es >= 0
+        scale = np.where(is_pos, pos_mean[null_idx], neg_mean[null_idx])
+        nes = es / scale
+
+        # Nominal p: fraction of same-sign null scores at least as extreme
+        set_null = null[:, null_idx]
+        n_pos = (set_null >= 0).sum(axis=0)
+        n_neg = (set_null < 0).sum(axis=0)
+        nom_p = np.where(
+            is_pos,
+            (set_null >= es).sum(axis=0) / np.maximum(n_pos, 1),
+            (set_null <= es).sum(axis=0) / np.maximum(n_neg, 1)
+        )
+
+        # FDR q: null NES of all sets in the library vs observed NES, per sign
+        size_counts = np.bincount(null_idx, minlength=len(sizes))
+        fdr = np.ones(len(es))
+        for sign, mask in ((1, is_pos), (-1, ~is_pos)):
+            if not mask.any():
+                continue
+            null_values = null_nes * sign
+            null_weights = np.broadcast_to(size_counts, null_values.shape)
+            valid = null_values >= 0
+            null_sorted, null_cum = _weighted_tail(null_values[valid], null_weights[valid])
+            observed = np.sort(nes[mask] * sign)
+
+            query = nes[mask] * sign
+            null_frac = _tail_fraction(null_sorted, null_cum, query)
+            obs_frac = (len(observed) - np.searchsorted(observed, query, side='left')) / len(observed)
+            fdr[mask] = np.minimum(null_frac / np.maximum(obs_frac, 1e-300), 1)
+
+        # FWER p: fraction of permutations whose most extreme null NES beats the set
+        used = np.unique(null_idx)
+        max_null = np.nanmax(np.where(null_nes[:, used] >= 0, null_nes[:, used], np.nan), axis=1)
+        min_null = np.nanmin(np.where(null_nes[:, used] < 0, null_nes[:, used], np.nan), axis=1)
+        fwer = np.where(
+            is_pos,
+            (max_null[:, None] >= nes).mean(axis=0),
+            (min_null[:, None] <= nes).mean(axis=0)
+        )
+
+        table = pd.DataFrame({
+            'Term': np.concatenate(terms),
+            'ES': es,
+            'NES': nes,
+            'NOM p-val': nom_p,
+            'FDR q-val': fdr,
+            'FWER p-val': fwer,
+            'Tag %': np.concatenate(tag),
+            'Gene %': np.concatenate(gene),
+            'Lead_genes': lead
+        })
+        table['abs_NES'] = table['NES'].abs()
+        table = table.sort_values(['FDR q-val', 'abs_NES'], ascending=[True, False])
+        return table.drop(columns='abs_NES').reset_index(drop=True)
+
+    def _chunks(self, n_permutations):
+        """Independent SeedSequence per permutation chunk, with its permutation count"""
+        n_chunks = int(np.ceil(n_permutations / self.chunk_size))
+        streams = np.random.SeedSequence(self.seed).spawn(n_chunks)
+        sizes = [min(self.chunk_size, n_permutations - i * self.chunk_size) for i in range(n_chunks)]
+        return list(zip(streams, sizes))
+
+    def _map(self, func, tasks):
+        """Run tasks on the process pool, or inline for a single worker"""
+        if self.n_workers <= 1 or len(tasks) <= 1:
+            return [func(*task) for task in tasks]
+
+        with ProcessPoolExecutor(max_workers=min(self.n_workers, len(tasks))) as executor:
+            return list(executor.map(func, *zip(*tasks)))
+
+
+def _enrichment_scores(positions, weights, return_peak=False):
+    """
+    Running-sum enrichment scores for sets of equal size
+
+    Args:
+        positions: (n_sets, k) sorted ranked positions of each set's members
+        weights: Weighted ranking values of all ranked genes
+
+    The running sum peaks just after a hit and dips just before one, so the
+    extremes are evaluated only at hit positions.
+    """
+    n_sets, k = positions.shape
+    n_ranked = len(weights)
+
+    hit_weights = weights[positions]
+    cumulative = np.cumsum(hit_weights, axis=1)
+    total = cumulative[:, -1:]
+    # Sets whose hits all have zero weight are scored unweighted
+    flat = total[:, 0] == 0
+    if flat.any():
+        cumulative[flat] = np.arange(1, k + 1)
+        hit_weights[flat] = 1
+        total = cumulative[:, -1:]
+
+    misses = (positions - np.arange(k)) / max(n_ranked - k, 1)
+    after = cumulative / total - misses
+    before = (cumulative - hit_weights) / total - misses
+
+    max_idx = after.argmax(axis=1)
+    min_idx = before.argmin(axis=1)
+    rows = np.arange(n_sets)
+    max_dev = after[rows, max_idx]
+    min_dev = before[rows, min_idx]
+
+    positive = max_dev > -min_dev
+    scores = np.where(positive, max_dev, min_dev)
+    if return_peak:
+        return scores, np.where(positive, max_idx, min_idx)
+    return scores
+
+
+def _permutation_chunk(weights, sizes, stream, n_reps):
+    """Worker: null enrichment scores (n_reps x n_sizes) from random gene orders"""
+    rng = np.random.default_rng(stream)
+    n_ranked = len(weights)
+    # Prefixes of one random draw per replicate serve as random sets of every size
+    order = np.vstack([
+        rng.choice(n_ranked, size=int(sizes[-1]), replace=False) for _ in range(n_reps)
+    ])
+
+    null = np.empty((n_reps, len(sizes)))
+    for j, size in enumerate(sizes):
+        null[:, j] = _enrichment_scores(np.sort(order[:, :size], axis=1), weights)
+    return null
+
+
+def _weighted_tail(values, weights):
+    """Sorted values with cumulative weights from the top for tail lookups"""
+    order = np.argsort(values)
+    values = values[order]
+    tail = np.cumsum(weights[order][::-1])[::-1]
+    return values, tail
+
+
+def _tail_fraction(values, tail, query):
+    """Weighted fraction of values >= each query"""
+    if len(values) == 0:
+        return np.ones(len(query))
+    idx = np.searchsorted(values, query, side='left')
+    counts = np.where(idx < len(values), tail[np.minimum(idx, len(values) - 1)], 0)
+    return counts / tail[0]
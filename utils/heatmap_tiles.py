@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution Heatmap Tiles for Prairie Genomics Suite
+
+Level-of-detail heatmaps for matrices far larger than a browser can draw
+cell by cell (e.g. 5,000 genes x 2,000 samples). A pyramid of aggregated
+levels is precomputed once: level (a, b) holds the mean of each 2^a-row by
+2^b-column bin (missing values are skipped, ragged edge bins averaged over
+the cells they hold). A view request picks, independently per axis, the
+finest level at which the requested window fits the cell budget, so the
+full matrix is served coarse first and zooming into a window refines it,
+always with a bounded number of cells.
+
+Levels that pool both axes are stored (together at most the size of the
+matrix); levels at full resolution on one axis are only served for windows
+that are already narrow on that axis, so they are pooled from the matrix
+on request.
+
+Author: Prairie Genomics Team
+"""
+
+import numpy as np
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+class HeatmapPyramid:
+    """
+    Precomputed mean-pooled heatmap levels with budgeted viewport queries
+    """
+
+    def __init__(self, data, max_rows=400, max_cols=400):
+        """
+        Build the pyramid
+
+        Args:
+            data: Matrix DataFrame (rows x columns, e.g. genes x samples)
+            max_rows: Maximum rows in any served view
+            max_cols: Maximum columns in any served view
+        """
+        self.row_labels = np.asarray(data.index.astype(str), dtype=object)
+        self.col_labels = np.asarray(data.columns.astype(str), dtype=object)
+        self.shape = data.shape
+        self.max_rows = max_rows
+        self.max_cols = max_cols
+        self.n_row_levels = _n_levels(self.shape[0], max_rows)
+        self.n_col_levels = _n_levels(self.shape[1], max_cols)
+
+        self.values = data.values.astype(np.float32)
+        self.levels = {}
+        for a in range(1, self.n_row_levels):
+            for b in range(1, self.n_col_levels):
+                self.levels[(a, b)] = _pooled_means(self.values, 1 << a, 1 << b)
+
+    @property
+    def nbytes(self):
+        """Memory held by the matrix and all stored levels"""
+        return self.values.nbytes + sum(level.nbytes for level in self.levels.values())
+
+    def view(self, row_range=None, col_range=None):
+        """
+        Aggregated view of a window at the finest level within budget
+
+        Args:
+            row_range: (start, stop) row positions (whole matrix when None)
+            col_range: (start, stop) column positions (whole matrix when None)
+
+        Returns:
+            Dict with 'z' (bin means), 'row_centers' / 'col_centers' (bin
+            centers in original positions), 'row_labels' / 'col_labels' (bin
+            labels), 'level' (a, b) and 'bin_size' (rows, columns per bin)
+        """
+        row_start, row_stop = _clip(row_range, self.shape[0])
+        col_start, col_stop = _clip(col_range, self.shape[1])
+
+        a = _level_for(row_stop - row_start, self.max_rows, self.n_row_levels)
+        b = _level_for(col_stop - col_start, self.max_cols, self.n_col_levels)
+
+        # Bins overlapping the window
+        row_bins = slice(row_start >> a, ((row_stop - 1) >> a) + 1)
+        col_bins = slice(col_start >> b, ((col_stop - 1) >> b) + 1)
+
+        if (a, b) in self.levels:
+            z = self.levels[(a, b)][row_bins, col_bins]
+        else:
+            window = self.values[row_bins.start << a:row_bins.stop << a,
+                                 col_bins.start << b:col_bins.stop << b]
+            z = _pooled_means(window, 1 << a, 1 << b)
+
+        row_centers, row_labels = _bins(row_bins, a, self.shape[0], self.row_labels)
+        col_centers, col_labels = _bins(col_bins, b, self.shape[1], self.col_labels)
+        return {
+            'z': z,
+            'row_centers': row_centers,
+            'row_labels': row_labels,
+            'col_centers': col_centers,
+            'col_labels': col_labels,
+            'level': (a, b),
+            'bin_size': (1 << a, 1 << b)
+        }
+
+
+def _pooled_means(values, row_size, col_size):
+    """Means of row_size x col_size bins, skipping missing values"""
+    finite = np.isfinite(values)
+    sums = np.where(finite, values, 0).astype(np.float64)
+    counts = finite.astype(np.float64)
+
+    row_starts = np.arange(0, values.shape[0], row_size)
+    col_starts = np.arange(0, values.shape[1], col_size)
+    if row_size > 1:
+        sums = np.add.reduceat(sums, row_starts, axis=0)
+        counts = np.add.reduceat(counts, row_starts, axis=0)
+    if col_size > 1:
+        sums = np.add.reduceat(sums, col_starts, axis=1)
+        counts = np.add.reduceat(counts, col_starts, axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums / counts).astype(np.float32)
+
+
+def _n_levels(n_items, limit):
+    """Levels needed until the whole axis fits in one view"""
+    levels = 1
+    while -(-n_items // (1 << (levels - 1))) > limit:
+        levels += 1
+    return levels
+
+
+def _level_for(n_items, limit, n_levels):
+    """Finest level at which n_items fit within limit bins (one extra bin for misalignment)"""
+    level = 0
+    while level < n_levels - 1 and -(-n_items // (1 << level)) + 1 > limit:
+        level += 1
+    return level
+
+
+def _clip(window, n_items):
+    if window is None:
+        return 0, n_items
+    start, stop = int(max(0, window[0])), int(min(n_items, window[1]))
+    return (start, stop) if stop > start else (0, n_items)
+
+
+def _bins(bins, level, n_items, labels):
+    """Centers (original positions) and labels of the bins in a slice"""
+    size = 1 << level
+    starts = np.arange(bins.start, bins.stop) * size
+    stops = np.minimum(starts + size, n_items)
+    centers = (starts + stops - 1) / 2
+    if size == 1:
+        return centers, labels[starts]
+    bin_labels = np.array([
+        f"{labels[s]} … {labels[e - 1]} ({e - s})" if e - s > 1 else labels[s]
+        for s, e in zip(starts, stops)
+    ], dtype=object)
+    return centers, bin_labels
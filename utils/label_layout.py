@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Label Placement Engine for Prairie Genomics Suite
+
+Places text labels for highlighted genes on scatter-type plots (volcano,
+MA) without overlapping each other or covering nearby points. Placement
+works in display units (pixels for Plotly, points for matplotlib):
+
+- Drawn points are counted once on a fine raster turned into a summed-area
+  table, so the points under any candidate box take four lookups; placed
+  label boxes go into a uniform spatial grid as they are accepted, so a
+  label collision test only looks at the few cells a candidate box touches.
+- Labels are placed greedily in priority order. Each label tries a fixed,
+  bounded set of candidate positions (8 directions on a few rings of
+  increasing distance); the first position free of other labels and with
+  the fewest covered points wins, ties going to the closest. Labels with
+  no free position are reported unplaced rather than stacked.
+
+The cost is O(points + labels x candidates x cells touched), so hundreds
+of labels place in milliseconds, unlike pairwise repel simulations. The same
+placement feeds Plotly annotations (interactive) and matplotlib
+annotations (publication exports) via plotly_annotations() and
+annotate_axes().
+
+Author: Prairie Genomics Team
+"""
+
+import math
+import numpy as np
+import pandas as pd
+import warnings
+
+warnings.filterwarnings('ignore')
+
+# Unit direction vectors tried on each ring: above, below, right, left, then diagonals
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]
+
+
+class LabelPlacer:
+    """
+    Grid-indexed greedy label placement with bounded candidate search
+    """
+
+    def __init__(self, font_size=11, char_width=0.6, line_height=1.25, padding=2,
+                 point_radius=3, n_rings=4, ring_step=None):
+        """
+        Initialize the placer
+
+        Args:
+            font_size: Label font size in display units
+            char_width: Average character width as a fraction of font size
+            line_height: Label box height as a multiple of font size
+            padding: Space kept around each label box
+            point_radius: Radius of drawn points (obstacle size)
+            n_rings: Candidate rings around each anchor
+            ring_step: Distance between rings (default: one label height)
+        """
+        self.font_size = font_size
+        self.char_width = char_width
+        self.line_height = line_height
+        self.padding = padding
+        self.point_radius = point_radius
+        self.n_rings = n_rings
+        self.ring_step = ring_step or font_size * line_height
+
+    def label_size(self, text):
+        """(width, height) of a label box in display units"""
+        return (len(str(text)) * self.char_width * self.font_size + 2 * self.padding,
+                self.line_height * self.font_size + 2 * self.padding)
+
+    def place(self, x, y, labels, obstacles=None, bounds=None):
+        """
+        Place labels in display coordinates (y up)
+
+        Args:
+            x, y: Anchor positions of the labelled points (in priority order)
+            labels: Label texts
+            obstacles: (n, 2) positions of other drawn points to avoid
+                (the labelled points are always obstacles)
+            bounds: (x_min, y_min, x_max, y_max) labels must stay within
+
+        Returns:
+            DataFrame with 'label', 'x', 'y', 'dx', 'dy' (label center offset
+            from its anchor) and 'placed'
+        """
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        labels = [str(label) for label in labels]
+        points = np.c_[x, y]
+        if obstacles is not None and len(obstacles) > 0:
+            points = np.r_[points, np.asarray(obstacles, dtype=float)]
+
+        sizes = np.array([self.label_size(label) for label in labels]).reshape(-1, 2)
+        cell = max(sizes.max(axis=0).max() if len(sizes) else 1.0, 4 * self.point_radius, 1.0)
+        point_grid = _PointGrid(points, resolution=max(self.point_radius / 2, 0.5))
+        label_grid = _BoxGrid(cell)
+
+        dx = np.zeros(len(labels))
+        dy = np.zeros(len(labels))
+        placed = np.zeros(len(labels), dtype=bool)
+
+        for i, (width, height) in enumerate(sizes.tolist()):
+            anchor_x, anchor_y = float(x[i]), float(y[i])
+            best, best_cost = None, None
+            for ring in range(self.n_rings):
+                # Box edge (not center) sits `gap` away from the anchor along each direction
+                gap = self.point_radius + self.padding + ring * self.ring_step
+                for direction_x, direction_y in DIRECTIONS:
+                    offset = (direction_x * (width / 2 + gap), direction_y * (height / 2 + gap))
+                    box = (anchor_x + offset[0] - width / 2, anchor_y + offset[1] - height / 2,
+                           anchor_x + offset[0] + width / 2, anchor_y + offset[1] + height / 2)
+
+                    if bounds is not None and (box[0] < bounds[0] or box[1] < bounds[1]
+                                               or box[2] > bounds[2] or box[3] > bounds[3]):
+                        continue
+                    if label_grid.overlaps(box):
+                        continue
+
+                    covered = point_grid.count(box, self.point_radius)
+                    cost = (covered, ring)
+                    if best_cost is None or cost < best_cost:
+                        best, best_cost = (offset, box), cost
+                    if covered == 0:
+                        break
+                if best_cost is not None and best_cost[0] == 0:
+                    break
+
+            if best is not None:
+                (dx[i], dy[i]), box = best
+                label_grid.add(box)
+                placed[i] = True
+
+        return pd.DataFrame({'label': labels, 'x': x, 'y': y, 'dx': dx, 'dy': dy, 'placed': placed})
+
+    def place_on_axes(self, x, y, labels, x_range, y_range, width, height, obstacles=None):
+        """
+        Place labels for data coordinates on a plot area of width x height
+
+        Args:
+            x, y: Data coordinates of the labelled points
+            labels: Label texts
+            x_range, y_range: Axis ranges (data units) spanning the plot area
+            width, height: Plot area size in display units
+            obstacles: (n, 2) data coordinates of other drawn points
+
+        Returns:
+            place() output with 'x' / 'y' in data units and 'dx' / 'dy' in
+            display units
+        """
+        def to_display(values_x, values_y):
+            return (np.asarray(values_x, dtype=float) - x_range[0]) / (x_range[1] - x_range[0]) * width, \
+                   (np.asarray(values_y, dtype=float) - y_range[0]) / (y_range[1] - y_range[0]) * height
+
+        px, py = to_display(x, y)
+        display_obstacles = None
+        if obstacles is not None and len(obstacles) > 0:
+            obstacles = np.asarray(obstacles, dtype=float)
+            display_obstacles = np.c_[to_display(obstacles[:, 0], obstacles[:, 1])]
+
+        placement = self.place(px, py, labels, display_obstacles, bounds=(0, 0, width, height))
+        placement['x'] = np.asarray(x, dtype=float)
+        placement['y'] = np.asarray(y, dtype=float)
+        return placement
+
+
+def plotly_annotations(placement, font_size=11, color='black', leader_color='#555555'):
+    """
+    Plotly annotation dicts for placed labels (pixel offsets, leader lines)
+
+    Returns:
+        List of dicts for fig.update_layout(annotations=...) / fig.add_annotation
+    """
+    annotations = []
+    for row in placement[placement['placed']].itertuples():
+        annotations.append(dict(
+            x=row.x, y=row.y, xref='x', yref='y', text=row.label,
+            # Plotly pixel offsets grow downwards
+            ax=row.dx, ay=-row.dy, axref='pixel', ayref='pixel',
+            showarrow=True, arrowhead=0, arrowwidth=0.8, arrowcolor=leader_color, standoff=2,
+            font=dict(size=font_size, color=color), bgcolor='rgba(255,255,255,0.6)'
+        ))
+    return annotations
+
+
+def annotate_axes(ax, placement, fontsize=8, color='black', leader_color='#555555'):
+    """
+    Draw placed labels on matplotlib axes (offsets in points)
+
+    Returns:
+        List of matplotlib Annotation artists
+    """
+    artists = []
+    for row in placement[placement['placed']].itertuples():
+        artists.append(ax.annotate(
+            row.label, xy=(row.x, row.y), xytext=(row.dx, row.dy), textcoords='offset points',
+            ha='center', va='center', fontsize=fontsize, color=color,
+            arrowprops=dict(arrowstyle='-', color=leader_color, lw=0.6, shrinkA=0, shrinkB=2)
+        ))
+    return artists
+
+
+class _PointGrid:
+    """
+    Point counts on a fine raster as a summed-area table, so the number of
+    points under any box is four lookups regardless of point density
+    """
+
+    def __init__(self, points, resolution=2.0):
+        self.resolution = resolution
+        if len(points) == 0:
+            self.table = None
+            return
+        self.origin = points.min(axis=0)
+        cells = np.floor((points - self.origin) / resolution).astype(np.int64)
+        shape = cells.max(axis=0) + 1
+        counts = np.zeros(shape, dtype=np.int64)
+        np.add.at(counts, (cells[:, 0], cells[:, 1]), 1)
+        self.table = np.zeros((shape[0] + 1, shape[1] + 1), dtype=np.int64)
+        self.table[1:, 1:] = counts.cumsum(axis=0).cumsum(axis=1)
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    def count(self, box, radius):
+        """Points whose marker intersects a box (to raster resolution)"""
+        if self.table is None:
+            return 0
+        x0 = max(math.floor((box[0] - radius - self.origin[0]) / self.resolution), 0)
+        y0 = max(math.floor((box[1] - radius - self.origin[1]) / self.resolution), 0)
+        x1 = min(math.floor((box[2] + radius - self.origin[0]) / self.resolution) + 1, self.shape[0])
+        y1 = min(math.floor((box[3] + radius - self.origin[1]) / self.resolution) + 1, self.shape[1])
+        if x1 <= x0 or y1 <= y0:
+            return 0
+        table = self.table
+        return int(table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0])
+
+
+class _BoxGrid:
+    """Placed label boxes hashed by every grid cell they touch"""
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.boxes = []
+        self.cells = {}
+
+    def _cells(self, box):
+        return [(cx, cy)
+                for cx in range(math.floor(box[0] / self.cell), math.floor(box[2] / self.cell) + 1)
+                for cy in range(math.floor(box[1] / self.cell), math.floor(box[3] / self.cell) + 1)]
+
+    def overlaps(self, box):
+        for key in self._cells(box):
+            for other in self.cells.get(key, ()):
+                o = self.boxes[other]
+                if box[0] < o[2] and o[0] < box[2] and box[1] < o[3] and o[1] < box[3]:
+                    return True
+        return False
+
+    def add(self, box):
+        index = len(self.boxes)
+        self.boxes.append(box)
+        for key in self._cells(box):
+            self.cells.setdefault(key, []).append(index)
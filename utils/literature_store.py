@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Persistent Literature Store for Prairie Genomics Suite
+
+SQLite-backed PubMed cache and offline index. Articles are stored once per
+PMID (title, abstract, authors, journal, publication date) with an FTS5
+full-text index over them, and every search query maps to its PMID list
+with a time-to-live. Repeated or overlapping searches across genes,
+pathways and sessions resolve locally, and everything fetched so far can
+be searched offline with FTS5 query syntax and bm25 ranking.
+
+Author: Prairie Genomics Team
+"""
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import date
+from pathlib import Path
+import pandas as pd
+import warnings
+
+warnings.filterwarnings('ignore')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    pmid TEXT PRIMARY KEY,
+    title TEXT,
+    abstract TEXT,
+    authors TEXT,
+    journal TEXT,
+    publication_date TEXT,
+    fetched_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, abstract, authors, journal,
+    content='articles', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, abstract, authors, journal)
+    VALUES (new.rowid, new.title, new.abstract, new.authors, new.journal);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, abstract, authors, journal)
+    VALUES ('delete', old.rowid, old.title, old.abstract, old.authors, old.journal);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, abstract, authors, journal)
+    VALUES ('delete', old.rowid, old.title, old.abstract, old.authors, old.journal);
+    INSERT INTO articles_fts(rowid, title, abstract, authors, journal)
+    VALUES (new.rowid, new.title, new.abstract, new.authors, new.journal);
+END;
+CREATE TABLE IF NOT EXISTS queries (
+    query_key TEXT PRIMARY KEY,
+    query TEXT,
+    params TEXT,
+    total_results INTEGER,
+    pmids TEXT,
+    fetched_at REAL
+);
+"""
+
+
+class LiteratureStore:
+    """
+    PMID-keyed article store with FTS5 index and TTL query cache
+    """
+
+    def __init__(self, db_path="literature_cache.db", ttl_days=30):
+        """
+        Open (or create) the literature store
+
+        Args:
+            db_path: SQLite database file
+            ttl_days: Days before a cached query-to-PMID mapping expires
+                (articles themselves never expire)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_days * 86400
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def get_query(self, query, params=None):
+        """
+        Cached search result for a query if it has not expired
+
+        Returns:
+            Tuple (total_results, pmids) or None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT total_results, pmids, fetched_at FROM queries WHERE query_key = ?",
+                (self._query_key(query, params),)
+            ).fetchone()
+
+        if row is None or time.time() - row[2] > self.ttl_seconds:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put_query(self, query, total_results, pmids, params=None):
+        """Cache the PMID list of a search query"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?, ?, ?)",
+                (self._query_key(query, params), query, json.dumps(params or {}, sort_keys=True),
+                 int(total_results), json.dumps(list(pmids)), time.time())
+            )
+
+    def get_articles(self, pmids):
+        """Stored articles for the given PMIDs as a dict of pmid -> article"""
+        pmids = [str(p) for p in pmids]
+        articles = {}
+        with self._connect() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(pmids), 500):
+                chunk = pmids[start:start + 500]
+                rows = conn.execute(
+                    "SELECT pmid, title, abstract, authors, journal, publication_date FROM articles "
+                    f"WHERE pmid IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    articles[row[0]] = self._row_to_article(row)
+        return articles
+
+    def put_articles(self, articles):
+        """Insert or update articles (dicts as produced by the E-utilities client)"""
+        now = time.time()
+        rows = [
+            (str(a.get('pmid', '')), a.get('title', ''), a.get('abstract', ''),
+             json.dumps(list(a.get('authors', []))), a.get('journal', ''),
+             _date_text(a.get('publication_date')), now)
+            for a in articles if a.get('pmid')
+        ]
+        if not rows:
+            return
+
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(pmid) DO UPDATE SET title=excluded.title, abstract=excluded.abstract, "
+                "authors=excluded.authors, journal=excluded.journal, "
+                "publication_date=excluded.publication_date, fetched_at=excluded.fetched_at",
+                rows
+            )
+
+    def iter_articles(self, pmids=None, chunk_size=5000):
+        """
+        Stream stored articles in chunks (for corpus-wide analyses)
+
+        Args:
+            pmids: Restrict to these PMIDs (all stored articles when None)
+            chunk_size: Articles per yielded chunk
+
+        Yields:
+            DataFrames with pmid, title, abstract and publication_date columns
+        """
+        columns = ['pmid', 'title', 'abstract', 'publication_date']
+        if pmids is not None:
+            pmids = list(dict.fromkeys(str(p) for p in pmids))
+            for start in range(0, len(pmids), chunk_size):
+                chunk = pmids[start:start + chunk_size]
+                rows = []
+                with self._connect() as conn:
+                    for offset in range(0, len(chunk), 500):
+                        part = chunk[offset:offset + 500]
+                        rows.extend(conn.execute(
+                            "SELECT pmid, title, abstract, publication_date FROM articles "
+                            f"WHERE pmid IN ({','.join('?' * len(part))})", part
+                        ).fetchall())
+                if rows:
+                    yield pd.DataFrame(rows, columns=columns)
+            return
+
+        with self._connect() as conn:
+            cursor = conn.execute("SELECT pmid, title, abstract, publication_date FROM articles ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+
+    def search(self, text, limit=50, since_year=None):
+        """
+        Full-text search over all stored articles
+
+        Args:
+            text: FTS5 query (plain words, "phrases", AND/OR/NOT, prefix*);
+                plain text that is not valid FTS5 syntax is searched as words
+            limit: Maximum number of articles returned
+            since_year: Only articles published in or after this year
+
+        Returns:
+            DataFrame of matching articles ranked by bm25 (best first) with a
+            highlighted abstract snippet
+        """
+        sql = (
+            "SELECT a.pmid, a.title, a.journal, a.publication_date, a.authors, "
+            "snippet(articles_fts, 1, '**', '**', ' … ', 24) AS snippet, "
+            "bm25(articles_fts, 5.0, 1.0, 0.5, 0.5) AS score "
+            "FROM articles_fts JOIN articles a ON a.rowid = articles_fts.rowid "
+            "WHERE articles_fts MATCH ?"
+        )
+        params = []
+        if since_year:
+            sql += " AND substr(a.publication_date, 1, 4) >= ?"
+            params.append(str(int(since_year)))
+        sql += " ORDER BY score LIMIT ?"
+
+        with self._connect() as conn:
+            try:
+                rows = conn.execute(sql, [text] + params + [int(limit)]).fetchall()
+            except sqlite3.OperationalError:
+                # Fall back to quoting every word when the text is not valid FTS5 syntax
+                words = " ".join(f'"{w}"' for w in re.findall(r"\w+", text))
+                rows = conn.execute(sql, [words] + params + [int(limit)]).fetchall() if words else []
+
+        table = pd.DataFrame(rows, columns=['pmid', 'title', 'journal', 'publication_date',
+                                            'authors', 'snippet', 'score'])
+        table['authors'] = table['authors'].map(lambda a: ", ".join(json.loads(a)[:3]) if a else "")
+        return table
+
+    def stats(self):
+        """Numbers of stored articles and live/expired cached queries"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._connect() as conn:
+            n_articles = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            n_queries = conn.execute("SELECT COUNT(*) FROM queries WHERE fetched_at >= ?", (cutoff,)).fetchone()[0]
+            n_expired = conn.execute("SELECT COUNT(*) FROM queries WHERE fetched_at < ?", (cutoff,)).fetchone()[0]
+        return {
+            'articles': n_articles,
+            'cached_queries': n_queries,
+            'expired_queries': n_expired,
+            'size_mb': self.db_path.stat().st_size / 1e6 if self.db_path.exists() else 0.0
+        }
+
+    def clear_cache(self, articles=False):
+        """
+        Drop all cached query results so the next searches go to PubMed
+
+        Args:
+            articles: Also delete all stored articles and the full-text index
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM queries")
+            if articles:
+                conn.execute("DELETE FROM articles")
+                conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+
+    def _connect(self):
+        """Short-lived connection (safe to use from worker threads)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        return _ClosingConnection(conn)
+
+    @staticmethod
+    def _query_key(query, params):
+        text = json.dumps([query, params or {}], sort_keys=True, default=str)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _row_to_article(row):
+        pmid, title, abstract, authors, journal, publication_date = row
+        return {
+            'pmid': pmid,
+            'title': title or '',
+            'abstract': abstract or '',
+            'authors': json.loads(authors) if authors else [],
+            'journal': journal or '',
+            'publication_date': date.fromisoformat(publication_date) if publication_date else None
+        }
+
+
+class _ClosingConnection:
+    """Connection context that commits on success and always closes"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+        return False
+
+
+def _date_text(value):
+    """ISO date text for date/datetime/str values"""
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()[:10]
+    return str(value)[:10]
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Randomized PCA Engine for Prairie Genomics Suite
+
+Sample PCA on the top-variable genes by randomized truncated SVD (Halko,
+Martinsson & Tropp range finder with power iterations). Centering and
+scaling are applied implicitly: the standardized matrix A = (X - 1 mu') D^-1
+is never formed, every product with A is rewritten as products with X plus
+rank-one corrections, so only the selected expression layer is held.
+
+Fitted models (loadings, means, scales, explained variance) are cached per
+(feature set, n_components, scaling, training data). When samples are
+added to a dataset whose previously fitted samples are unchanged, the new
+samples are projected onto the existing axes instead of refitting.
+
+Author: Prairie Genomics Team
+"""
+
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+class RandomizedPCA:
+    """
+    Implicitly standardized randomized PCA with model caching and projection
+    """
+
+    def __init__(self, n_oversamples=10, n_power_iter=4, seed=42, max_cache_entries=16):
+        """
+        Initialize the PCA engine
+
+        Args:
+            n_oversamples: Extra random directions beyond n_components
+            n_power_iter: Power iterations (sharpen slowly decaying spectra)
+            seed: Seed for the random test matrix
+            max_cache_entries: Fitted models kept (least recently used evicted)
+        """
+        self.n_oversamples = n_oversamples
+        self.n_power_iter = n_power_iter
+        self.seed = seed
+        self.max_cache_entries = max_cache_entries
+        self._cache = OrderedDict()
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def fit_transform(self, expression_data, n_components=5, n_features=2000, scale=True,
+                      features=None, reuse=True):
+        """
+        Fit (or reuse) a PCA model and return sample scores
+
+        Args:
+            expression_data: Genes x samples DataFrame
+            n_components: Number of principal components
+            n_features: Number of top-variance genes used (ignored when features given)
+            scale: Scale genes to unit variance (implicitly)
+            features: Explicit gene list to use
+            reuse: Project samples added since the last fit with the same
+                settings instead of refitting, if the fitted samples are unchanged
+
+        Returns:
+            Tuple (model, scores) where scores is a samples x PCs DataFrame with
+            a boolean 'projected' column marking samples that were not fitted
+        """
+        settings = (n_features if features is None else _digest_labels(features), n_components, scale)
+
+        if reuse:
+            with self._lock:
+                previous = self._latest.get(settings)
+            if previous is not None and self._still_valid(previous, expression_data):
+                new_samples = expression_data.columns.difference(previous['samples'], sort=False)
+                scores = previous['scores']
+                if len(new_samples) > 0:
+                    projected = self.project(previous, expression_data[new_samples])
+                    scores = pd.concat([scores, projected.assign(projected=True)])
+                return previous, scores.reindex(expression_data.columns)
+
+        if features is None:
+            variances = expression_data.var(axis=1)
+            features = variances.nlargest(min(n_features, len(variances))).index
+        model = self.fit(expression_data.loc[features], n_components, scale)
+
+        with self._lock:
+            self._latest[settings] = model
+        return model, model['scores']
+
+    def fit(self, layer, n_components=5, scale=True):
+        """
+        Fit PCA on a genes x samples layer (cached by content)
+
+        Returns:
+            Model dict with 'components' (PCs x genes), 'mean', 'scale',
+            'explained_variance', 'explained_variance_ratio', 'features',
+            'samples', 'digest' and 'scores' (samples x PCs, 'projected' False)
+        """
+        digest = _digest_frame(layer)
+        key = (digest, n_components, scale)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        X = np.ascontiguousarray(layer.values.T, dtype=np.float64)
+        n_samples, n_genes = X.shape
+        n_components = min(n_components, n_samples, n_genes)
+
+        mean = X.mean(axis=0)
+        std = X.std(axis=0) if scale else np.ones(n_genes)
+        std = np.where(std > 0, std, 1.0)
+        inv_std = 1.0 / std
+
+        # A = (X - 1 mean') diag(inv_std), applied implicitly
+        def a_dot(M):
+            MS = M * inv_std[:, None]
+            return X @ MS - np.outer(np.ones(n_samples), mean @ MS)
+
+        def at_dot(M):
+            return (X.T @ M - np.outer(mean, M.sum(axis=0))) * inv_std[:, None]
+
+        rng = np.random.default_rng(self.seed)
+        n_random = min(n_components + self.n_oversamples, n_samples, n_genes)
+        Q, _ = np.linalg.qr(a_dot(rng.standard_normal((n_genes, n_random))))
+        for _ in range(self.n_power_iter):
+            Q, _ = np.linalg.qr(at_dot(Q))
+            Q, _ = np.linalg.qr(a_dot(Q))
+
+        B = at_dot(Q).T
+        U_small, S, Vt = np.linalg.svd(B, full_matrices=False)
+        U = Q @ U_small[:, :n_components]
+        S, Vt = S[:n_components], Vt[:n_components]
+
+        # Deterministic signs: largest loading of each component positive
+        signs = np.sign(Vt[np.arange(n_components), np.abs(Vt).argmax(axis=1)])
+        signs[signs == 0] = 1
+        U, Vt = U * signs, Vt * signs[:, None]
+
+        explained_variance = S ** 2 / max(n_samples - 1, 1)
+        total_variance = ((X.var(axis=0, ddof=1) if n_samples > 1 else np.zeros(n_genes)) * inv_std ** 2).sum()
+        columns = [f'PC{i + 1}' for i in range(n_components)]
+
+        model = {
+            'components': pd.DataFrame(Vt, index=columns, columns=layer.index),
+            'mean': mean,
+            'scale': std,
+            'explained_variance': explained_variance,
+            'explained_variance_ratio': explained_variance / total_variance if total_variance > 0
+            else np.zeros(n_components),
+            'features': layer.index,
+            'samples': layer.columns,
+            'digest': digest,
+            'scores': pd.DataFrame(U * S, index=layer.columns, columns=columns).assign(projected=False)
+        }
+
+        with self._lock:
+            self._cache[key] = model
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+        return model
+
+    @staticmethod
+    def project(model, expression_data):
+        """
+        Project samples onto a fitted model's components
+
+        Args:
+            model: Model from fit()
+            expression_data: Genes x samples DataFrame (genes missing from it
+                are treated as being at the training mean)
+
+        Returns:
+            Samples x PCs DataFrame
+        """
+        aligned = expression_data.reindex(model['features'])
+        values = aligned.values.T.astype(np.float64)
+        values = np.where(np.isfinite(values), values, model['mean'])
+        standardized = (values - model['mean']) / model['scale']
+        scores = standardized @ model['components'].values.T
+        return pd.DataFrame(scores, index=expression_data.columns, columns=model['components'].index)
+
+    def clear_cache(self):
+        """Drop all cached models"""
+        with self._lock:
+            self._cache.clear()
+            self._latest.clear()
+
+    @staticmethod
+    def _still_valid(model, expression_data):
+        """The model's features and samples exist and their values are unchanged"""
+        if not (model['samples'].isin(expression_data.columns).all()
+                and model['features'].isin(expression_data.index).all()):
+            return False
+        layer = expression_data.loc[model['features'], model['samples']]
+        return _digest_frame(layer) == model['digest']
+
+
+def _digest_labels(labels):
+    return hashlib.sha1("\n".join(map(str, labels)).encode('utf-8')).hexdigest()
+
+
+def _digest_frame(frame):
+    """Digest of a DataFrame's labels and values"""
+    digest = hashlib.sha1()
+    digest.update(_digest_labels(frame.index).encode('utf-8'))
+    digest.update(_digest_labels(frame.columns).encode('utf-8'))
+    digest.update(np.ascontiguousarray(frame.values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
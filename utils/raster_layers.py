@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Rasterized Data Layers for Vector Exports in Prairie Genomics Suite
+
+A 60,000-point volcano plot or a large heatmap written as PDF/EPS/SVG
+stores every marker or cell as its own vector path, giving files of tens
+of megabytes that take seconds to minutes to write and to open. Journals
+accept (and recommend) figures whose dense data layers are embedded as a
+raster image at print resolution while axes, tick labels, legends and
+annotations stay vector.
+
+- Matplotlib: artists above a point or cell threshold (scatter collections,
+  long lines and pcolormesh/seaborn heatmap meshes) are marked rasterized when a figure is
+  saved in a vector format, and the raster resolution is set to the
+  configured DPI. DenseLayerRasterizer applies this to every save made
+  inside it, so exporters need no changes.
+- Plotly: dense scatter traces are rendered to a PNG at the configured DPI
+  and embedded as a layout image over their subplot, so the page keeps its
+  laid-out size (heatmaps are already images).
+
+Author: Prairie Genomics Team
+"""
+
+import numpy as np
+import warnings
+
+warnings.filterwarnings('ignore')
+
+VECTOR_FORMATS = {'pdf', 'eps', 'ps', 'svg', 'svgz'}
+
+
+def rasterize_dense_artists(fig, point_threshold=5000, cell_threshold=20000):
+    """
+    Mark dense data artists of a matplotlib figure as rasterized
+
+    Args:
+        fig: Matplotlib figure
+        point_threshold: Scatter points / line vertices / paths above which
+            an artist is rasterized
+        cell_threshold: Mesh or image cells above which an artist is rasterized
+
+    Returns:
+        Number of artists marked
+    """
+    from matplotlib.collections import Collection, QuadMesh
+    from matplotlib.lines import Line2D
+
+    marked = 0
+    for ax in fig.get_axes():
+        for artist in ax.get_children():
+            if artist.get_rasterized():
+                continue
+            # Images (imshow) are embedded as bitmaps already
+            if isinstance(artist, QuadMesh):
+                array = artist.get_array()
+                dense = array is not None and np.size(array) > cell_threshold
+            elif isinstance(artist, Collection):
+                offsets = artist.get_offsets()
+                dense = max(len(offsets), len(artist.get_paths())) > point_threshold
+            elif isinstance(artist, Line2D):
+                dense = len(artist.get_xdata()) > point_threshold
+            else:
+                dense = False
+
+            if dense:
+                artist.set_rasterized(True)
+                marked += 1
+    return marked
+
+
+class DenseLayerRasterizer:
+    """
+    Context manager rasterizing dense layers in every vector-format savefig
+    """
+
+    def __init__(self, dpi=300, point_threshold=5000, cell_threshold=20000, enabled=True):
+        """
+        Args:
+            dpi: Resolution of the rasterized layers
+            point_threshold: See rasterize_dense_artists
+            cell_threshold: See rasterize_dense_artists
+            enabled: When False the context manager does nothing
+        """
+        self.dpi = dpi
+        self.point_threshold = point_threshold
+        self.cell_threshold = cell_threshold
+        self.enabled = enabled
+        self.n_rasterized = 0
+        self._original_savefig = None
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+
+        from matplotlib.figure import Figure
+        self._original_savefig = Figure.savefig
+        rasterizer = self
+
+        def savefig(fig, fname, *args, **kwargs):
+            if _save_format(fname, kwargs) in VECTOR_FORMATS:
+                rasterizer.n_rasterized += rasterize_dense_artists(
+                    fig, rasterizer.point_threshold, rasterizer.cell_threshold
+                )
+                kwargs['dpi'] = rasterizer.dpi
+            return rasterizer._original_savefig(fig, fname, *args, **kwargs)
+
+        Figure.savefig = savefig
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._original_savefig is not None:
+            from matplotlib.figure import Figure
+            Figure.savefig = self._original_savefig
+            self._original_savefig = None
+        return False
+
+
+def rasterize_dense_traces(fig, point_threshold=5000, dpi=300):
+    """
+    Plotly figure with dense scatter traces replaced by PNG layout images
+    rendered at the given resolution (kaleido required); the page size and
+    every other element are unchanged, and the input figure is not modified
+
+    The dense traces of each subplot are drawn on their own transparent
+    figure with the subplot's resolved axis ranges and pixel size, rendered
+    at scale dpi / 96 (plotly lays out in CSS pixels, 96 per inch) and
+    stretched over the subplot's plot area. Their legend entries are kept.
+
+    Returns:
+        Tuple (figure, number of traces rasterized)
+    """
+    import base64
+    import plotly.graph_objects as go
+
+    dense = [i for i, trace in enumerate(fig.data)
+             if trace.type in ('scatter', 'scattergl') and trace.x is not None and len(trace.x) > point_threshold]
+    if not dense:
+        return fig, 0
+
+    # Resolved axis ranges, domains, size and margins as plotly.js lays them out
+    full = fig.full_figure_for_development(warn=False).layout
+    plot_width = full.width - full.margin.l - full.margin.r
+    plot_height = full.height - full.margin.t - full.margin.b
+
+    subplots = {}
+    for i in dense:
+        trace = fig.data[i]
+        subplots.setdefault((trace.xaxis or 'x', trace.yaxis or 'y'), []).append(trace)
+
+    out = go.Figure(fig)
+    out.data = [trace for i, trace in enumerate(out.data) if i not in dense]
+    for (x_ref, y_ref), traces in subplots.items():
+        x_axis, y_axis = full[_axis_name(x_ref)], full[_axis_name(y_ref)]
+        layer = go.Figure([go.Figure(trace).data[0].update(xaxis='x', yaxis='y', showlegend=False)
+                           for trace in traces])
+        layer.update_layout(
+            width=max(1, round(plot_width * (x_axis.domain[1] - x_axis.domain[0]))),
+            height=max(1, round(plot_height * (y_axis.domain[1] - y_axis.domain[0]))),
+            margin=dict(l=0, r=0, t=0, b=0, pad=0),
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            xaxis=dict(type=x_axis.type, range=x_axis.range, visible=False),
+            yaxis=dict(type=y_axis.type, range=y_axis.range, visible=False),
+            showlegend=False
+        )
+        png = layer.to_image(format='png', scale=dpi / 96)
+        out.add_layout_image(
+            source="data:image/png;base64," + base64.b64encode(png).decode('ascii'),
+            xref=f"{x_ref} domain", yref=f"{y_ref} domain", x=0, y=1, sizex=1, sizey=1,
+            xanchor='left', yanchor='top', sizing='stretch', layer='below'
+        )
+
+        # Legend entries stay, drawn from an empty copy of each trace
+        for trace in traces:
+            if trace.showlegend is not False:
+                out.add_trace(go.Figure(trace).data[0].update(
+                    x=[None], y=[None], customdata=None, text=None, hovertext=None
+                ))
+
+    # Fixed ranges, so the other traces line up with the images
+    for name in {_axis_name(ref) for refs in subplots for ref in refs}:
+        out.layout[name].update(range=full[name].range, autorange=False)
+    return out, len(dense)
+
+
+def _axis_name(ref):
+    """Layout key of a trace axis reference ('x2' -> 'xaxis2')"""
+    return f"{ref[0]}axis{ref[1:]}"
+
+
+def _save_format(fname, kwargs):
+    """Output format of a savefig call (explicit format, else file extension)"""
+    file_format = kwargs.get('format')
+    if file_format is None:
+        name = fname.__fspath__() if hasattr(fname, '__fspath__') else fname
+        if isinstance(name, str) and '.' in name:
+            file_format = name.rsplit('.', 1)[-1]
+        else:
+            from matplotlib import rcParams
+            file_format = rcParams['savefig.format']
+    return str(file_format).lower()
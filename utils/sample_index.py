@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Sample Similarity Index for Prairie Genomics Suite
+
+Approximate k-nearest-neighbour graph over samples in PCA space, for
+"which samples are most similar to this one?" queries and graph-based 2D
+embeddings. Construction follows the usual two-stage recipe:
+
+1. A forest of random-projection trees (each node split by the hyperplane
+   halfway between two random points) groups nearby samples into small
+   leaves; all pairs within a leaf seed the neighbour lists.
+2. NN-descent refines the graph: a neighbour of a neighbour is likely a
+   neighbour, so each round scores those candidates and keeps the best,
+   until few lists change.
+
+Every stage is vectorized over all samples (tree levels, padded leaf
+blocks, chunked candidate scoring), so building scales near-linearly and
+100k samples index in seconds. Queries descend each tree to a leaf, expand
+the leaf members through the graph and rank the candidates exactly, which
+takes milliseconds.
+
+The embedding is a UMAP-style force layout of the kNN graph: edges pull
+their endpoints together, random negative samples push apart, started from
+the first two principal components.
+
+Author: Prairie Genomics Team
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+class SampleSimilarityIndex:
+    """
+    Random-projection forest + NN-descent kNN graph with queries and embedding
+    """
+
+    def __init__(self, n_neighbors=15, n_trees=8, leaf_size=48, max_descent_iter=6,
+                 chunk_size=4096, seed=42):
+        """
+        Initialize the index
+
+        Args:
+            n_neighbors: Neighbours kept per sample in the graph
+            n_trees: Random-projection trees (more trees, better seed graph)
+            leaf_size: Maximum samples per tree leaf
+            max_descent_iter: Maximum NN-descent refinement rounds
+            chunk_size: Samples scored per block during NN-descent
+            seed: Random seed (trees, descent sampling and embedding)
+        """
+        self.n_neighbors = n_neighbors
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+        self.max_descent_iter = max_descent_iter
+        self.chunk_size = chunk_size
+        self.seed = seed
+
+        self.digest = None
+        self.samples = None
+        self.coordinates = None
+        self.indices = None
+        self.distances = None
+        self.trees = []
+        self._embedding = None
+
+    def fit(self, coordinates, progress_callback=None):
+        """
+        Build the index for a samples x dimensions matrix (e.g. PCA scores);
+        no-op when the coordinates and settings are unchanged since the last build
+
+        Args:
+            coordinates: Samples x dimensions DataFrame
+            progress_callback: Optional function(message, pct)
+
+        Returns:
+            self
+        """
+        digest = _digest_frame(coordinates, f"{self.n_neighbors}|{self.n_trees}|{self.leaf_size}|{self.seed}")
+        if digest == self.digest:
+            return self
+
+        X = np.ascontiguousarray(coordinates.values, dtype=np.float32)
+        X = np.where(np.isfinite(X), X, 0)
+        n_samples = len(X)
+        k = min(self.n_neighbors, n_samples - 1)
+        if k < 1:
+            raise ValueError("At least two samples are needed to build a similarity index")
+
+        rng = np.random.default_rng(self.seed)
+        indices = np.full((n_samples, k), -1, dtype=np.int64)
+        distances = np.full((n_samples, k), np.inf, dtype=np.float32)
+
+        self.trees = []
+        for t in range(self.n_trees):
+            tree = _build_tree(X, self.leaf_size, rng)
+            self.trees.append(tree)
+            cand_idx, cand_dist = _leaf_candidates(X, tree['leaf_of'])
+            indices, distances, _ = _merge(indices, distances, cand_idx, cand_dist, k)
+            if progress_callback:
+                progress_callback(f"Random-projection tree {t + 1}/{self.n_trees}",
+                                  int(40 * (t + 1) / self.n_trees))
+
+        for iteration in range(self.max_descent_iter):
+            indices, distances, n_updates = self._descend(X, indices, distances, k, rng)
+            if progress_callback:
+                progress_callback(f"NN-descent round {iteration + 1}: {n_updates:,} updates",
+                                  40 + int(60 * (iteration + 1) / self.max_descent_iter))
+            if n_updates < 0.001 * n_samples:
+                break
+
+        self.digest = digest
+        self.samples = coordinates.index
+        self.coordinates = X
+        self.indices = indices
+        self.distances = np.sqrt(distances)
+        self._embedding = None
+        return self
+
+    def query(self, vectors, k=10, n_expand=None):
+        """
+        Approximate nearest indexed samples for query points
+
+        Args:
+            vectors: Query array (n_queries x dimensions, or one vector)
+            k: Neighbours returned per query
+            n_expand: Leaf members expanded through the graph (default: all)
+
+        Returns:
+            Tuple (indices, distances), each n_queries x k (sorted by distance)
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        k = min(k, len(self.coordinates))
+        result_idx = np.empty((len(vectors), k), dtype=np.int64)
+        result_dist = np.empty((len(vectors), k), dtype=np.float32)
+
+        for q, vector in enumerate(vectors):
+            leaf_members = np.unique(np.concatenate([_descend_tree(tree, vector) for tree in self.trees]))
+            if n_expand is not None:
+                leaf_members = leaf_members[:n_expand]
+            candidates = np.unique(np.concatenate([leaf_members, self.indices[leaf_members].ravel()]))
+            candidates = candidates[candidates >= 0]
+            dist = ((self.coordinates[candidates] - vector) ** 2).sum(axis=1)
+            order = np.argsort(dist)[:k]
+            result_idx[q] = candidates[order]
+            result_dist[q] = np.sqrt(dist[order])
+        return result_idx, result_dist
+
+    def similar_samples(self, sample, k=10):
+        """
+        Samples most similar to an indexed sample
+
+        Returns:
+            DataFrame with 'rank', 'sample' and 'distance' columns
+        """
+        position = self.samples.get_loc(sample)
+        idx, dist = self.query(self.coordinates[position], k + 1)
+        keep = idx[0] != position
+        idx, dist = idx[0][keep][:k], dist[0][keep][:k]
+        return pd.DataFrame({
+            'rank': np.arange(1, len(idx) + 1),
+            'sample': self.samples[idx],
+            'distance': dist
+        })
+
+    @property
+    def has_embedding(self):
+        """An embedding of the current graph has been computed"""
+        return self._embedding is not None
+
+    def embedding(self, n_epochs=None, negative_rate=3, learning_rate=1.0, progress_callback=None):
+        """
+        2D force layout of the kNN graph (cached until the index is rebuilt)
+
+        Args:
+            n_epochs: Optimization epochs (default 500 for small, 200 for large graphs)
+            negative_rate: Repulsive samples per edge per epoch
+            learning_rate: Initial step size (decays linearly to zero)
+            progress_callback: Optional function(message, pct)
+
+        Returns:
+            Samples x ['Embedding 1', 'Embedding 2'] DataFrame
+        """
+        if self._embedding is not None:
+            return self._embedding
+
+        n_samples, k = self.indices.shape
+        n_epochs = n_epochs or (500 if n_samples <= 10000 else 200)
+        rng = np.random.default_rng(self.seed)
+
+        # Edge weights: Gaussian in distance scaled by each sample's neighbour radius,
+        # symmetrized by probabilistic union
+        rho = self.distances[:, 0]
+        sigma = np.maximum(self.distances.mean(axis=1) - rho, 1e-3)
+        weights = np.exp(-(self.distances - rho[:, None]) / sigma[:, None]).ravel()
+        heads = np.repeat(np.arange(n_samples), k)
+        tails = self.indices.ravel()
+        valid = tails >= 0
+        heads, tails, weights = heads[valid], tails[valid], weights[valid]
+
+        # 1 - prod(1 - w) over both directions of an edge, via a sum of logs
+        edges, inverse = np.unique(np.minimum(heads, tails) * n_samples + np.maximum(heads, tails),
+                                   return_inverse=True)
+        log_keep = np.bincount(inverse, weights=np.log1p(-np.minimum(weights, 1 - 1e-6)), minlength=len(edges))
+        heads, tails, weights = edges // n_samples, edges % n_samples, -np.expm1(log_keep)
+        # Edges are sampled in proportion to weight: strong edges every epoch
+        epochs_per_sample = weights.max() / np.maximum(weights, 1e-6)
+
+        # Start from the first two coordinates (principal components), rescaled
+        Y = self.coordinates[:, :2].astype(np.float64)
+        if Y.shape[1] < 2:
+            Y = np.column_stack([Y[:, 0], rng.standard_normal(n_samples)])
+        Y = 10 * (Y - Y.mean(axis=0)) / np.maximum(np.abs(Y).max(axis=0), 1e-12)
+        Y += rng.normal(scale=1e-4, size=Y.shape)
+
+        next_epoch = epochs_per_sample.copy()
+        for epoch in range(n_epochs):
+            alpha = learning_rate * (1 - epoch / n_epochs)
+            active = np.flatnonzero(next_epoch <= epoch + 1)
+            next_epoch[active] += epochs_per_sample[active]
+            a, b = heads[active], tails[active]
+
+            # Attraction along edges (low-dimensional kernel 1 / (1 + d^2))
+            delta = Y[a] - Y[b]
+            d2 = (delta ** 2).sum(axis=1, keepdims=True)
+            grad = np.clip(-2 * delta / (1 + d2), -4, 4) * alpha
+            update = _scatter_add(a, grad, n_samples) - _scatter_add(b, grad, n_samples)
+
+            # Repulsion from random samples
+            a_neg = np.repeat(a, negative_rate)
+            b_neg = rng.integers(0, n_samples, len(a_neg))
+            delta = Y[a_neg] - Y[b_neg]
+            d2 = (delta ** 2).sum(axis=1, keepdims=True)
+            grad = np.clip(2 * delta / ((0.001 + d2) * (1 + d2)), -4, 4) * alpha
+            grad[b_neg == a_neg] = 0
+            update += _scatter_add(a_neg, grad, n_samples)
+
+            Y += update
+            if progress_callback and (epoch + 1) % 25 == 0:
+                progress_callback(f"Embedding epoch {epoch + 1}/{n_epochs}", int(100 * (epoch + 1) / n_epochs))
+
+        self._embedding = pd.DataFrame(Y, index=self.samples, columns=['Embedding 1', 'Embedding 2'])
+        return self._embedding
+
+    def _descend(self, X, indices, distances, k, rng):
+        """One NN-descent round: score neighbours of neighbours (and reverse neighbours)"""
+        n_samples = len(X)
+        n_sampled = min(k, max(4, k // 3))
+
+        # A fresh random subset of each list per round, so rounds explore different pairs
+        columns = np.argsort(rng.random(indices.shape), axis=1)[:, :n_sampled]
+        forward = np.take_along_axis(indices, columns, axis=1)
+
+        # Reverse neighbours: a random sample of the samples that list each sample
+        reverse = np.full((n_samples, n_sampled), -1, dtype=np.int64)
+        sources = np.repeat(np.arange(n_samples), k)
+        targets = indices.ravel()
+        valid = targets >= 0
+        sources, targets = sources[valid], targets[valid]
+        order = np.lexsort((rng.random(len(targets)), targets))
+        sources, targets = sources[order], targets[order]
+        starts = np.searchsorted(targets, np.arange(n_samples))
+        rank = np.arange(len(targets)) - starts[targets]
+        keep = rank < n_sampled
+        reverse[targets[keep], rank[keep]] = sources[keep]
+
+        squared_norms = np.einsum('ij,ij->i', X, X)
+        n_updates = 0
+        for start in range(0, n_samples, self.chunk_size):
+            stop = min(start + self.chunk_size, n_samples)
+            rows = np.arange(start, stop)
+            neighbourhood = np.concatenate([forward[start:stop], reverse[start:stop]], axis=1)
+            safe = np.maximum(neighbourhood, 0)
+            missing = np.repeat(neighbourhood < 0, n_sampled, axis=1)
+            candidates = np.concatenate([
+                np.where(missing, -1, forward[safe].reshape(len(rows), -1)),
+                np.where(missing, -1, reverse[safe].reshape(len(rows), -1)),
+                reverse[start:stop]
+            ], axis=1)
+
+            cand_dist = (squared_norms[rows, None] + squared_norms[np.maximum(candidates, 0)]
+                         - 2 * np.einsum('ik,ijk->ij', X[start:stop], X[np.maximum(candidates, 0)]))
+            cand_dist = np.maximum(cand_dist, 0)
+            cand_dist[(candidates < 0) | (candidates == rows[:, None])] = np.inf
+
+            # Only candidates closer than the current k-th neighbour can enter a list
+            improving = cand_dist < distances[start:stop, -1:]
+            changed_rows = np.flatnonzero(improving.any(axis=1))
+            if len(changed_rows) == 0:
+                continue
+            cand_idx, cand_dist = candidates[changed_rows], cand_dist[changed_rows]
+            width = min(2 * k, cand_dist.shape[1])
+            best = np.argpartition(cand_dist, width - 1, axis=1)[:, :width]
+
+            target = start + changed_rows
+            indices[target], distances[target], changed = _merge(
+                indices[target], distances[target],
+                np.take_along_axis(cand_idx, best, axis=1), np.take_along_axis(cand_dist, best, axis=1), k
+            )
+            n_updates += changed
+        return indices, distances, n_updates
+
+
+def _build_tree(X, leaf_size, rng):
+    """
+    Random-projection tree built one level at a time over all samples
+
+    Returns:
+        Dict with per-node 'normal', 'offset', 'left', 'right' (-1 for
+        leaves) and 'leaf_of' (leaf node of each sample)
+    """
+    n_samples, n_dims = X.shape
+    node_of = np.zeros(n_samples, dtype=np.int64)
+    normals, offsets, lefts, rights = [np.zeros(n_dims, dtype=np.float32)], [0.0], [-1], [-1]
+    frontier = np.array([0])
+
+    while len(frontier) > 0:
+        counts = np.bincount(node_of, minlength=len(lefts))
+        split = frontier[counts[frontier] > leaf_size]
+        if len(split) == 0:
+            break
+
+        # Two random members of each node to split (members grouped by node)
+        in_split = np.isin(node_of, split)
+        members = np.flatnonzero(in_split)
+        members = members[np.argsort(node_of[members], kind='stable')]
+        starts = np.searchsorted(node_of[members], split)
+        sizes = counts[split]
+        first_offset = rng.integers(0, sizes)
+        first = members[starts + first_offset]
+        second = members[starts + (first_offset + rng.integers(1, sizes)) % sizes]
+
+        normal = X[first] - X[second]
+        offset = -(normal * (X[first] + X[second]) / 2).sum(axis=1)
+
+        slot = np.full(len(lefts), -1, dtype=np.int64)
+        slot[split] = np.arange(len(split))
+        s = slot[node_of[members]]
+        side = (X[members] * normal[s]).sum(axis=1) + offset[s] > 0
+
+        # Degenerate splits (e.g. duplicated samples) fall back to a random halving
+        n_right = np.bincount(s, weights=side, minlength=len(split))
+        degenerate = (n_right == 0) | (n_right == sizes)
+        if degenerate.any():
+            redo = degenerate[s]
+            side[redo] = rng.random(redo.sum()) < 0.5
+
+        first_child = len(lefts)
+        child_left = first_child + 2 * np.arange(len(split))
+        for node, left, n, o in zip(split, child_left, normal, offset):
+            normals[node], offsets[node], lefts[node], rights[node] = n, o, left, left + 1
+        normals.extend([np.zeros(n_dims, dtype=np.float32)] * (2 * len(split)))
+        offsets.extend([0.0] * (2 * len(split)))
+        lefts.extend([-1] * (2 * len(split)))
+        rights.extend([-1] * (2 * len(split)))
+
+        node_of[members] = child_left[s] + side
+        frontier = np.arange(first_child, len(lefts))
+
+    return {
+        'normal': np.array(normals, dtype=np.float32),
+        'offset': np.array(offsets, dtype=np.float32),
+        'left': np.array(lefts),
+        'right': np.array(rights),
+        'leaf_of': node_of,
+        'members': pd.Series(np.arange(n_samples)).groupby(node_of).apply(np.asarray).to_dict()
+    }
+
+
+def _descend_tree(tree, vector):
+    """Members of the leaf a query vector falls into"""
+    node = 0
+    while tree['left'][node] >= 0:
+        go_right = float(tree['normal'][node] @ vector) + tree['offset'][node] > 0
+        node = tree['right'][node] if go_right else tree['left'][node]
+    return tree['members'].get(node, np.empty(0, dtype=np.int64))
+
+
+def _leaf_candidates(X, leaf_of):
+    """All-pairs squared distances within each leaf, as per-sample candidate lists"""
+    order = np.argsort(leaf_of, kind='stable')
+    leaves, starts, sizes = np.unique(leaf_of[order], return_index=True, return_counts=True)
+    width = sizes.max()
+
+    # Padded leaf blocks: n_leaves x width sample positions (-1 = padding)
+    position = np.arange(len(order)) - np.repeat(starts, sizes)
+    block_of = np.repeat(np.arange(len(leaves)), sizes)
+    blocks = np.full((len(leaves), width), -1, dtype=np.int64)
+    blocks[block_of, position] = order
+
+    points = X[np.maximum(blocks, 0)]
+    norms = np.einsum('ijk,ijk->ij', points, points)
+    dist = norms[:, :, None] + norms[:, None, :] - 2 * np.einsum('ijk,ilk->ijl', points, points)
+    dist = np.maximum(dist, 0)
+    dist[np.broadcast_to(blocks[:, None, :] < 0, dist.shape)] = np.inf
+    dist[:, np.arange(width), np.arange(width)] = np.inf
+
+    cand_idx = np.empty((len(X), width), dtype=np.int64)
+    cand_dist = np.empty((len(X), width), dtype=np.float32)
+    cand_idx[order] = blocks[block_of]
+    cand_dist[order] = dist[block_of, position]
+    return cand_idx, cand_dist
+
+
+def _merge(indices, distances, cand_idx, cand_dist, k):
+    """
+    Merge candidate lists into current kNN lists (duplicates removed)
+
+    Returns:
+        Tuple (indices, distances, number of samples whose list changed)
+    """
+    all_idx = np.concatenate([indices, cand_idx], axis=1)
+    all_dist = np.concatenate([distances, cand_dist.astype(np.float32)], axis=1)
+    all_dist[all_idx < 0] = np.inf
+
+    # Remove duplicate candidates: sort each row by index, blank repeats
+    order = np.argsort(all_idx, axis=1, kind='stable')
+    sorted_idx = np.take_along_axis(all_idx, order, axis=1)
+    sorted_dist = np.take_along_axis(all_dist, order, axis=1)
+    duplicate = np.zeros_like(sorted_idx, dtype=bool)
+    duplicate[:, 1:] = sorted_idx[:, 1:] == sorted_idx[:, :-1]
+    sorted_dist[duplicate] = np.inf
+
+    best = np.argsort(sorted_dist, axis=1, kind='stable')[:, :k]
+    new_idx = np.take_along_axis(sorted_idx, best, axis=1)
+    new_dist = np.take_along_axis(sorted_dist, best, axis=1)
+    new_idx[~np.isfinite(new_dist)] = -1
+
+    changed = int((np.sort(new_idx, axis=1) != np.sort(indices, axis=1)).any(axis=1).sum())
+    return new_idx, new_dist, changed
+
+
+def _scatter_add(index, values, n_rows):
+    """Row sums of values grouped by index (n_rows x columns)"""
+    return np.column_stack([np.bincount(index, weights=values[:, j], minlength=n_rows)
+                            for j in range(values.shape[1])])
+
+
+def _digest_frame(frame, settings=""):
+    digest = hashlib.sha1(settings.encode('utf-8'))
+    digest.update("\n".join(map(str, frame.index)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(frame.values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
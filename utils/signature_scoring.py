@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Gene Signature Scoring for Prairie Genomics Suite
+
+Scores every sample against a DE-derived gene signature (top-N up, down or
+both directions) using mean z-score, up-minus-down or rank-based singscore.
+The per-sample z-score and rank matrices are computed once per expression
+matrix, and cumulative sums along the DE ranking are cached per signature
+definition, so changing the number of signature genes is a row lookup
+rather than a rescan of the expression matrix.
+
+Author: Prairie Genomics Team
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+class SignatureScorer:
+    """
+    Vectorized per-sample scoring of DE gene signatures
+    """
+
+    METHODS = ["mean_z", "up_minus_down", "singscore"]
+    DIRECTIONS = ["Up-regulated", "Down-regulated", "Both"]
+
+    def __init__(self, max_signature_size=500, p_threshold=0.05):
+        """
+        Initialize the scorer
+
+        Args:
+            max_signature_size: Largest number of genes per direction kept in the cache
+            p_threshold: Adjusted p-value threshold for signature candidates
+        """
+        self.max_signature_size = max_signature_size
+        self.p_threshold = p_threshold
+
+        self._expression_ref = None
+        self._de_ref = None
+        self._log_expression = None
+        self._z_scores = None
+        self._ranks = None
+        self._profiles = {}
+        self._score_cache = {}
+
+    def clear_cache(self):
+        """Drop all cached matrices and scores"""
+        self._expression_ref = None
+        self._de_ref = None
+        self._log_expression = None
+        self._z_scores = None
+        self._ranks = None
+        self._profiles.clear()
+        self._score_cache.clear()
+
+    def score_samples(self, expression_data, de_results, n_genes=20,
+                      direction="Both", method="mean_z"):
+        """
+        Score each sample against the top DE genes
+
+        Args:
+            expression_data: Genes x samples expression DataFrame (raw or normalized)
+            de_results: DE results with 'log2FoldChange' and 'padj' columns
+            n_genes: Number of top genes per direction
+            direction: "Up-regulated", "Down-regulated" or "Both"
+            method: "mean_z", "up_minus_down" or "singscore"
+
+        Returns:
+            Series of signature scores indexed by sample (higher = closer to
+            the up-regulated side of the DE contrast)
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown scoring method: {method}")
+        if direction not in self.DIRECTIONS:
+            raise ValueError(f"Unknown signature direction: {direction}")
+
+        self._sync(expression_data, de_results)
+
+        key = (int(n_genes), direction, method)
+        if key in self._score_cache:
+            return self._score_cache[key]
+
+        matrix = "rank" if method == "singscore" else "z"
+        parts = {}
+        for side in self._sides(direction):
+            cumulative, n_available = self._profile(side, matrix)
+            n = min(int(n_genes), n_available)
+            if n == 0:
+                continue
+            parts[side] = (cumulative[n - 1], n)
+
+        if not parts:
+            raise ValueError("No significant DE genes available for the selected signature")
+
+        if method == "singscore":
+            scores = self._singscore(parts)
+        elif method == "up_minus_down":
+            scores = sum(
+                (1 if side == "up" else -1) * total / n for side, (total, n) in parts.items()
+            )
+        else:
+            # Mean of sign-adjusted z-scores across all signature genes
+            signed_total = sum(
+                (1 if side == "up" else -1) * total for side, (total, n) in parts.items()
+            )
+            scores = signed_total / sum(n for _, n in parts.values())
+
+        result = pd.Series(scores, index=self._expression_ref.columns, name="signature_score")
+        self._score_cache[key] = result
+        return result
+
+    def get_signature_genes(self, de_results, n_genes=20, direction="Both"):
+        """Return the gene IDs of the signature as a dict of up/down lists"""
+        ranked = self._rank_de_genes(de_results)
+        return {side: ranked[side][:int(n_genes)] for side in self._sides(direction)}
+
+    def _sync(self, expression_data, de_results):
+        """Invalidate caches when the expression matrix or DE results change"""
+        if expression_data is not self._expression_ref:
+            self.clear_cache()
+            self._expression_ref = expression_data
+            self._log_expression = np.log2(
+                np.clip(expression_data.values.astype(float), 0, None) + 1
+            )
+
+        if de_results is not self._de_ref:
+            self._de_ref = de_results
+            self._profiles.clear()
+            self._score_cache.clear()
+
+    def z_matrix(self, expression_data=None):
+        """Row-standardized log expression (computed once per matrix)"""
+        if expression_data is not None and expression_data is not self._expression_ref:
+            self._sync(expression_data, self._de_ref)
+
+        if self._z_scores is None:
+            values = self._log_expression
+            sd = values.std(axis=1, keepdims=True)
+            sd[sd == 0] = 1
+            self._z_scores = (values - values.mean(axis=1, keepdims=True)) / sd
+        return self._z_scores
+
+    def rank_matrix(self, expression_data=None):
+        """Within-sample ascending gene ranks (1..n_genes, ties averaged), computed once per matrix"""
+        if expression_data is not None and expression_data is not self._expression_ref:
+            self._sync(expression_data, self._de_ref)
+
+        if self._ranks is None:
+            # Average ranks, so tied values (e.g. zero counts) don't depend on gene order
+            self._ranks = rankdata(self._log_expression, axis=0)
+        return self._ranks
+
+    def _rank_de_genes(self, de_results):
+        """Order significant up and down genes by adjusted p-value"""
+        available = de_results.index.intersection(self._expression_ref.index) \
+            if self._expression_ref is not None else de_results.index
+        de = de_results.loc[available]
+        significant = de[de['padj'] < self.p_threshold]
+
+        up = significant[significant['log2FoldChange'] > 0].sort_values(
+            ['padj', 'log2FoldChange'], ascending=[True, False]
+        )
+        down = significant[significant['log2FoldChange'] < 0].sort_values(
+            ['padj', 'log2FoldChange'], ascending=[True, True]
+        )
+
+        return {
+            'up': up.index[:self.max_signature_size].tolist(),
+            'down': down.index[:self.max_signature_size].tolist()
+        }
+
+    def _profile(self, side, matrix):
+        """Cumulative sums of z-scores or ranks along the DE ranking for one side"""
+        key = (side, matrix)
+        if key not in self._profiles:
+            genes = self._rank_de_genes(self._de_ref)[side]
+            rows = self._expression_ref.index.get_indexer(genes)
+            values = self.z_matrix() if matrix == "z" else self.rank_matrix()
+
+            if len(rows) == 0:
+                cumulative = np.zeros((0, values.shape[1]))
+            else:
+                cumulative = np.cumsum(values[rows], axis=0)
+            self._profiles[key] = (cumulative, len(rows))
+
+        return self._profiles[key]
+
+    def _singscore(self, parts):
+        """Normalized, centered singscore from cached cumulative rank sums"""
+        n_total = self._log_expression.shape[0]
+        score = 0
+        for side, (rank_total, n) in parts.items():
+            mean_rank = rank_total / n
+            if side == "down":
+                # Down genes are scored on reversed ranks
+                mean_rank = n_total + 1 - mean_rank
+
+            low = (n + 1) / 2
+            high = (2 * n_total - n + 1) / 2
+            score = score + (mean_rank - low) / (high - low) - 0.5
+
+        return score
+
+    @staticmethod
+    def _sides(direction):
+        """Map a UI direction label to signature sides"""
+        if direction == "Up-regulated":
+            return ["up"]
+        if direction == "Down-regulated":
+            return ["down"]
+        return ["up", "down"]
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Enrichment Term Similarity Network for Prairie Genomics Suite
+
+Collapses redundant enrichment results (e.g. hundreds of near-duplicate GO
+terms) into groups with one representative term each, and returns a compact
+node/edge structure for network plots. Term gene lists are interned into a
+sparse terms x genes membership matrix; pairwise intersections of all terms
+come from one sparse product M @ M.T, from which Jaccard or overlap
+coefficients are derived for the non-zero pairs only.
+
+When the results come from a local gene set library, membership is taken
+from the library's full gene sets rather than from the few overlapping (or
+leading-edge) genes listed in the results, whose small intersections make
+similarities close to random.
+
+Clustering is greedy by significance: the most significant unassigned term
+becomes a representative and absorbs every unassigned term whose similarity
+to it reaches the threshold.
+
+Author: Prairie Genomics Team
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+import warnings
+
+warnings.filterwarnings('ignore')
+
+
+class TermSimilarityNetwork:
+    """
+    Sparse term-term similarity, redundancy reduction and network layout
+    """
+
+    METRICS = ["jaccard", "overlap"]
+
+    def __init__(self, metric="jaccard", similarity_threshold=0.5, edge_threshold=0.2):
+        """
+        Initialize the term network builder
+
+        Args:
+            metric: "jaccard" or "overlap" (overlap coefficient)
+            similarity_threshold: Similarity at which a term joins a representative's group
+            edge_threshold: Minimum similarity for an edge in the network
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown similarity metric: {metric}")
+
+        self.metric = metric
+        self.similarity_threshold = similarity_threshold
+        self.edge_threshold = edge_threshold
+
+    def build_network(self, results, gene_column='Genes', p_column='Adjusted P-value',
+                      cutoff=0.05, max_terms=2000, library=None):
+        """
+        Build a reduced term network from an enrichment results table
+
+        Args:
+            results: Enrichment DataFrame with 'Term', a gene list column and a p-value column
+            gene_column: Column with ';'-separated genes ('Genes' for ORA, 'Lead_genes' for GSEA)
+            p_column: Significance column used for filtering and representative choice
+            cutoff: Significance cutoff for terms entering the network
+            max_terms: Maximum number of (most significant) terms considered
+            library: Local GeneSetLibrary the results were computed against;
+                when given, similarity uses its full set membership
+
+        Returns:
+            Dict with 'nodes' (Term, cluster, representative, n_genes (genes
+            listed in the results), p-value, degree), 'edges' (source, target, similarity) and 'clusters'
+            (cluster, representative, n_terms, terms) DataFrames
+        """
+        significant = results[results[p_column] < cutoff]
+        significant = significant.sort_values(p_column, kind='stable').head(max_terms)
+        significant = significant.drop_duplicates('Term').reset_index(drop=True)
+
+        terms = significant['Term'].astype(str).values
+        p_values = significant[p_column].values.astype(float)
+        gene_lists = [
+            [g for g in str(genes).split(';') if g] if isinstance(genes, str) else []
+            for genes in significant[gene_column]
+        ]
+
+        if library is not None:
+            membership = self.library_membership(library, terms, gene_lists)
+        else:
+            membership = self.membership_matrix(gene_lists)
+        similarity = self.similarity_matrix(membership)
+        clusters = self.cluster_terms(similarity, p_values)
+
+        n_genes = np.array([len(set(genes)) for genes in gene_lists], dtype=np.int64)
+        representative = np.zeros(len(terms), dtype=bool)
+        representative[np.unique(clusters, return_index=True)[1]] = True
+
+        source = np.repeat(np.arange(len(terms)), np.diff(similarity.indptr))
+        target = similarity.indices
+        keep = (source < target) & (similarity.data >= self.edge_threshold)
+        edge_table = pd.DataFrame({
+            'source': terms[source[keep]],
+            'target': terms[target[keep]],
+            'similarity': similarity.data[keep]
+        })
+        degree = np.bincount(np.r_[source[keep], target[keep]], minlength=len(terms))
+
+        nodes = pd.DataFrame({
+            'Term': terms,
+            'cluster': clusters,
+            'representative': representative,
+            'n_genes': n_genes,
+            p_column: p_values,
+            'degree': degree
+        })
+
+        cluster_table = nodes.groupby('cluster', sort=True).agg(
+            n_terms=('Term', 'size'),
+            terms=('Term', lambda t: "; ".join(t))
+        ).reset_index()
+        cluster_table.insert(1, 'representative', terms[np.unique(clusters, return_index=True)[1]])
+
+        return {
+            'nodes': nodes,
+            'edges': edge_table,
+            'clusters': cluster_table
+        }
+
+    @staticmethod
+    def membership_matrix(gene_lists):
+        """Binary terms x genes CSR matrix from gene lists (genes interned on the fly)"""
+        lengths = np.array([len(genes) for genes in gene_lists], dtype=np.int64)
+        flat = pd.Series([g for genes in gene_lists for g in genes], dtype=object)
+        codes, vocabulary = pd.factorize(flat.str.strip().str.upper())
+        rows = np.repeat(np.arange(len(gene_lists)), lengths)
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(codes), dtype=np.float32), (rows, codes)),
+            shape=(len(gene_lists), max(len(vocabulary), 1))
+        )
+        # Duplicate genes within a term count once
+        matrix.data[:] = 1
+        return matrix
+
+    @staticmethod
+    def library_membership(library, terms, gene_lists):
+        """
+        Binary terms x genes CSR matrix from a library's full gene sets
+
+        Terms missing from the library fall back to their listed genes,
+        encoded in the library's gene vocabulary.
+        """
+        matrix = library.matrix
+        rows = []
+        for term, genes in zip(terms, gene_lists):
+            try:
+                rows.append(matrix[library.term_index(term)])
+            except KeyError:
+                ids = library.store.encode_genes(genes)
+                ids = np.unique(ids[(ids >= 0) & (ids < matrix.shape[1])])
+                rows.append(sparse.csr_matrix(
+                    (np.ones(len(ids), dtype=np.float32), (np.zeros(len(ids), dtype=np.int64), ids)),
+                    shape=(1, matrix.shape[1])
+                ))
+        if not rows:
+            return sparse.csr_matrix((0, matrix.shape[1]), dtype=np.float32)
+        return sparse.vstack(rows, format='csr')
+
+    def similarity_matrix(self, membership):
+        """Sparse symmetric term similarity (non-zero intersections only)"""
+        similarity = (membership @ membership.T).tocsr()
+        sizes = np.diff(membership.indptr).astype(float)
+        size_i = np.repeat(sizes, np.diff(similarity.indptr))
+        size_j = sizes[similarity.indices]
+        intersection = similarity.data
+
+        if self.metric == "jaccard":
+            denominator = size_i + size_j - intersection
+        else:
+            denominator = np.minimum(size_i, size_j)
+
+        # Replace intersections with similarities in place of the product's structure
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity.data = np.where(denominator > 0, intersection / denominator, 0)
+        return similarity
+
+    def cluster_terms(self, similarity, p_values):
+        """
+        Greedy representative clustering by significance
+
+        Returns:
+            Cluster index per term; clusters are numbered in order of their
+            representative's significance
+        """
+        n_terms = similarity.shape[0]
+        clusters = np.full(n_terms, -1, dtype=np.int64)
+        indptr, indices = similarity.indptr, similarity.indices
+        linked = similarity.data >= self.similarity_threshold
+
+        n_clusters = 0
+        for term in np.argsort(p_values, kind='stable'):
+            if clusters[term] >= 0:
+                continue
+            row = slice(indptr[term], indptr[term + 1])
+            neighbors = indices[row][linked[row]]
+            members = np.r_[term, neighbors[clusters[neighbors] < 0]]
+            clusters[members] = n_clusters
+            n_clusters += 1
+
+        return clusters
+
+    @staticmethod
+    def layout(network, iterations=100, seed=42):
+        """
+        Force-directed 2D node positions for a network from build_network
+
+        Returns:
+            DataFrame of x, y coordinates indexed by term
+        """
+        nodes = network['nodes']
+        n_nodes = len(nodes)
+        if n_nodes == 0:
+            return pd.DataFrame(columns=['x', 'y'])
+
+        index = pd.Series(np.arange(n_nodes), index=nodes['Term'].values)
+        weights = np.zeros((n_nodes, n_nodes))
+        edges = network['edges']
+        if len(edges) > 0:
+            i, j = index[edges['source']].values, index[edges['target']].values
+            weights[i, j] = weights[j, i] = edges['similarity'].values
+
+        # Fruchterman-Reingold with similarity-weighted attraction
+        rng = np.random.default_rng(seed)
+        positions = rng.uniform(-1, 1, size=(n_nodes, 2))
+        k = np.sqrt(4.0 / n_nodes)
+        temperature = 0.1
+        for _ in range(iterations):
+            delta = positions[:, None, :] - positions[None, :, :]
+            distance = np.maximum(np.linalg.norm(delta, axis=2), 1e-3)
+            force = (k ** 2 / distance ** 2 - weights * distance / k)[:, :, None] * delta
+            displacement = force.sum(axis=1)
+            length = np.maximum(np.linalg.norm(displacement, axis=1, keepdims=True), 1e-9)
+            positions += displacement / length * np.minimum(length, temperature)
+            temperature *= 0.97
+
+        return pd.DataFrame(positions, index=nodes['Term'].values, columns=['x', 'y'])
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Genome-scale Volcano Plots for Prairie Genomics Suite
+
+Interactive volcano rendering that stays responsive with tens of thousands
+of genes. All traces are WebGL (Scattergl), and the non-significant cloud
+is thinned on the server by grid-based density binning: the plane is cut
+into a fixed grid, sparse cells keep every gene (so outliers survive) and
+dense cells are sampled down to a common per-cell cap chosen so the
+background never exceeds a fixed point budget. Significant and highlighted
+genes are always drawn in full, so the figure payload grows only with the
+number of significant genes, not with the size of the genome.
+
+Highlighted gene labels are laid out by the shared LabelPlacer (the same
+engine publication exports use), drawn as annotations with leader lines
+instead of fixed "top center" text that piles up in crowded regions.
+
+Author: Prairie Genomics Team
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from label_layout import LabelPlacer, plotly_annotations
+import warnings
+
+warnings.filterwarnings('ignore')
+
+FC_COLUMNS = ['log2FoldChange', 'log2_fold_change', 'logFC']
+P_COLUMNS = ['padj', 'adj_p_value', 'FDR', 'pvalue', 'p_value']
+ADJUSTED_P_COLUMNS = {'padj', 'adj_p_value', 'FDR'}
+LABEL_COLUMNS = ['gene_symbol', 'symbol', 'gene']
+
+# Plot area margins around the nominal width x height (legend sits above the plot)
+MARGINS = dict(l=70, r=40, t=90, b=60)
+
+COLORS = {
+    'Upregulated': '#E74C3C',
+    'Downregulated': '#3498DB',
+    'Not Significant': '#7F7F7F',
+    'Highlighted': '#F1C40F'
+}
+
+
+class VolcanoRenderer:
+    """
+    WebGL volcano plots with density-thinned non-significant genes
+    """
+
+    def __init__(self, max_background_points=5000, grid_size=120, seed=42, label_placer=None):
+        """
+        Initialize the renderer
+
+        Args:
+            max_background_points: Budget for drawn non-significant genes
+            grid_size: Bins per axis for density thinning (the background can
+                only exceed the budget when more than that many cells are occupied,
+                and never exceeds grid_size ** 2 points)
+            seed: Seed for the within-cell sampling
+            label_placer: LabelPlacer for highlighted gene labels
+        """
+        self.max_background_points = max_background_points
+        self.grid_size = grid_size
+        self.seed = seed
+        self.label_placer = label_placer or LabelPlacer()
+
+    def prepare(self, de_results, p_cutoff=0.05, fc_cutoff=1.0, highlight_genes=None,
+                fc_column=None, p_column=None, label_column=None):
+        """
+        Classify genes and thin the non-significant background
+
+        Args:
+            de_results: DE results DataFrame
+            p_cutoff: Cutoff on the p-value column used (adjusted when available)
+            fc_cutoff: Absolute log2 fold change cutoff
+            highlight_genes: Gene labels always drawn and annotated
+            fc_column, p_column, label_column: Column names (detected when None)
+
+        Returns:
+            Dict with 'points' (drawn genes with x, y, label, category),
+            'statistics' (total, up, down, not significant, background drawn)
+            and 'p_column' (the p-value column used)
+        """
+        fc_column = fc_column or _first_column(de_results, FC_COLUMNS)
+        p_column = p_column or _first_column(de_results, P_COLUMNS)
+        label_column = label_column or _first_column(de_results, LABEL_COLUMNS, required=False)
+
+        x = pd.to_numeric(de_results[fc_column], errors='coerce').values.astype(float)
+        p = pd.to_numeric(de_results[p_column], errors='coerce').values.astype(float)
+        labels = (de_results[label_column] if label_column else de_results.index.to_series()).astype(str).values
+
+        valid = np.isfinite(x) & np.isfinite(p)
+        x, p, labels, ids = x[valid], p[valid], labels[valid], de_results.index.values[valid]
+        y = -np.log10(np.clip(p, 1e-300, 1))
+
+        significant = p < p_cutoff
+        category = np.where(significant & (x > fc_cutoff), 'Upregulated',
+                            np.where(significant & (x < -fc_cutoff), 'Downregulated', 'Not Significant'))
+        highlighted = np.isin(labels, list(highlight_genes or [])) | np.isin(ids.astype(str), list(highlight_genes or []))
+        category = np.where(highlighted, 'Highlighted', category)
+
+        background = np.flatnonzero(category == 'Not Significant')
+        kept = background[self.thin(x[background], y[background])]
+        drawn = np.sort(np.r_[np.flatnonzero(category != 'Not Significant'), kept])
+
+        points = pd.DataFrame({
+            'x': x[drawn],
+            'y': y[drawn],
+            'p': p[drawn],
+            'label': labels[drawn],
+            'category': category[drawn]
+        })
+        statistics = {
+            'total_genes': int(len(x)),
+            'up_regulated': int((category == 'Upregulated').sum()),
+            'down_regulated': int((category == 'Downregulated').sum()),
+            'not_significant': int(len(background)),
+            'highlighted': int(highlighted.sum()),
+            'background_drawn': int(len(kept)),
+            'points_drawn': int(len(drawn))
+        }
+        statistics['total_significant'] = statistics['up_regulated'] + statistics['down_regulated']
+        return {'points': points, 'statistics': statistics, 'p_column': p_column}
+
+    def thin(self, x, y):
+        """
+        Grid-based density thinning
+
+        Returns:
+            Indices of the kept points: every point in cells holding at most
+            the per-cell cap, and a random cap-sized sample of denser cells
+        """
+        n_points = len(x)
+        if n_points <= self.max_background_points:
+            return np.arange(n_points)
+
+        cells = _grid_cells(x, y, self.grid_size)
+        counts = np.bincount(cells)
+        counts = counts[counts > 0]
+
+        # Largest per-cell cap whose total stays within the budget
+        low, high = 1, int(counts.max())
+        while low < high:
+            cap = (low + high + 1) // 2
+            if np.minimum(counts, cap).sum() <= self.max_background_points:
+                low = cap
+            else:
+                high = cap - 1
+
+        # Random rank of each point within its cell
+        rng = np.random.default_rng(self.seed)
+        order = np.lexsort((rng.random(n_points), cells))
+        sorted_cells = cells[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_cells)) + 1]
+        rank = np.arange(n_points) - np.repeat(starts, np.diff(np.r_[starts, n_points]))
+
+        return np.sort(order[rank < low])
+
+    def figure(self, prepared, title="Differential Expression Volcano Plot", p_cutoff=0.05,
+               fc_cutoff=1.0, point_size=4, height=440, width=740):
+        """
+        WebGL volcano figure from prepare() output
+
+        Args:
+            width, height: Plot area size in pixels; the figure is sized to it
+                plus MARGINS, so labels laid out in pixels match the screen
+                (render without use_container_width)
+
+        Returns:
+            plotly Figure
+        """
+        points = prepared['points']
+        statistics = prepared['statistics']
+        adjusted = prepared.get('p_column') in ADJUSTED_P_COLUMNS
+        p_label = "adj. p" if adjusted else "p"
+        fig = go.Figure()
+
+        for category in ['Not Significant', 'Downregulated', 'Upregulated']:
+            subset = points[points['category'] == category]
+            name = category
+            if category == 'Not Significant' and statistics['background_drawn'] < statistics['not_significant']:
+                name = f"Not Significant ({statistics['background_drawn']:,} of {statistics['not_significant']:,} shown)"
+            fig.add_trace(go.Scattergl(
+                x=subset['x'].round(4).values,
+                y=subset['y'].round(4).values,
+                mode='markers',
+                name=name,
+                marker=dict(size=point_size, color=COLORS[category],
+                            opacity=0.5 if category == 'Not Significant' else 0.8),
+                customdata=np.c_[subset['label'].values, subset['p'].values],
+                hovertemplate="<b>%{customdata[0]}</b><br>log2FC: %{x:.3f}"
+                              f"<br>{p_label}: %{{customdata[1]:.3g}}<extra></extra>"
+            ))
+
+        # Highlighted genes are few; labels are placed separately as annotations
+        subset = points[points['category'] == 'Highlighted']
+        if len(subset) > 0:
+            fig.add_trace(go.Scatter(
+                x=subset['x'].values,
+                y=subset['y'].values,
+                mode='markers',
+                name='Highlighted',
+                text=subset['label'].values,
+                marker=dict(size=point_size + 4, color=COLORS['Highlighted'],
+                            line=dict(width=1, color='black')),
+                customdata=subset['p'].values,
+                hovertemplate="<b>%{text}</b><br>log2FC: %{x:.3f}"
+                              f"<br>{p_label}: %{{customdata:.3g}}<extra></extra>"
+            ))
+
+        # Fixed axis ranges so label offsets computed in pixels match the drawn plot
+        x_pad = max(np.ptp(points['x'].values) * 0.05, 0.1) if len(points) else 1.0
+        x_range = [min(points['x'].min(), -fc_cutoff) - x_pad, max(points['x'].max(), fc_cutoff) + x_pad] \
+            if len(points) else [-fc_cutoff - 1, fc_cutoff + 1]
+        y_max = max(points['y'].max() if len(points) else 0, -np.log10(p_cutoff))
+        y_range = [0, y_max * 1.08 + 0.5]
+
+        if len(subset) > 0:
+            subset = subset.sort_values('y', ascending=False)
+            placement = self.label_placer.place_on_axes(
+                subset['x'].values, subset['y'].values, subset['label'].values,
+                x_range, y_range, width=width, height=height,
+                obstacles=points[['x', 'y']].values
+            )
+            fig.update_layout(annotations=plotly_annotations(placement, self.label_placer.font_size))
+            statistics['labels_placed'] = int(placement['placed'].sum())
+        fig.add_hline(y=-np.log10(p_cutoff), line_dash="dash", line_color="gray")
+        fig.add_vline(x=fc_cutoff, line_dash="dash", line_color="gray")
+        fig.add_vline(x=-fc_cutoff, line_dash="dash", line_color="gray")
+
+        fig.update_layout(
+            title=title,
+            xaxis_title="Log2 Fold Change",
+            yaxis_title="-Log10(Adjusted P-value)" if adjusted else "-Log10(P-value)",
+            xaxis_range=x_range,
+            yaxis_range=y_range,
+            width=width + MARGINS['l'] + MARGINS['r'],
+            height=height + MARGINS['t'] + MARGINS['b'],
+            margin=MARGINS,
+            hovermode='closest',
+            legend=dict(orientation='h', yanchor='bottom', y=1.02, x=0, itemsizing='constant')
+        )
+        return fig
+
+    def create_volcano_plot(self, de_results, title="Differential Expression Volcano Plot",
+                            p_cutoff=0.05, fc_cutoff=1.0, highlight_genes=None, point_size=4,
+                            **columns):
+        """
+        Prepare and render in one call
+
+        Returns:
+            Tuple (figure, statistics)
+        """
+        prepared = self.prepare(de_results, p_cutoff, fc_cutoff, highlight_genes, **columns)
+        fig = self.figure(prepared, title, p_cutoff, fc_cutoff, point_size)
+        return fig, prepared['statistics']
+
+
+def _grid_cells(x, y, grid_size):
+    """Flat grid cell index of each point over the points' bounding box"""
+    def bins(values):
+        low, high = values.min(), values.max()
+        scale = grid_size / (high - low) if high > low else 0.0
+        return np.minimum(((values - low) * scale).astype(np.int64), grid_size - 1)
+
+    return bins(x) * grid_size + bins(y)
+
+
+def _first_column(data, candidates, required=True):
+    """First candidate column present in a DataFrame"""
+    for column in candidates:
+        if column in data.columns:
+            return column
+    if required:
+        raise ValueError(f"None of the columns {candidates} found in results")
+    return None